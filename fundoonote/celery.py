@@ -17,6 +17,8 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks(lambda: settings.INSTALLED_APPS)
+# The apps keep their tasks in task.py rather than tasks.py.
+app.autodiscover_tasks(lambda: settings.INSTALLED_APPS, related_name='task')
 
 
 @app.task(bind=True)
@@ -0,0 +1,172 @@
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.utils.functional import SimpleLazyObject
+from django_redis import get_redis_connection
+from loguru import logger
+from notes.redisutil import RedisUtils
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+ROUTING_STATS_KEY = 'db_routing_stats'
+
+_current = ContextVar('db_routing', default=None)
+_stats = Counter()
+_stats_lock = threading.Lock()
+_last_flush = [time.monotonic()]
+
+
+def pin_key(user_id):
+    return f"user_{user_id}_pin_primary"
+
+
+def pin_to_primary(user_id):
+    """
+    Send the user's reads to the primary for DATABASE_REPLICA_PIN_SECONDS so
+    they always see their own writes despite replication lag.
+    """
+    RedisUtils().save(pin_key(user_id), 1, settings.DATABASE_REPLICA_PIN_SECONDS)
+
+
+def record(alias, reason):
+    with _stats_lock:
+        _stats[f"{alias}:{reason}"] += 1
+
+
+def flush_stats(force=False):
+    """
+    Add the routing decisions counted by this process to the shared Redis hash,
+    at most once every DATABASE_ROUTING_STATS_FLUSH_SECONDS.
+    """
+    now = time.monotonic()
+    if not force and now - _last_flush[0] < settings.DATABASE_ROUTING_STATS_FLUSH_SECONDS:
+        return
+    with _stats_lock:
+        pending = dict(_stats)
+        _stats.clear()
+        _last_flush[0] = now
+    if not pending:
+        return
+    try:
+        pipe = get_redis_connection("default").pipeline(transaction=False)
+        for field, count in pending.items():
+            pipe.hincrby(ROUTING_STATS_KEY, field, count)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Could not flush database routing stats: {str(e)}")
+
+
+class RoutingState:
+
+    def __init__(self, request):
+        self.request = request
+        self.replica = random.choice(settings.DATABASE_REPLICAS) if settings.DATABASE_REPLICAS else None
+        self.pinned = None
+
+    def user_id(self):
+        # DRF assigns the authenticated user to the underlying request. Until it
+        # has, request.user is Django's lazy session user, which must not be
+        # evaluated here since loading it would itself route a read.
+        user = self.request.__dict__.get('user')
+        if user is None or isinstance(user, SimpleLazyObject) or not user.is_authenticated:
+            return None
+        return user.id
+
+    def is_pinned(self):
+        user_id = self.user_id()
+        if user_id is None:
+            return False
+        if self.pinned is None:
+            if not RedisUtils().available():
+                # The pin cannot be read, so the user may have just written.
+                return True
+            try:
+                self.pinned = bool(RedisUtils().get(pin_key(user_id)))
+            except Exception as e:
+                logger.error(f"Could not read primary pin for user {user_id}: {str(e)}")
+                return True
+        return self.pinned
+
+
+def read_alias():
+    """
+    Pick the database for a read: a replica for safe requests, the primary for
+    everything else (writes, transactions, pinned users, tasks and commands).
+    """
+    state = _current.get()
+    if state is None:
+        return DEFAULT_DB_ALIAS, 'outside_request'
+    if state.replica is None:
+        return DEFAULT_DB_ALIAS, 'no_replica'
+    if state.request.method not in SAFE_METHODS:
+        return DEFAULT_DB_ALIAS, 'write_request'
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return DEFAULT_DB_ALIAS, 'transaction'
+    if state.is_pinned():
+        return DEFAULT_DB_ALIAS, 'pinned'
+    return state.replica, 'replica'
+
+
+@contextmanager
+def routing(request):
+    token = _current.set(RoutingState(request))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+class ReplicaRouter:
+
+    """
+    Route reads made while serving a safe request to a read replica and all
+    writes, migrations and out-of-request queries to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias, reason = read_alias()
+        record(alias, reason)
+        return alias
+
+    def db_for_write(self, model, **hints):
+        record(DEFAULT_DB_ALIAS, 'write')
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+
+    """
+    Make the current request visible to ReplicaRouter and pin users who have
+    just written to the primary for their following reads.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with routing(request):
+            response = self.get_response(request)
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            state = RoutingState(request)
+            user_id = state.user_id()
+            if user_id is not None:
+                try:
+                    pin_to_primary(user_id)
+                except Exception as e:
+                    logger.error(f"Could not pin user {user_id} to the primary: {str(e)}")
+
+        flush_stats()
+        return response
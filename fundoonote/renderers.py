@@ -0,0 +1,39 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class ORJSONRenderer(JSONRenderer):
+
+    """
+    JSONRenderer on top of orjson. Output matches DRF's compact renderer:
+    datetimes use "Z" for UTC, and anything orjson cannot encode natively
+    (Decimal, lazy strings, querysets, timedeltas) goes through DRF's own
+    encoder. Data orjson refuses, such as integers beyond 64 bits, is handed
+    to DRF's renderer instead. One difference remains: NaN and infinite floats
+    become null, where DRF's strict renderer raises ValueError.
+    """
+
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+    default = JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        options = self.options
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            # orjson only indents by two spaces.
+            options |= orjson.OPT_INDENT_2
+
+        try:
+            ret = orjson.dumps(data, default=self.default, option=options)
+        except orjson.JSONEncodeError:
+            # Integers beyond 64 bits, or anything else DRF's renderer either
+            # handles or fails on in its own way.
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Like DRF, escape the line separators so the output is valid JavaScript.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
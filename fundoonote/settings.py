@@ -14,6 +14,7 @@ from pathlib import Path
 import os
 from dotenv import load_dotenv
 from loguru import logger
+from celery.schedules import crontab
 
 load_dotenv(dotenv_path=".env")
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -60,6 +61,8 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "user.middleware.RequestLogMiddleware",
+    "user.middleware.UserActivityMiddleware",
+    "fundoonote.db_router.ReplicaRoutingMiddleware",
 ]
 
 ROOT_URLCONF = "fundoonote.urls"
@@ -96,6 +99,19 @@ DATABASES = {
         "PORT" : "5432",
     }
 }
+# Read replica of the primary; without a dedicated host it points at the primary.
+DATABASES["replica"] = {
+    **DATABASES["default"],
+    "HOST": os.environ.get('DATABASE_REPLICA_HOST', DATABASES["default"]["HOST"]),
+    "TEST": {"MIRROR": "default"},
+}
+DATABASE_ROUTERS = ['fundoonote.db_router.ReplicaRouter']
+# Aliases safe reads are spread across; empty sends every query to the primary.
+DATABASE_REPLICAS = ['replica']
+# Seconds a user's reads stay on the primary after they wrote something.
+DATABASE_REPLICA_PIN_SECONDS = 5
+# Seconds between flushes of per-process routing counters to Redis.
+DATABASE_ROUTING_STATS_FLUSH_SECONDS = 10
 
 
 # Password validation
@@ -219,25 +235,92 @@ for handler in LOGURU_SETTINGS["handlers"]:
     logger.add(**handler)
     
     
+# The Celery broker, the default cache and each note cache node are separate
+# Redis instances: logical databases of one instance share its maxmemory and
+# eviction policy, so cache pressure there could evict queued tasks.
+REDIS_CACHE_URL = os.environ.get('REDIS_CACHE_URL', "redis://127.0.0.1:6380/0")
+# Redis nodes of the sharded note cache, comma separated, one instance each.
+NOTE_CACHE_NODES = os.environ.get('NOTE_CACHE_NODES', "redis://127.0.0.1:6381/0").split(',')
+# Points per node on the hash ring; more spread users more evenly.
+NOTE_CACHE_RING_REPLICAS = 160
+
 CACHES = {
     "default": {
         "BACKEND": "django_redis.cache.RedisCache",
-        "LOCATION": "redis://127.0.0.1:6379/1", #os.environ.get('LOCATION'),
+        "LOCATION": REDIS_CACHE_URL,
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            # Fail fast so an unreachable Redis trips the circuit breaker instead of stalling requests.
+            "SOCKET_CONNECT_TIMEOUT": 0.2,
+            "SOCKET_TIMEOUT": 0.5,
         }
-    }
+    },
+    # Per-user note list indexes and details (user_<id>... keys), spread over
+    # NOTE_CACHE_NODES by consistent hashing on the user id so each user's keys
+    # share a node. Adding a node moves about 1/n of the users.
+    "notes": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": NOTE_CACHE_NODES,
+        "OPTIONS": {
+            "CLIENT_CLASS": "notes.sharding.UserShardClient",
+            "SOCKET_CONNECT_TIMEOUT": 0.2,
+            "SOCKET_TIMEOUT": 0.5,
+        }
+    },
+    # Bounded in-process cache RedisUtils falls back to while Redis is unavailable.
+    "fallback": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "redis-fallback",
+        "OPTIONS": {"MAX_ENTRIES": 1000},
+    },
 }
+# Consecutive Redis failures that open the circuit breaker, seconds before it
+# lets a probe through, and the longest a value is kept in the fallback cache.
+REDIS_BREAKER_FAILURES = 3
+REDIS_BREAKER_RESET_SECONDS = 5
+REDIS_FALLBACK_TIMEOUT = 10
 
 
 
-CELERY_BROKER_URL = "redis://127.0.0.1:6379/1" #os.environ.get('CELERY_BROKER_URL')
+# Its own Redis instance, apart from the caches, with maxmemory-policy noeviction.
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', "redis://127.0.0.1:6379/0")
 CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_RESULT_SERIALIZER =  "json" #os.environ.get('CELERY_RESULT_SERIALIZER')
 CELERY_TASK_SERIALIZER = "json" #os.environ.get('CELERY_TASK_SERIALIZER')
 CELERY_RESULT_BACKEND = "django-db" #os.environ.get('CELERY_RESULT_BACKEND')
 CELERY_TIMEZONE = "Asia/Kolkata" #os.environ.get('CELERY_TIMEZONE')
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler" #os.environ.get('CELERY_BEAT_SCHEDULER')
+# Image resizing gets its own queue so a worker with a fixed pool size, e.g.
+# `celery -A fundoonote worker -Q images --concurrency 2`, bounds its CPU use.
+CELERY_TASK_ROUTES = {
+    "notes.task.generate_image_derivatives": {"queue": "images"},
+}
+CELERY_BEAT_SCHEDULE = {
+    "purge-trashed-notes": {
+        "task": "notes.task.purge_trashed_notes",
+        "schedule": crontab(hour=3, minute=0),
+    },
+    "collect-image-blobs": {
+        "task": "notes.task.collect_image_blobs",
+        "schedule": crontab(hour=3, minute=30),
+    },
+    "flush-autosave-buffers": {
+        "task": "notes.task.flush_autosave_buffers",
+        "schedule": crontab(),
+    },
+    "drain-outbox": {
+        "task": "notes.task.drain_outbox",
+        "schedule": crontab(),
+    },
+    "prune-outbox": {
+        "task": "notes.task.prune_outbox",
+        "schedule": crontab(hour=4, minute=0),
+    },
+    "decay-cache-stats": {
+        "task": "notes.task.decay_cache_stats",
+        "schedule": crontab(minute="*/10"),
+    },
+}
 
 
 
@@ -247,9 +330,18 @@ SWAGGER_SETTINGS = {
 }
 
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'fundoonote.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'fundoonote.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle',
+        'user.throttling.RedisAnonRateThrottle',
+        'user.throttling.RedisUserRateThrottle',
      
 
     ],
@@ -260,3 +352,100 @@ REST_FRAMEWORK = {
     }
 }
 
+
+# Seconds a note permission lookup stays cached in Redis (0 disables the cache).
+NOTE_ACCESS_CACHE_TIMEOUT = 300
+
+# Days a note stays in the trash before the purge task deletes it for good.
+NOTE_TRASH_RETENTION_DAYS = 30
+# Notes hard-deleted per transaction by the purge task.
+NOTE_PURGE_CHUNK_SIZE = 500
+
+# Directory holding finished data exports; served only through the download endpoint.
+NOTE_EXPORT_DIR = BASE_DIR / "exports"
+# Rows fetched per database round trip while streaming an export.
+NOTE_EXPORT_CHUNK_SIZE = 2000
+
+# Rows validated and inserted per transaction by the bulk note importer.
+NOTE_IMPORT_BATCH_SIZE = 2000
+# Imports with at least this many rows are written with COPY instead of INSERT.
+NOTE_IMPORT_COPY_THRESHOLD = 20000
+
+# Seconds a user's cached note list index (note ids and versions) is kept.
+NOTE_LIST_CACHE_TIMEOUT = 300
+# Seconds a note's cached detail is kept.
+NOTE_DETAIL_CACHE_TIMEOUT = 300
+# Seconds a note's pre-rendered JSON is kept; keys are versioned so this only bounds memory.
+NOTE_FRAGMENT_TIMEOUT = 3600
+# Characters of the description returned as the snippet of summary note lists.
+NOTE_SNIPPET_LENGTH = 120
+# Build note list JSON from values() queries instead of NoteSerializer instances.
+NOTE_FAST_SERIALIZER = True
+
+# Content-addressed store for note images and the URL prefix they are served under.
+NOTE_IMAGE_ROOT = BASE_DIR / "media" / "images"
+NOTE_IMAGE_URL = "/mere-notes/images/"
+# Seconds an unreferenced image blob is kept before the GC task may delete it.
+NOTE_IMAGE_GC_GRACE_SECONDS = 86400
+# Longest side in pixels of each resized copy made of note images, and the formats written.
+NOTE_IMAGE_DERIVATIVE_SIZES = {'thumbnail': 160, 'medium': 640}
+NOTE_IMAGE_DERIVATIVE_FORMATS = ['webp', 'jpeg']
+NOTE_IMAGE_DERIVATIVE_QUALITY = 80
+
+# Seconds autosaved edits of a note are buffered in Redis before one coalesced write.
+NOTE_AUTOSAVE_DEBOUNCE_SECONDS = 3
+# Age after which the periodic flush writes a buffer whose debounced flush never ran.
+NOTE_AUTOSAVE_MAX_DELAY_SECONDS = 30
+# Most insert/delete operations accepted by one description patch.
+NOTE_DESCRIPTION_MAX_OPERATIONS = 100
+
+# Layer carrying note change events to WebSocket clients (notes.events.InMemoryEventLayer
+# for a single process) and the Redis its pub/sub subscriptions connect to.
+NOTE_EVENTS_LAYER = "notes.events.RedisEventLayer"
+NOTE_EVENTS_REDIS_URL = CACHES["default"]["LOCATION"]
+
+# Outbox events applied per transaction by the drain task, and the attempts a failing
+# event gets before it is set aside so later events can go through.
+NOTE_OUTBOX_BATCH_SIZE = 200
+NOTE_OUTBOX_MAX_ATTEMPTS = 5
+# Seconds a queued drain suppresses further kicks, and days applied events are kept.
+NOTE_OUTBOX_KICK_TIMEOUT = 60
+NOTE_OUTBOX_RETENTION_DAYS = 7
+# Seconds between flushes of the last-seen times each process collects, and
+# how many of the most recently active users the ranking keeps.
+USER_ACTIVITY_FLUSH_SECONDS = 10
+USER_ACTIVITY_MAX_TRACKED = 10000
+# warm_active_users warms up to NOTE_WARMUP_USERS users seen in the last
+# NOTE_WARMUP_ACTIVE_HOURS, at most NOTE_WARMUP_USERS_PER_SECOND of them a second.
+NOTE_WARMUP_USERS = 500
+NOTE_WARMUP_ACTIVE_HOURS = 24
+NOTE_WARMUP_USERS_PER_SECOND = 5
+# Projections whose fragments are warmed, and seconds before another login warms the same user again.
+NOTE_WARMUP_PROJECTIONS = ('full', 'summary')
+NOTE_WARMUP_LOGIN_INTERVAL = 300
+# Days the upcoming reminders window spans by default and at most, reminders
+# per page by default and at most, and seconds a page stays cached.
+NOTE_REMINDER_WINDOW_DAYS = 30
+NOTE_REMINDER_MAX_WINDOW_DAYS = 366
+NOTE_REMINDER_PAGE_SIZE = 20
+NOTE_REMINDER_MAX_PAGE_SIZE = 100
+NOTE_REMINDER_CACHE_TIMEOUT = 300
+
+# Share of cache reads and writes sampled into the access counts, value sizes
+# and hit rate, and how many keys the counts and sizes keep.
+CACHE_STATS_SAMPLE_RATE = 0.05
+CACHE_STATS_MAX_KEYS = 5000
+# Adaptive timeouts: keys read at least CACHE_HOT_KEY_HITS times since the last
+# decay (counts halve every 10 minutes) are kept CACHE_HOT_TIMEOUT_FACTOR times
+# longer, up to CACHE_MAX_TIMEOUT; keys read fewer than CACHE_COLD_KEY_HITS times
+# are kept CACHE_COLD_TIMEOUT_FACTOR as long, down to CACHE_MIN_TIMEOUT.
+CACHE_ADAPTIVE_TIMEOUTS = True
+CACHE_HOT_KEY_HITS = 20
+CACHE_COLD_KEY_HITS = 2
+CACHE_HOT_TIMEOUT_FACTOR = 6
+CACHE_COLD_TIMEOUT_FACTOR = 0.25
+CACHE_MAX_TIMEOUT = 3600
+CACHE_MIN_TIMEOUT = 30
+# Seconds each process reuses its copy of the access counts adaptive timeouts
+# are picked from; one decay period by default.
+CACHE_READ_COUNTS_REFRESH_SECONDS = 600
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 
 from django.contrib.auth import get_user_model
 
@@ -16,4 +16,9 @@ class Label(models.Model):
     def __str__(self):
         return self.name
     
+    def save(self, *args, **kwargs):
+        # The notes app records an outbox event on save, which must commit with the label.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
     
\ No newline at end of file
@@ -13,7 +13,7 @@ from .serializers import LableSerialiser
 from loguru import logger
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from django.db import connection
+from django.db import connection, connections, router
 # Create your views here.
 
 class LabelView(mixins.CreateModelMixin,
@@ -182,7 +182,7 @@ class RawQueryView(
 
     def get_queryset(self):
         user_id = self.request.user.id
-        with connection.cursor() as cursor:
+        with connections[router.db_for_read(Label)].cursor() as cursor:
             cursor.execute("SELECT * FROM label WHERE user_id = %s", [user_id])
             rows = self.dictfetchall(cursor)
         return rows
@@ -205,7 +205,7 @@ class RawQueryView(
             if 'pk' in kwargs:
                 label_id = kwargs['pk']
                 user_id = request.user.id
-                with connection.cursor() as cursor:
+                with connections[router.db_for_read(Label)].cursor() as cursor:
                     cursor.execute("SELECT * FROM label WHERE id = %s AND user_id = %s", [label_id, user_id])
                     row = self.dictfetchall(cursor)
                     if not row:
@@ -245,7 +245,7 @@ class RawQueryViewMain(
 
     def get_queryset(self):
         user_id = self.request.user.id
-        with connection.cursor() as cursor:
+        with connections[router.db_for_read(Label)].cursor() as cursor:
             cursor.execute("SELECT * FROM label WHERE user_id = %s", [user_id])
             rows = self.dictfetchall(cursor)
         return rows
@@ -268,7 +268,7 @@ class RawQueryViewMain(
             if 'pk' in kwargs:
                 label_id = kwargs['pk']
                 user_id = request.user.id
-                with connection.cursor() as cursor:
+                with connections[router.db_for_read(Label)].cursor() as cursor:
                     cursor.execute("SELECT * FROM label WHERE id = %s AND user_id = %s", [label_id, user_id])
                     row = self.dictfetchall(cursor)
                     if not row:
@@ -0,0 +1,81 @@
+from django.db import transaction
+from .models import Note, Collaborator, NoteAccess
+
+
+def grant_owner_access(note):
+    """
+    Add the owner's visibility row for a freshly created note.
+    """
+    NoteAccess.objects.bulk_create(
+        [NoteAccess(user_id=note.user_id, note_id=note.id, access_type=NoteAccess.owner)],
+        ignore_conflicts=True,
+    )
+
+
+def grant_collaborator_access(note_id, user_ids, access_type):
+    """
+    Add or update the visibility rows of collaborators in a single upsert.
+    """
+    NoteAccess.objects.bulk_create(
+        [NoteAccess(user_id=user_id, note_id=note_id, access_type=access_type) for user_id in user_ids],
+        update_conflicts=True,
+        unique_fields=['user', 'note'],
+        update_fields=['access_type'],
+    )
+
+
+def revoke_collaborator_access(note_id, user_ids):
+    """
+    Remove the visibility rows of collaborators, never touching the owner's row.
+    """
+    NoteAccess.objects.filter(note_id=note_id, user_id__in=user_ids).exclude(access_type=NoteAccess.owner).delete()
+
+
+def note_id_batches(batch_size):
+    """
+    Yield lists of note ids in ascending order, batch_size at a time.
+    """
+    last_id = 0
+    while True:
+        note_ids = list(Note.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not note_ids:
+            return
+        yield note_ids
+        last_id = note_ids[-1]
+
+
+def sync_note_access(note_ids, fix=False):
+    """
+    Compare the NoteAccess rows of the given notes against the owner and
+    collaborator tables and return the drift found as counts. With fix=True
+    the drift is repaired in one short transaction.
+    """
+    expected = {}
+    for note_id, user_id in Note.objects.filter(id__in=note_ids).values_list('id', 'user_id'):
+        expected[(user_id, note_id)] = NoteAccess.owner
+
+    collaborators = Collaborator.objects.filter(note_id__in=note_ids).values_list('note_id', 'user_id', 'access_type')
+    for note_id, user_id, access_type in collaborators:
+        # The owner row always wins over a stray collaborator row for the owner.
+        expected.setdefault((user_id, note_id), access_type)
+
+    actual = {}
+    for pk, user_id, note_id, access_type in NoteAccess.objects.filter(note_id__in=note_ids).values_list('id', 'user_id', 'note_id', 'access_type'):
+        actual[(user_id, note_id)] = (pk, access_type)
+
+    missing = [key for key in expected if key not in actual]
+    stale = [pk for key, (pk, access_type) in actual.items() if key not in expected]
+    mismatched = [key for key, (pk, access_type) in actual.items() if key in expected and expected[key] != access_type]
+
+    if fix and (missing or stale or mismatched):
+        with transaction.atomic():
+            NoteAccess.objects.filter(id__in=stale).delete()
+            NoteAccess.objects.bulk_create(
+                [NoteAccess(user_id=user_id, note_id=note_id, access_type=expected[(user_id, note_id)])
+                 for user_id, note_id in missing + mismatched],
+                update_conflicts=True,
+                unique_fields=['user', 'note'],
+                update_fields=['access_type'],
+            )
+
+    return {'missing': len(missing), 'stale': len(stale), 'mismatched': len(mismatched)}
@@ -0,0 +1,166 @@
+import json
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django_redis import get_redis_connection
+from .breaker import CacheUnavailable, breaker
+from .models import Note
+
+
+# Drops the flushed fields from the buffer only when they still hold the value
+# that was written to the database, so an edit buffered while the flush was
+# running is kept for the next one. The note leaves the dirty set once nothing
+# of it is buffered any more.
+RELEASE_SCRIPT = """
+for i = 2, #ARGV, 2 do
+    if redis.call('HGET', KEYS[1], ARGV[i]) == ARGV[i + 1] then
+        redis.call('HDEL', KEYS[1], ARGV[i])
+    end
+end
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    redis.call('ZREM', KEYS[2], ARGV[1])
+end
+return redis.call('HLEN', KEYS[1])
+"""
+
+
+def buffer_key(note_id):
+    return cache.make_key(f"note_{note_id}_autosave")
+
+
+def schedule_key(note_id):
+    return cache.make_key(f"note_{note_id}_autosave_flush")
+
+
+def overlay(data, fields):
+    """
+    Apply buffered field values to a serialized note (of any projection) in place.
+    """
+    for name, value in fields.items():
+        if name in data:
+            data[name] = value
+    if 'snippet' in data and 'description' in fields:
+        data['snippet'] = (fields['description'] or '')[:settings.NOTE_SNIPPET_LENGTH]
+    return data
+
+
+class AutosaveBuffer:
+
+    """
+    Holds the latest autosaved field values of each note in a Redis hash until
+    they are flushed to Postgres in one write. Every buffered note is also kept
+    in a sorted set scored by its first unflushed edit, which is what the
+    periodic flush walks, so a lost debounce task or a worker crash only delays
+    a write. A flush removes buffered values only after the database commit.
+    """
+
+    fields = ('title', 'description', 'color')
+    dirty_key = 'notes_autosave_dirty'
+    script = None
+
+    def __init__(self):
+        self.conn = get_redis_connection("default")
+
+    def get_script(self):
+        if AutosaveBuffer.script is None:
+            AutosaveBuffer.script = self.conn.register_script(RELEASE_SCRIPT)
+        return AutosaveBuffer.script
+
+    def write(self, note_id, values):
+        """
+        Buffer the values and return True when the caller should schedule a
+        debounced flush (no flush is pending yet for the note).
+        """
+        pipe = self.conn.pipeline()
+        pipe.hset(buffer_key(note_id), mapping={name: json.dumps(value) for name, value in values.items()})
+        pipe.zadd(cache.make_key(self.dirty_key), {note_id: time.time()}, nx=True)
+        pipe.set(schedule_key(note_id), 1, nx=True, ex=settings.NOTE_AUTOSAVE_DEBOUNCE_SECONDS * 2)
+        with breaker.guard():
+            return bool(pipe.execute()[-1])
+
+    def decode(self, raw):
+        return {name.decode(): json.loads(value) for name, value in raw.items()}
+
+    def read(self, note_id):
+        """
+        The buffered values of the note; none while Redis is unavailable.
+        """
+        try:
+            with breaker.guard():
+                return self.decode(self.conn.hgetall(buffer_key(note_id)))
+        except CacheUnavailable:
+            return {}
+
+    def read_many(self, note_ids):
+        """
+        Return {note_id: buffered values} for the notes that have any.
+        """
+        note_ids = list(note_ids)
+        if not note_ids:
+            return {}
+        try:
+            with breaker.guard():
+                scores = self.conn.zmscore(cache.make_key(self.dirty_key), note_ids)
+                buffered = [note_id for note_id, score in zip(note_ids, scores) if score is not None]
+                if not buffered:
+                    return {}
+                pipe = self.conn.pipeline(transaction=False)
+                for note_id in buffered:
+                    pipe.hgetall(buffer_key(note_id))
+                fields = pipe.execute()
+        except CacheUnavailable:
+            return {}
+        return {note_id: self.decode(values) for note_id, values in zip(buffered, fields) if values}
+
+    def pending(self, note_id):
+        """
+        Return (values, raw) for the buffered edits of the note: the decoded
+        values and the raw hash that release() takes once they are written.
+        """
+        with breaker.guard():
+            raw = self.conn.hgetall(buffer_key(note_id))
+        return self.decode(raw), raw
+
+    def release(self, note_id, raw):
+        """
+        Drop the written values from the buffer; call it only once they are
+        committed, so a crash before this point leaves them buffered and the
+        next flush writes them again.
+        """
+        args = [note_id]
+        for name, value in raw.items():
+            args.extend([name, value])
+        with breaker.guard():
+            self.get_script()(keys=[buffer_key(note_id), cache.make_key(self.dirty_key)], args=args)
+
+    def flush(self, note_id):
+        """
+        Write the buffered values of the note to the database and return the
+        number of fields written.
+        """
+        values, raw = self.pending(note_id)
+        if values:
+            self.store(note_id, values)
+        self.release(note_id, raw)
+        return len(values)
+
+    def store(self, note_id, values):
+        """
+        Write values to the note in the database, bypassing the buffer.
+        """
+        with transaction.atomic():
+            note = Note.objects.select_for_update().only('id', 'version', 'user', *values).filter(id=note_id).first()
+            if note is not None:
+                for name, value in values.items():
+                    setattr(note, name, value)
+                note.save(update_fields=list(values))
+
+    def clear_schedule(self, note_id):
+        self.conn.delete(schedule_key(note_id))
+
+    def due(self, older_than):
+        """
+        Ids of the buffered notes whose first unflushed edit is older than the given seconds.
+        """
+        return [int(note_id) for note_id in self.conn.zrangebyscore(cache.make_key(self.dirty_key), '-inf', time.time() - older_than)]
@@ -0,0 +1,105 @@
+import threading
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django_redis.exceptions import ConnectionInterrupted
+from loguru import logger
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+
+
+class CacheUnavailable(Exception):
+    """
+    Redis could not be reached, or the circuit breaker is open.
+    """
+
+
+def is_outage(error):
+    """
+    Tell a Redis outage apart from an error Redis itself replied with.
+    """
+    if isinstance(error, ConnectionInterrupted):
+        error = error.__cause__
+    return isinstance(error, (CacheUnavailable, RedisConnectionError, RedisTimeoutError, TimeoutError, ConnectionError))
+
+
+class CircuitBreaker:
+
+    """
+    Trips after REDIS_BREAKER_FAILURES consecutive Redis outages in this
+    process; while open, guarded calls fail at once with CacheUnavailable
+    instead of waiting for a socket timeout. After REDIS_BREAKER_RESET_SECONDS
+    a single call is let through as a probe: success closes the breaker and
+    runs the recovery hooks, failure keeps it open for another period.
+    """
+
+    closed, open, half_open = 'closed', 'open', 'half-open'
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.state = self.closed
+        self.failures = 0
+        self.opened_at = 0
+        self.recovery_hooks = []
+
+    def on_recover(self, hook):
+        self.recovery_hooks.append(hook)
+        return hook
+
+    def is_open(self):
+        """
+        True while calls are being refused; unlike allow() this never starts a probe.
+        """
+        with self.lock:
+            return self.state != self.closed and time.monotonic() - self.opened_at < settings.REDIS_BREAKER_RESET_SECONDS
+
+    def allow(self):
+        with self.lock:
+            if self.state == self.closed:
+                return True
+            if self.state == self.open and time.monotonic() - self.opened_at >= settings.REDIS_BREAKER_RESET_SECONDS:
+                self.state = self.half_open
+                return True
+            return False
+
+    def succeeded(self):
+        with self.lock:
+            recovered = self.state != self.closed
+            self.state = self.closed
+            self.failures = 0
+        if recovered:
+            logger.info("Redis is reachable again, circuit breaker closed")
+            for hook in self.recovery_hooks:
+                try:
+                    hook()
+                except Exception as e:
+                    logger.error(f"Redis recovery hook {hook.__name__} failed: {str(e)}")
+
+    def failed(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.half_open or self.failures >= settings.REDIS_BREAKER_FAILURES:
+                if self.state != self.open:
+                    logger.error(f"Redis unavailable after {self.failures} failures, circuit breaker open")
+                self.state = self.open
+                self.opened_at = time.monotonic()
+
+    @contextmanager
+    def guard(self):
+        """
+        Run the block against Redis, turning an outage into CacheUnavailable.
+        """
+        if not self.allow():
+            raise CacheUnavailable("Redis circuit breaker is open")
+        try:
+            yield
+        except Exception as e:
+            if not is_outage(e):
+                # Redis answered, even if with an error.
+                self.succeeded()
+                raise
+            self.failed()
+            raise CacheUnavailable(str(e)) from e
+        self.succeeded()
+
+
+breaker = CircuitBreaker()
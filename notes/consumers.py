@@ -0,0 +1,66 @@
+import asyncio
+from urllib.parse import parse_qs
+from loguru import logger
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+import orjson
+from .events import get_layer, user_channel
+
+
+class NoteEventsConsumer:
+
+    """
+    ASGI WebSocket application pushing the change events of every note visible
+    to the connected user. Browsers cannot set headers on a WebSocket, so the
+    JWT access token comes in the ``token`` query parameter. Once subscribed the
+    client is told it can stop polling the note lists.
+    """
+
+    async def __call__(self, scope, receive, send):
+        message = await receive()
+        if message['type'] != 'websocket.connect':
+            return
+
+        user_id = self.authenticate(scope)
+        if user_id is None:
+            await send({'type': 'websocket.close', 'code': 4401})
+            return
+
+        subscription = await get_layer().subscribe([user_channel(user_id)])
+        events = None
+        try:
+            await send({'type': 'websocket.accept'})
+            await send({'type': 'websocket.send', 'text': orjson.dumps({'event': 'ready', 'poll': False}).decode()})
+            events = asyncio.ensure_future(self.forward(user_id, subscription, send))
+            while True:
+                message = await receive()
+                if message['type'] == 'websocket.disconnect':
+                    break
+        finally:
+            if events is not None:
+                events.cancel()
+                try:
+                    await events
+                except asyncio.CancelledError:
+                    pass
+            await subscription.close()
+
+    def authenticate(self, scope):
+        token = parse_qs(scope.get('query_string', b'').decode()).get('token')
+        if not token:
+            return None
+        try:
+            return AccessToken(token[0])[api_settings.USER_ID_CLAIM]
+        except (TokenError, KeyError):
+            return None
+
+    async def forward(self, user_id, subscription, send):
+        try:
+            async for event in subscription:
+                await send({'type': 'websocket.send', 'text': event.decode() if isinstance(event, bytes) else event})
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Note event stream of user {user_id} failed: {str(e)}")
+            await send({'type': 'websocket.close', 'code': 1011})
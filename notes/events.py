@@ -0,0 +1,128 @@
+import asyncio
+import threading
+from collections import defaultdict
+from django.conf import settings
+from django.utils.module_loading import import_string
+from django_redis import get_redis_connection
+from loguru import logger
+import orjson
+
+
+def user_channel(user_id):
+    return f"note_events_user_{user_id}"
+
+
+class RedisSubscription:
+
+    def __init__(self, client, pubsub):
+        self.client = client
+        self.pubsub = pubsub
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while True:
+            message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=None)
+            if message is not None:
+                return message['data']
+
+    async def close(self):
+        await self.pubsub.aclose()
+        await self.client.aclose()
+
+
+class RedisEventLayer:
+
+    """
+    Delivers events between processes with Redis pub/sub. Publishing goes
+    through the cache connection pool; every WebSocket subscribes on its own
+    asyncio connection.
+    """
+
+    def publish(self, channel, message):
+        get_redis_connection("default").publish(channel, message)
+
+    async def subscribe(self, channels):
+        """
+        Return an async iterator of the messages published to the channels from
+        now on, with a close() coroutine.
+        """
+        from redis.asyncio import Redis
+
+        client = Redis.from_url(settings.NOTE_EVENTS_REDIS_URL)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(*channels)
+        return RedisSubscription(client, pubsub)
+
+
+class InMemorySubscription:
+
+    def __init__(self, layer, channels):
+        self.layer = layer
+        self.channels = channels
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.queue.get()
+
+    def put(self, message):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, message)
+
+    async def close(self):
+        self.layer.unsubscribe(self)
+
+
+class InMemoryEventLayer:
+
+    """
+    Delivers events to subscribers in the same process, for tests and single
+    process development servers.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = defaultdict(set)
+
+    def publish(self, channel, message):
+        with self.lock:
+            subscribers = list(self.subscribers[channel])
+        for subscription in subscribers:
+            subscription.put(message)
+
+    async def subscribe(self, channels):
+        subscription = InMemorySubscription(self, channels)
+        with self.lock:
+            for channel in channels:
+                self.subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for channel in subscription.channels:
+                self.subscribers[channel].discard(subscription)
+
+
+_layers = {}
+
+
+def get_layer():
+    path = settings.NOTE_EVENTS_LAYER
+    if path not in _layers:
+        _layers[path] = import_string(path)()
+    return _layers[path]
+
+
+def publish_to_users(user_ids, event):
+    message = orjson.dumps(event)
+    layer = get_layer()
+    for user_id in set(user_ids):
+        try:
+            layer.publish(user_channel(user_id), message)
+        except Exception as e:
+            # Pushes are best effort; clients resync from the list API.
+            logger.error(f"Could not publish {event['event']} to user {user_id}: {str(e)}")
@@ -0,0 +1,161 @@
+import orjson
+from django.conf import settings
+from django.db import transaction
+from loguru import logger
+from fundoonote.renderers import ORJSONRenderer
+from .autosave import AutosaveBuffer, overlay
+from .breaker import CacheUnavailable
+from .models import Note, NoteAccess
+from .projections import NoteProjection
+from .redisutil import RedisUtils
+
+
+def fragment_key(note_id, version, projection='full'):
+    return f"note_{note_id}_v{version}_{projection}_json"
+
+
+# The cached lists of a user: the main note list and the archived and trashed views.
+LIST_NAMES = (None, 'archived_notes', 'trashed_notes')
+
+
+def list_index_key(user_id, name=None):
+    return f"user_{user_id}_{name}" if name else f"user_{user_id}"
+
+
+def list_queryset(user_id, name=None):
+    """
+    The notes of one of the user's cached lists, in list order.
+    """
+    if name == 'archived_notes':
+        return Note.objects.filter(user_id=user_id, is_archive=True).order_by('id')
+    if name == 'trashed_notes':
+        return Note.objects.filter(user_id=user_id, is_trash=True).order_by('id')
+    return Note.objects.filter(access_set__user_id=user_id, is_archive=False, is_trash=False).order_by('id')
+
+
+def user_list_keys(user_ids):
+    # Dropping the reminders generation orphans every cached reminders page too.
+    return [list_index_key(user_id, name) for user_id in user_ids for name in LIST_NAMES + ('reminders',)]
+
+
+def invalidate_user_lists(user_ids):
+    """
+    Drop the cached note, archived and trashed list indexes and the reminders
+    pages of the users.
+    """
+    RedisUtils("notes").delete_many(user_list_keys(user_ids))
+
+
+def invalidate_note_lists(note_ids, user_ids=()):
+    """
+    Drop the cached list indexes of every user who can see one of the notes (and
+    of the extra user_ids, e.g. a collaborator whose access was just revoked).
+    """
+    user_ids = set(user_ids) | set(NoteAccess.objects.filter(note_id__in=note_ids).values_list('user_id', flat=True))
+    invalidate_user_lists(user_ids)
+
+
+def evict_own_caches(user_id, note_id):
+    """
+    Once the current transaction commits, drop the acting user's list indexes
+    and cached detail of the note, so their next read shows the change without
+    waiting for the outbox drain, which still handles everyone else's caches.
+    """
+    def evict():
+        try:
+            RedisUtils("notes").delete_many(user_list_keys([user_id]) + [f"user_{user_id}_note_{note_id}"])
+        except CacheUnavailable as e:
+            logger.warning(f"Caches of user {user_id} not dropped after a change to note {note_id}: {str(e)}")
+    transaction.on_commit(evict)
+
+
+class NoteFragmentCache:
+
+    """
+    Cache every note as ready-to-send JSON bytes keyed by its id, version and
+    projection, plus a small index of (id, version) pairs per list. A list
+    response is the envelope with the fragments joined in, so a cache hit never
+    decodes or re-encodes a note; on a miss only the missing notes are serialized.
+    """
+
+    renderer = ORJSONRenderer()
+
+    def __init__(self):
+        self.redis = RedisUtils("notes")
+        # Fragments are keyed by note, not user, so they stay on the default cache.
+        self.fragment_store = RedisUtils()
+        self.autosave = AutosaveBuffer()
+
+    def render_many(self, queryset, projection):
+        """
+        Yield (id, version, JSON bytes) for the notes of queryset, through the
+        values() fast path unless NOTE_FAST_SERIALIZER is off.
+        """
+        if settings.NOTE_FAST_SERIALIZER:
+            for row, data in projection.values(queryset):
+                yield row['id'], row['version'], self.renderer.render(data)
+        else:
+            for note in projection.apply(queryset):
+                yield note.id, note.version, self.renderer.render(projection.serialize(note))
+
+    def index(self, key, queryset):
+        pairs = self.redis.get(key)
+        if pairs is None:
+            pairs = list(queryset.values_list('id', 'version'))
+            self.redis.save(key, pairs, ex=settings.NOTE_LIST_CACHE_TIMEOUT, adaptive=True)
+        return pairs
+
+    def fragments(self, pairs, queryset, projection):
+        if not pairs:
+            return []
+        keys = [fragment_key(note_id, version, projection.name) for note_id, version in pairs]
+        cached = self.fragment_store.get_many(keys, raw=True)
+        found = [cached.get(key) for key in keys]
+
+        missing = [note_id for (note_id, _), fragment in zip(pairs, found) if fragment is None]
+        if missing:
+            rendered, fresh = {}, {}
+            for note_id, version, fragment in self.render_many(queryset.filter(id__in=missing), projection):
+                rendered[note_id] = fresh[fragment_key(note_id, version, projection.name)] = fragment
+            self.fragment_store.set_many(fresh, ex=settings.NOTE_FRAGMENT_TIMEOUT, raw=True)
+            # Notes deleted or hidden since the index was built are left out.
+            found = [fragment if fragment is not None else rendered.get(note_id) for (note_id, _), fragment in zip(pairs, found)]
+
+        # Autosaved edits not flushed yet are applied on top of the cached fragments.
+        buffered = self.autosave.read_many(note_id for note_id, _ in pairs)
+        if buffered:
+            found = [
+                self.renderer.render(overlay(orjson.loads(fragment), buffered[note_id])) if note_id in buffered and fragment is not None else fragment
+                for (note_id, _), fragment in zip(pairs, found)
+            ]
+
+        return [fragment for fragment in found if fragment is not None]
+
+    def list_response(self, key, queryset, envelope, projection=None):
+        """
+        Return the JSON body of envelope with the notes of the list cached
+        under key as its "data", in the given projection. While Redis is
+        unavailable the notes are rendered straight from the database.
+        """
+        projection = projection or NoteProjection()
+        try:
+            if not self.redis.available():
+                raise CacheUnavailable("Redis circuit breaker is open")
+            body = b','.join(self.fragments(self.index(key, queryset), queryset, projection))
+        except CacheUnavailable:
+            body = b','.join(fragment for _, _, fragment in self.render_many(queryset, projection))
+        return self.renderer.render(envelope)[:-1] + b',"data":[' + body + b']}'
+
+    def warm(self, user_id, projections=None):
+        """
+        Build the index and fragments of each of the user's lists that are not
+        cached yet, and return how many notes were rendered.
+        """
+        projections = projections or [NoteProjection.named(name) for name in settings.NOTE_WARMUP_PROJECTIONS]
+        rendered = 0
+        for name in LIST_NAMES:
+            queryset = list_queryset(user_id, name)
+            pairs = self.index(list_index_key(user_id, name), queryset)
+            for projection in projections:
+                rendered += len(self.fragments(pairs, queryset, projection))
+        return rendered
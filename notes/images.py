@@ -0,0 +1,131 @@
+import io
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from PIL import Image, ImageOps
+from .models import Note, ImageBlob
+from .storage import BLOB_NAME_RE
+
+
+# Marks a note loaded without its image column, whose stored image is unknown.
+DEFERRED = object()
+
+
+def stored_image(note):
+    return note.__dict__.get('image', DEFERRED)
+
+
+def image_name(value):
+    return getattr(value, 'name', value) or None
+
+
+def retain(name):
+    """
+    Count one more note using the blob, creating its row on first use.
+    """
+    while not ImageBlob.objects.filter(name=name).update(refcount=F('refcount') + 1):
+        try:
+            with transaction.atomic():
+                storage = Note._meta.get_field('image').storage
+                ImageBlob.objects.create(name=name, refcount=1, size=storage.size(name) if storage.exists(name) else 0)
+            return
+        except IntegrityError:
+            # Another upload created the row first; increment it instead.
+            continue
+
+
+def release(name):
+    ImageBlob.objects.filter(name=name, refcount__gt=0).update(refcount=F('refcount') - 1)
+
+
+def release_many(names):
+    """
+    Count one note fewer per occurrence of each name, with one update per
+    distinct count rather than one per note.
+    """
+    by_count = defaultdict(list)
+    for name, count in Counter(name for name in names if name).items():
+        by_count[count].append(name)
+    for count, names_of_count in by_count.items():
+        ImageBlob.objects.filter(name__in=names_of_count).update(refcount=Greatest(F('refcount') - count, 0))
+
+
+def previous_image(note):
+    """
+    Return the image name the note had when it was loaded (looked up when the
+    column was deferred), or None for new notes.
+    """
+    if note._state.adding:
+        return None
+    previous = getattr(note, '_stored_image', DEFERRED)
+    if previous is DEFERRED:
+        previous = Note.objects.filter(pk=note.pk).values_list('image', flat=True).first()
+    return image_name(previous)
+
+
+def track_image_change(note, previous):
+    """
+    Move the note's reference from its previous image blob to its current one
+    and give the note the derivatives of its new image. Returns the new image
+    name when its derivatives still have to be generated.
+    """
+    if 'image' not in note.__dict__:
+        return None
+    current = image_name(note.__dict__['image'])
+    note._stored_image = current
+    if current == previous:
+        return None
+
+    if current:
+        retain(current)
+    if previous:
+        release(previous)
+
+    derivatives = ImageBlob.objects.filter(name=current).values_list('derivatives', flat=True).first() if current else None
+    if derivatives != note.image_derivatives:
+        # Bump the version too, so no cached rendering keeps the old derivatives.
+        Note.objects.filter(pk=note.pk).update(image_derivatives=derivatives, version=F('version') + 1)
+        note.image_derivatives = derivatives
+    if current and derivatives is None and BLOB_NAME_RE.fullmatch(current):
+        return current
+    return None
+
+
+def derivative_name(name, variant, image_format):
+    extension = 'jpg' if image_format == 'jpeg' else image_format
+    return f"{name.rsplit('.', 1)[0]}-{variant}.{extension}"
+
+
+def build_derivatives(storage, name):
+    """
+    Write every configured size of the image in every configured format and
+    return {variant: {format: name}}. Images are only ever scaled down.
+    """
+    largest = max(settings.NOTE_IMAGE_DERIVATIVE_SIZES.values())
+    with storage.open(name) as fh:
+        image = Image.open(fh)
+        # Lets the JPEG decoder skip detail the largest derivative cannot use.
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image)
+
+    derivatives = {}
+    for variant, size in settings.NOTE_IMAGE_DERIVATIVE_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+        for image_format in settings.NOTE_IMAGE_DERIVATIVE_FORMATS:
+            output = resized
+            if image_format == 'jpeg' and resized.mode not in ('RGB', 'L'):
+                output = resized.convert('RGB')
+            buffer = io.BytesIO()
+            output.save(buffer, format=image_format.upper(), quality=settings.NOTE_IMAGE_DERIVATIVE_QUALITY)
+            derivatives.setdefault(variant, {})[image_format] = storage.save_derivative(
+                derivative_name(name, variant, image_format), buffer.getvalue()
+            )
+    return derivatives
+
+
+def derivative_urls(derivatives):
+    storage = Note._meta.get_field('image').storage
+    return {variant: {image_format: storage.url(name) for image_format, name in formats.items()} for variant, formats in derivatives.items()}
@@ -0,0 +1,129 @@
+from itertools import islice
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import SkipField
+from label.models import Label
+from .bulk import reserve_ids, copy_instances
+from .models import Note, NoteAccess
+from .outbox import record
+from .reminders import schedule_reminders
+from .serializers import NoteImportSerializer
+
+
+class NoteImporter:
+
+    """
+    Imports many notes for one user. Rows are validated a batch at a time with a
+    single serializer instance, inserted with bulk_create (or COPY when asked to),
+    and labels, visibility rows and reminders are attached in bulk. Dict rows
+    are checked with the serializer's fields directly (see validate_fields).
+    Invalid rows are reported by index without aborting the rest of the import.
+    """
+
+    def __init__(self, user, batch_size=None):
+        self.user = user
+        self.batch_size = batch_size or settings.NOTE_IMPORT_BATCH_SIZE
+        self.label_ids = set(Label.objects.filter(user=user).values_list('id', flat=True))
+
+    @staticmethod
+    def plain_fields(serializer):
+        """
+        The serializer's writable fields when a row can be validated by running
+        them one by one, or None when the serializer adds validate_<field>
+        methods and every row has to go through it.
+        """
+        fields = [field for field in serializer.fields.values() if not field.read_only]
+        if any(hasattr(serializer, f'validate_{field.field_name}') for field in fields):
+            return None
+        return fields
+
+    @staticmethod
+    def validate_fields(fields, row):
+        """
+        Validate a dict row with the serializer's own field objects, as its
+        to_internal_value does, without the serializer machinery around them.
+        Raises the same ValidationError the serializer would.
+        """
+        data = {}
+        errors = {}
+        for field in fields:
+            try:
+                data[field.source] = field.run_validation(field.get_value(row))
+            except ValidationError as e:
+                errors[field.field_name] = e.detail
+            except SkipField:
+                pass
+        if errors:
+            raise ValidationError(errors)
+        return data
+
+    def run(self, rows, use_copy=False):
+        created = 0
+        errors = []
+        rows = iter(rows)
+        offset = 0
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            notes, labels = self.validate(batch, offset, errors)
+            if notes:
+                with transaction.atomic():
+                    self.insert(notes, labels, use_copy)
+                    # One event per batch drops the user's cached lists, rather than one per note.
+                    record('user', 'imported', self.user.id, count=len(notes))
+                created += len(notes)
+            offset += len(batch)
+
+        return {'created': created, 'errors': errors}
+
+    def validate(self, batch, offset, errors):
+        serializer = NoteImportSerializer()
+        fields = self.plain_fields(serializer)
+        now = timezone.now()
+        notes = []
+        labels = []
+        for index, row in enumerate(batch, start=offset):
+            try:
+                if fields is not None and type(row) is dict:
+                    data = self.validate_fields(fields, row)
+                else:
+                    data = serializer.to_internal_value(row)
+            except ValidationError as e:
+                errors.append({'row': index, 'errors': e.detail})
+                continue
+
+            label_ids = data.pop('label', [])
+            if not self.label_ids.issuperset(label_ids):
+                unknown = [label_id for label_id in label_ids if label_id not in self.label_ids]
+                errors.append({'row': index, 'errors': {'label': [f"Labels not found: {unknown}"]}})
+                continue
+
+            note = Note(user=self.user, **data)
+            if note.is_trash:
+                note.trashed_at = now
+            notes.append(note)
+            labels.append(label_ids)
+        return notes, labels
+
+    def insert(self, notes, labels, use_copy):
+        if use_copy:
+            for note, note_id in zip(notes, reserve_ids(Note, len(notes))):
+                note.id = note_id
+            copy_instances(Note, notes)
+        else:
+            Note.objects.bulk_create(notes)
+
+        access = [NoteAccess(user_id=self.user.id, note_id=note.id, access_type=NoteAccess.owner) for note in notes]
+        note_labels = [Note.label.through(note_id=note.id, label_id=label_id)
+                       for note, label_ids in zip(notes, labels) for label_id in label_ids]
+        if use_copy:
+            for obj, obj_id in zip(access, reserve_ids(NoteAccess, len(access))):
+                obj.id = obj_id
+            copy_instances(NoteAccess, access)
+        else:
+            NoteAccess.objects.bulk_create(access)
+        Note.label.through.objects.bulk_create(note_labels)
+        schedule_reminders(notes, use_copy=use_copy)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from notes.access import note_id_batches, sync_note_access
+
+
+class Command(BaseCommand):
+    help = "Populate the NoteAccess visibility table from note owners and collaborators."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Number of notes synced per transaction.")
+
+    def handle(self, *args, **options):
+        totals = {'missing': 0, 'stale': 0, 'mismatched': 0}
+        for note_ids in note_id_batches(options['batch_size']):
+            drift = sync_note_access(note_ids, fix=True)
+            for key, count in drift.items():
+                totals[key] += count
+
+        self.stdout.write(self.style.SUCCESS(
+            f"NoteAccess backfilled: {totals['missing']} added, {totals['stale']} removed, {totals['mismatched']} corrected"
+        ))
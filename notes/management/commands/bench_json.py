@@ -0,0 +1,62 @@
+import io
+import random
+import timeit
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from fundoonote.parsers import ORJSONParser
+from fundoonote.renderers import ORJSONRenderer
+
+
+WORDS = "meeting notes plan idea todo call buy review draft project weekly budget travel release".split()
+
+
+def note_rows(count, seed):
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+    return [{
+        'id': note_id,
+        'title': " ".join(rng.choice(WORDS) for _ in range(4)),
+        'description': " ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 120))),
+        'color': rng.choice(["white", "red", "blue"]),
+        'image': None,
+        'is_archive': False,
+        'is_trash': False,
+        'reminder': start + timedelta(minutes=rng.randrange(525600)) if rng.random() < 0.3 else None,
+        'user': 1,
+        'label': rng.sample(range(1, 50), rng.randint(0, 3)),
+        'collaborator': [],
+        'weight': Decimal("1.50"),
+    } for note_id in range(1, count + 1)]
+
+
+class Command(BaseCommand):
+    help = "Compare DRF's stdlib JSON renderer and parser with the orjson ones on note-shaped payloads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--notes', type=int, default=5000, help="Notes in the rendered list.")
+        parser.add_argument('--import-rows', type=int, default=20000, help="Rows in the parsed bulk import payload.")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per case; the best one is reported.")
+
+    def best(self, func, repeat):
+        return min(timeit.repeat(func, number=1, repeat=repeat)) * 1000
+
+    def compare(self, name, baseline, fast, repeat):
+        slow_ms = self.best(baseline, repeat)
+        fast_ms = self.best(fast, repeat)
+        self.stdout.write(f"{name:<28} json {slow_ms:9.1f} ms   orjson {fast_ms:9.1f} ms   {slow_ms / fast_ms:5.1f}x")
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        envelope = {"Message": "The list of notes of user ", "status": "Sucess", "data": note_rows(options['notes'], 1)}
+        payload = JSONRenderer().render({"notes": note_rows(options['import_rows'], 2)})
+
+        self.compare(f"render {options['notes']} notes",
+                     lambda: JSONRenderer().render(envelope),
+                     lambda: ORJSONRenderer().render(envelope), repeat)
+        self.compare(f"parse {options['import_rows']} import rows",
+                     lambda: JSONParser().parse(io.BytesIO(payload)),
+                     lambda: ORJSONParser().parse(io.BytesIO(payload)), repeat)
+        self.stdout.write(f"bulk payload size {len(payload) / 1024:.0f} KiB")
@@ -0,0 +1,37 @@
+import timeit
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from fundoonote.renderers import ORJSONRenderer
+from notes.models import Note
+from notes.projections import NoteProjection
+from user.models import User
+
+
+class Command(BaseCommand):
+    help = "Compare the per-note cost of rendering a note list through NoteSerializer and through the values() fast path."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', help="User whose notes are rendered; defaults to the user with the most notes.")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per path; the best one is reported.")
+
+    def handle(self, *args, **options):
+        if options['email']:
+            user = User.objects.filter(email=options['email']).first()
+        else:
+            user = User.objects.annotate(notes=Count('note_access_set')).order_by('-notes').first()
+        if user is None:
+            raise CommandError("No user to benchmark; run seed_fundoo first")
+
+        queryset = Note.objects.filter(access_set__user=user).order_by('id')
+        count = queryset.count()
+        if not count:
+            raise CommandError(f"{user.email} has no notes")
+        renderer = ORJSONRenderer()
+
+        for projection in (NoteProjection(), NoteProjection(NoteProjection.summary_fields, 'summary')):
+            slow = min(timeit.repeat(lambda: [renderer.render(projection.serialize(note)) for note in projection.apply(queryset)], number=1, repeat=options['repeat']))
+            fast = min(timeit.repeat(lambda: [renderer.render(data) for _, data in projection.values(queryset)], number=1, repeat=options['repeat']))
+            self.stdout.write(
+                f"{projection.name:<8} {count} notes   serializer {slow * 1e6 / count:7.1f} us/note   "
+                f"values {fast * 1e6 / count:7.1f} us/note   {slow / fast:4.1f}x"
+            )
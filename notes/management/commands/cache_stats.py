@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from notes.redisutil import hit_stats, hot_keys, largest_values, reset_stats
+
+
+class Command(BaseCommand):
+    help = "Show the hottest cache keys, the largest cached values and the hit rate, estimated from sampled reads and writes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20, help="How many keys to list.")
+        parser.add_argument('--reset', action='store_true', help="Clear the stats after printing them.")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Hot keys (estimated reads):")
+        for key, reads in hot_keys(options['top']):
+            self.stdout.write(f"  {key:<48} {reads:.0f}")
+
+        self.stdout.write("Largest values (bytes):")
+        for key, size in largest_values(options['top']):
+            self.stdout.write(f"  {key:<48} {size}")
+
+        stats = hit_stats()
+        reads = stats.get('hits', 0) + stats.get('misses', 0)
+        if reads:
+            self.stdout.write(self.style.SUCCESS(f"Hit rate {100 * stats.get('hits', 0) / reads:.1f}% of ~{reads:.0f} reads"))
+
+        if options['reset']:
+            reset_stats()
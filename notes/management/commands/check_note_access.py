@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from notes.access import note_id_batches, sync_note_access
+
+
+class Command(BaseCommand):
+    help = "Verify that the NoteAccess visibility table matches note owners and collaborators."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Number of notes checked per query batch.")
+        parser.add_argument('--fix', action='store_true', help="Repair any drift that is found.")
+
+    def handle(self, *args, **options):
+        totals = {'missing': 0, 'stale': 0, 'mismatched': 0}
+        for note_ids in note_id_batches(options['batch_size']):
+            drift = sync_note_access(note_ids, fix=options['fix'])
+            for key, count in drift.items():
+                totals[key] += count
+
+        summary = f"{totals['missing']} missing, {totals['stale']} stale, {totals['mismatched']} mismatched"
+        if not any(totals.values()):
+            self.stdout.write(self.style.SUCCESS("NoteAccess is consistent"))
+        elif options['fix']:
+            self.stdout.write(self.style.WARNING(f"NoteAccess drift repaired: {summary}"))
+        else:
+            raise CommandError(f"NoteAccess drift found: {summary}")
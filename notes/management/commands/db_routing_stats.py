@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django_redis import get_redis_connection
+from fundoonote.db_router import ROUTING_STATS_KEY, flush_stats
+
+
+class Command(BaseCommand):
+    help = "Show how many queries the replica router sent to each database alias, and why."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Clear the counters after printing them.")
+
+    def handle(self, *args, **options):
+        flush_stats(force=True)
+        redis = get_redis_connection("default")
+        stats = {field.decode(): int(count) for field, count in redis.hgetall(ROUTING_STATS_KEY).items()}
+
+        reads = sum(count for field, count in stats.items() if not field.endswith(':write'))
+        for field in sorted(stats):
+            alias, reason = field.split(':', 1)
+            self.stdout.write(f"{alias:<12} {reason:<16} {stats[field]}")
+        replica_reads = sum(count for field, count in stats.items() if field.endswith(':replica'))
+        if reads:
+            self.stdout.write(self.style.SUCCESS(f"{replica_reads}/{reads} reads served by replicas ({100 * replica_reads / reads:.1f}%)"))
+
+        if options['reset']:
+            redis.delete(ROUTING_STATS_KEY)
@@ -0,0 +1,47 @@
+import json
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from notes.importer import NoteImporter
+from user.models import User
+
+
+class Command(BaseCommand):
+    help = "Bulk import notes for a user from a JSON array or NDJSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help="Email of the user who will own the notes.")
+        parser.add_argument('path', help="JSON array (.json) or one JSON object per line (.ndjson).")
+        parser.add_argument('--batch-size', type=int, default=None, help="Rows validated and inserted per transaction.")
+        parser.add_argument('--copy', action='store_true', help="Always insert with COPY, whatever the file size.")
+
+    def read_rows(self, path):
+        if path.endswith('.json'):
+            with open(path, encoding='utf-8') as fh:
+                yield from json.load(fh)
+            return
+        with open(path, encoding='utf-8') as fh:
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+
+    def count_rows(self, path):
+        if path.endswith('.json'):
+            with open(path, encoding='utf-8') as fh:
+                return len(json.load(fh))
+        with open(path, 'rb') as fh:
+            return sum(1 for line in fh if line.strip())
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(email=options['email']).first()
+        if user is None:
+            raise CommandError(f"User {options['email']} not found")
+
+        path = options['path']
+        use_copy = options['copy'] or self.count_rows(path) >= settings.NOTE_IMPORT_COPY_THRESHOLD
+        result = NoteImporter(user, batch_size=options['batch_size']).run(self.read_rows(path), use_copy=use_copy)
+
+        for error in result['errors']:
+            self.stderr.write(f"row {error['row']}: {json.dumps(error['errors'])}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['created']} notes for {user.email} ({len(result['errors'])} rows rejected)"
+        ))
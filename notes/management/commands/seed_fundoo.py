@@ -0,0 +1,147 @@
+import multiprocessing
+import random
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from label.models import Label
+from notes.bulk import reserve_ids, copy_instances
+from notes.models import Note, Collaborator, NoteAccess
+from user.models import User
+
+
+SEED_PASSWORD = "Fundoo1234"
+COLORS = ["white", "red", "orange", "yellow", "green", "teal", "blue", "purple", "pink", "gray"]
+WORDS = ("meeting notes plan idea todo call buy review draft project weekly budget travel "
+         "recipe book movie gym doctor invoice report client design release bug fix deploy").split()
+# Fixed reference time so reminder and trash timestamps do not depend on when the seed ran.
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def zipf_note_counts(rng, users, max_notes, exponent):
+    """
+    Give each user a note count following Zipf's law: the user at rank k owns
+    about max_notes / k**exponent notes. Ranks are shuffled across users.
+    """
+    ranks = list(range(1, users + 1))
+    rng.shuffle(ranks)
+    return [max(1, int(max_notes / rank ** exponent)) for rank in ranks]
+
+
+def sentence(rng, low, high):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def seed_users(job):
+    """
+    Generate and COPY the labels, notes, label links, collaborators and visibility
+    rows of a slice of users. Runs in a worker process; every user's data comes
+    from its own RNG so the result does not depend on how users were split.
+    """
+    seed = job['seed']
+    user_ids = job['user_ids']
+    options = job['options']
+    labels, notes, note_labels, collaborators, access = [], [], [], [], []
+
+    for index, label_ids, note_ids in job['users']:
+        rng = random.Random(f"{seed}-{index}")
+        user_id = user_ids[index]
+
+        for label_id in label_ids:
+            labels.append(Label(id=label_id, name=sentence(rng, 1, 2), color=rng.choice(COLORS), user_id=user_id))
+
+        for note_id in note_ids:
+            is_trash = rng.random() < 0.05
+            reminder = EPOCH + timedelta(minutes=rng.randrange(525600)) if rng.random() < options['reminder_rate'] else None
+            notes.append(Note(
+                id=note_id,
+                title=sentence(rng, 1, 6)[:200],
+                description=sentence(rng, 5, 5 + int(rng.paretovariate(1.5) * 40)),
+                color=rng.choice(COLORS),
+                is_archive=rng.random() < 0.1,
+                is_trash=is_trash,
+                trashed_at=EPOCH if is_trash else None,
+                reminder=reminder,
+                user_id=user_id,
+            ))
+            access.append(NoteAccess(user_id=user_id, note_id=note_id, access_type=NoteAccess.owner))
+
+            for label_id in rng.sample(label_ids, rng.randint(0, min(2, len(label_ids)))):
+                note_labels.append(Note.label.through(note_id=note_id, label_id=label_id))
+
+            if len(user_ids) > 1 and rng.random() < options['collab_rate']:
+                others = {rng.randrange(len(user_ids)) for _ in range(rng.randint(1, 3))} - {index}
+                for other in sorted(others):
+                    access_type = rng.choice([Collaborator.read_only, Collaborator.read_write])
+                    collaborators.append(Collaborator(note_id_id=note_id, user_id_id=user_ids[other], access_type=access_type))
+                    access.append(NoteAccess(user_id=user_ids[other], note_id=note_id, access_type=access_type))
+
+    with transaction.atomic():
+        copy_instances(Label, labels)
+        copy_instances(Note, notes)
+        copy_instances(Note.label.through, note_labels)
+        copy_instances(Collaborator, collaborators)
+        copy_instances(NoteAccess, access)
+    connections.close_all()
+    return len(notes)
+
+
+class Command(BaseCommand):
+    help = "Generate a deterministic, production-shaped dataset for scale testing and EXPLAIN checks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help="Number of users to create.")
+        parser.add_argument('--seed', type=int, default=42, help="Random seed; the same seed gives the same data.")
+        parser.add_argument('--max-notes', type=int, default=2000, help="Notes owned by the most active user.")
+        parser.add_argument('--zipf', type=float, default=1.1, help="Zipf exponent of the notes-per-user distribution.")
+        parser.add_argument('--labels', type=int, default=5, help="Labels per user.")
+        parser.add_argument('--collab-rate', type=float, default=0.05, help="Share of notes with collaborators.")
+        parser.add_argument('--reminder-rate', type=float, default=0.1, help="Share of notes with a reminder.")
+        parser.add_argument('--workers', type=int, default=4, help="Worker processes writing notes in parallel.")
+        parser.add_argument('--batch-users', type=int, default=200, help="Users written per worker transaction.")
+
+    def handle(self, *args, **options):
+        seed = options['seed']
+        rng = random.Random(seed)
+        users = options['users']
+
+        if User.objects.filter(email__startswith=f"seed{seed}-").exists():
+            raise CommandError(f"Seed {seed} has already been loaded into this database")
+
+        # Hashing is deliberately slow, so every seeded user shares one precomputed hash.
+        password = make_password(SEED_PASSWORD, salt=f"fundooseed{seed}")
+        user_objs = [
+            User(email=f"seed{seed}-user{index}@fundoo.test", first_name="Seed", last_name=f"User{index}",
+                 password=password, is_active=True, is_verified=True)
+            for index in range(users)
+        ]
+        User.objects.bulk_create(user_objs, batch_size=5000)
+        user_ids = [user.id for user in user_objs]
+
+        note_counts = zipf_note_counts(rng, users, options['max_notes'], options['zipf'])
+        note_ids = reserve_ids(Note, sum(note_counts))
+        label_ids = reserve_ids(Label, users * options['labels'])
+
+        plan = []
+        note_pos = 0
+        for index, note_count in enumerate(note_counts):
+            label_pos = index * options['labels']
+            plan.append((index, label_ids[label_pos:label_pos + options['labels']], note_ids[note_pos:note_pos + note_count]))
+            note_pos += note_count
+
+        shared = {'seed': seed, 'user_ids': user_ids, 'options': {
+            'labels': options['labels'],
+            'collab_rate': options['collab_rate'],
+            'reminder_rate': options['reminder_rate'],
+        }}
+        step = options['batch_users']
+        jobs = [dict(shared, users=plan[start:start + step]) for start in range(0, len(plan), step)]
+
+        # Forked workers must not share the parent's database connection.
+        connections.close_all()
+        with multiprocessing.get_context('fork').Pool(options['workers']) as pool:
+            total = sum(pool.imap_unordered(seed_users, jobs))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {users} users and {total} notes (seed={seed}, password={SEED_PASSWORD})"
+        ))
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from notes.task import warm_active_users
+
+
+class Command(BaseCommand):
+    help = "Pre-warm the note list caches of the most recently active users, e.g. after a deploy or a Redis flush."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=settings.NOTE_WARMUP_USERS, help="How many users to warm.")
+        parser.add_argument('--hours', type=float, default=settings.NOTE_WARMUP_ACTIVE_HOURS, help="Only users active in the last HOURS.")
+        parser.add_argument('--async', action='store_true', dest='background', help="Queue the warm-up on the Celery workers instead of running it here.")
+
+    def handle(self, *args, **options):
+        active_within = int(options['hours'] * 3600)
+        if options['background']:
+            warm_active_users.delay(options['users'], active_within)
+            self.stdout.write(self.style.SUCCESS("Cache warm-up queued"))
+            return
+        warmed = warm_active_users(options['users'], active_within)
+        self.stdout.write(self.style.SUCCESS(f"Warmed the caches of {warmed} users"))
@@ -0,0 +1,28 @@
+# Generated by Django 5.1 on 2026-10-19 11:35
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def start_trash_clock(apps, schema_editor):
+    # Notes already in the trash start their retention period from this migration.
+    Note = apps.get_model("notes", "Note")
+    Note.objects.filter(is_trash=True, trashed_at__isnull=True).update(
+        trashed_at=timezone.now()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0005_noteaccess"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="note",
+            name="trashed_at",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(start_trash_clock, migrations.RunPython.noop),
+    ]
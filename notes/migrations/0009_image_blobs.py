@@ -0,0 +1,61 @@
+# Generated by Django 5.1 on 2026-10-19 12:11
+
+import notes.storage
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_existing_images(apps, schema_editor):
+    # Images uploaded before the store existed keep their names; record their
+    # references so the garbage collector leaves them alone.
+    Note = apps.get_model("notes", "Note")
+    ImageBlob = apps.get_model("notes", "ImageBlob")
+    images = (
+        Note.objects.exclude(image="")
+        .exclude(image__isnull=True)
+        .values("image")
+        .annotate(refcount=Count("id"))
+    )
+    ImageBlob.objects.bulk_create(
+        [ImageBlob(name=row["image"], refcount=row["refcount"]) for row in images]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0008_note_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImageBlob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, unique=True)),
+                ("size", models.PositiveBigIntegerField(default=0)),
+                ("refcount", models.IntegerField(db_index=True, default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="note",
+            name="image",
+            field=models.ImageField(
+                blank=True,
+                db_index=True,
+                null=True,
+                storage=notes.storage.image_storage,
+                upload_to="",
+            ),
+        ),
+        migrations.RunPython(count_existing_images, migrations.RunPython.noop),
+    ]
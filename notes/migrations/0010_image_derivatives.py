@@ -0,0 +1,23 @@
+# Generated by Django 5.1 on 2026-10-19 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0009_image_blobs"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="imageblob",
+            name="derivatives",
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="note",
+            name="image_derivatives",
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
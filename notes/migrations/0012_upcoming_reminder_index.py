@@ -0,0 +1,28 @@
+# Generated by Django 5.1 on 2026-10-19 13:05
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Built concurrently so the notes table stays writable meanwhile.
+    atomic = False
+
+    dependencies = [
+        ("label", "0002_alter_label_table"),
+        ("notes", "0011_outbox"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="note",
+            index=models.Index(
+                condition=models.Q(("is_trash", False), ("reminder__isnull", False)),
+                fields=["user", "reminder"],
+                name="notes_upcoming_reminder_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1 on 2026-10-19 13:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0012_upcoming_reminder_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReminderDispatch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("reminder", models.DateTimeField()),
+                ("sent_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "note",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reminder_dispatches",
+                        to="notes.note",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("note", "reminder"),
+                        name="notes_reminder_dispatch_unique",
+                    )
+                ],
+            },
+        ),
+    ]
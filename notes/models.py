@@ -1,7 +1,10 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from user.models import User
 from label.models import Label
+from .storage import image_storage
 
 # Create your models here.
     
@@ -9,18 +12,46 @@ class Note(models.Model):
     title = models.CharField(max_length=200,null=False,db_index=True)
     description = models.TextField(null=True,blank=True)
     color = models.CharField(max_length=50,null=True,blank=True)
-    image = models.ImageField(null=True,blank=True)
+    image = models.ImageField(null=True,blank=True,storage=image_storage,db_index=True)
+    image_derivatives = models.JSONField(null=True, blank=True)
     is_archive = models.BooleanField(default=False,db_index=True)
     is_trash = models.BooleanField(default=False,db_index=True)
     reminder = models.DateTimeField(null=True, blank=True)
+    trashed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    version = models.PositiveIntegerField(default=1)
     user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
     collaborator = models.ManyToManyField(User, related_name="collaborator_note_set", through='Collaborator')
     label = models.ManyToManyField(Label,related_name='label')
+
+    class Meta:
+        indexes = [
+            # An owner's upcoming reminders in time order; only set reminders of untrashed notes are indexed.
+            models.Index(fields=['user', 'reminder'], name='notes_upcoming_reminder_idx', condition=Q(reminder__isnull=False, is_trash=False)),
+        ]
       
     
     def __str__(self):
         return self.title
     
+    def save(self, *args, **kwargs):
+        # Keep trashed_at in step with is_trash so the purge task can age trashed notes.
+        if self.is_trash and self.trashed_at is None:
+            self.trashed_at = timezone.now()
+        elif not self.is_trash:
+            self.trashed_at = None
+        # Every change gets a new version, which keys the note's cached JSON.
+        adding = self._state.adding
+        if not adding:
+            self.version = F('version') + 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'version'}
+        # The save signals write visibility and outbox rows, which must commit with the note.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # The post_save receivers may already have read the new version back.
+            if not adding and hasattr(self.version, 'resolve_expression'):
+                self.refresh_from_db(using=self._state.db, fields=['version'])
+    
     
 class Collaborator(models.Model):
     read_only= 'read_only'
@@ -39,7 +70,120 @@ class Collaborator(models.Model):
     class Meta:
         unique_together = ('user_id', 'note_id')
         
+    def save(self, *args, **kwargs):
+        # Keeps the visibility and outbox rows written by the save signals in the same transaction.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        
         
     # def __str__(self):
     #     return f"{self.user.username} - {self.note.title} ({self.access_type})"
-    
\ No newline at end of file
+
+    
+class NoteAccess(models.Model):
+    """
+    Denormalized visibility table: one row for every (user, note) pair the
+    user can see, so listing and permission checks are a single indexed lookup
+    instead of an OR join over notes and collaborators.
+    """
+    owner = 'owner'
+
+    access_type_choices = [(owner, 'Owner')] + Collaborator.access_type_choices
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='note_access_set')
+    note = models.ForeignKey(Note, on_delete=models.CASCADE, related_name='access_set')
+    access_type = models.CharField(max_length=20, choices=access_type_choices, default=owner)
+
+    class Meta:
+        unique_together = ('user', 'note')
+
+    def __str__(self):
+        return f"{self.user_id} - {self.note_id} ({self.access_type})"
+
+
+class ExportJob(models.Model):
+    """
+    A background export of one user's notes, labels and collaborators as NDJSON.
+    """
+    pending = 'pending'
+    running = 'running'
+    completed = 'completed'
+    failed = 'failed'
+
+    status_choices = [
+        (pending, 'Pending'),
+        (running, 'Running'),
+        (completed, 'Completed'),
+        (failed, 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='export_jobs')
+    status = models.CharField(max_length=20, choices=status_choices, default=pending)
+    compress = models.BooleanField(default=False)
+    file_name = models.CharField(max_length=255, null=True, blank=True)
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.user_id} - {self.status}"
+
+
+class ImageBlob(models.Model):
+    """
+    A distinct image file in the content-addressed store and the number of
+    notes using it. Blobs nobody references are removed by the image GC task.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField(default=0)
+    refcount = models.IntegerField(default=0, db_index=True)
+    derivatives = models.JSONField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount})"
+
+
+class OutboxEvent(models.Model):
+    """
+    A side effect of a note, label or collaborator change (cache invalidation,
+    reminder scheduling, pushes), written in the same transaction as the change
+    and applied afterwards, in id order, by the drain_outbox task.
+    """
+    topic = models.CharField(max_length=20)
+    action = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], name='notes_outbox_pending_idx', condition=Q(processed_at__isnull=True)),
+        ]
+
+    def __str__(self):
+        return f"{self.topic}.{self.action} {self.object_id}"
+
+
+
+class ReminderDispatch(models.Model):
+    """
+    A reminder mail that was sent; the unique (note, reminder) pair lets only
+    one send_reminder run mail a given reminder time of a note.
+    """
+    note = models.ForeignKey(Note, on_delete=models.CASCADE, related_name='reminder_dispatches')
+    reminder = models.DateTimeField()
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['note', 'reminder'], name='notes_reminder_dispatch_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.note_id} @ {self.reminder}"
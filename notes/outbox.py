@@ -0,0 +1,145 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from loguru import logger
+from .breaker import CacheUnavailable, breaker, is_outage
+from .events import publish_to_users
+from .fragments import invalidate_user_lists, user_list_keys
+from .models import NoteAccess, OutboxEvent
+from .permissions import incr_access_versions
+from .redisutil import RedisUtils
+from .reminders import sync_reminder
+
+
+# Key of the Postgres advisory lock that lets a single drainer run at a time.
+DRAIN_LOCK_ID = 72_031_043
+KICK_KEY = 'notes_outbox_kick'
+# Note events after which the note's cached permissions must not be used.
+ACCESS_ACTIONS = ('shared', 'unshared', 'deleted')
+
+handlers = {}
+
+
+def handles(topic):
+    def register(handler):
+        handlers[topic] = handler
+        return handler
+    return register
+
+
+def record(topic, action, object_id, **payload):
+    """
+    Append an event to the outbox in the current transaction; the drain is
+    queued once it commits.
+    """
+    OutboxEvent.objects.create(topic=topic, action=action, object_id=object_id, payload=payload)
+    transaction.on_commit(kick)
+
+
+def record_many(topic, action, object_ids, **payload):
+    OutboxEvent.objects.bulk_create([OutboxEvent(topic=topic, action=action, object_id=object_id, payload=payload) for object_id in object_ids])
+    transaction.on_commit(kick)
+
+
+def kick():
+    """
+    Queue a drain unless one is already queued. A failure here only delays the
+    events until the periodic drain.
+    """
+    from .task import drain_outbox
+
+    try:
+        with breaker.guard():
+            queue = cache.add(KICK_KEY, 1, settings.NOTE_OUTBOX_KICK_TIMEOUT)
+        if queue:
+            drain_outbox.delay()
+    except Exception as e:
+        logger.error(f"Could not queue the outbox drain: {str(e)}")
+
+
+def release_kick():
+    cache.delete(KICK_KEY)
+
+
+def drain(batch_size=None):
+    """
+    Apply pending events in id order, a batch per transaction, and return how
+    many were applied. A failing event stops the drain so nothing overtakes it;
+    after NOTE_OUTBOX_MAX_ATTEMPTS it is set aside with its error. A Redis
+    outage is not the event's fault and does not use up its attempts. Returns 0
+    at once while another drain holds the lock.
+    """
+    batch_size = batch_size or settings.NOTE_OUTBOX_BATCH_SIZE
+    applied = 0
+    while True:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_try_advisory_xact_lock(%s)", [DRAIN_LOCK_ID])
+                if not cursor.fetchone()[0]:
+                    return applied
+
+            events = list(OutboxEvent.objects.filter(processed_at__isnull=True).order_by('id')[:batch_size])
+            done = []
+            blocked = False
+            for event in events:
+                try:
+                    with transaction.atomic():
+                        handlers[event.topic](event)
+                except Exception as e:
+                    logger.error(f"Outbox event {event.id} ({event.topic}.{event.action}) failed: {str(e)}")
+                    if is_outage(e):
+                        blocked = True
+                        break
+                    give_up = event.attempts + 1 >= settings.NOTE_OUTBOX_MAX_ATTEMPTS
+                    OutboxEvent.objects.filter(id=event.id).update(
+                        attempts=event.attempts + 1, error=str(e), processed_at=timezone.now() if give_up else None,
+                    )
+                    if not give_up:
+                        blocked = True
+                        break
+                    continue
+                done.append(event.id)
+            OutboxEvent.objects.filter(id__in=done).update(processed_at=timezone.now())
+
+        applied += len(done)
+        if blocked or len(events) < batch_size:
+            return applied
+
+
+def detail_keys(user_ids, note_id):
+    return [f"user_{user_id}_note_{note_id}" for user_id in user_ids]
+
+
+@handles('note')
+def apply_note_event(event):
+    """
+    Drop the cached lists and detail of everyone who can see the note (plus the
+    users named in the event), sync its reminder task and push the change.
+    Sharing changes bump the access version once more, so a bump the change
+    itself lost is retried with the event.
+    """
+    payload = event.payload
+    if event.action in ACCESS_ACTIONS and not incr_access_versions([event.object_id]):
+        raise CacheUnavailable(f"Could not bump the access version of note {event.object_id}")
+    viewers = set(payload.get('user_ids', ())) | set(NoteAccess.objects.filter(note_id=event.object_id).values_list('user_id', flat=True))
+    RedisUtils("notes").delete_many(user_list_keys(viewers) + detail_keys(viewers, event.object_id))
+    if 'reminder' in payload:
+        sync_reminder(event.object_id, parse_datetime(payload['reminder']) if payload['reminder'] else None)
+
+    message = {'event': f'note.{event.action}', 'note': event.object_id}
+    if 'version' in payload:
+        message['version'] = payload['version']
+    publish_to_users(viewers, message)
+
+
+@handles('user')
+def apply_user_event(event):
+    invalidate_user_lists([event.object_id])
+    publish_to_users([event.object_id], {'event': f'notes.{event.action}', **event.payload})
+
+
+@handles('label')
+def apply_label_event(event):
+    publish_to_users([event.payload['user_id']], {'event': f'label.{event.action}', 'label': event.object_id})
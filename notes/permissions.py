@@ -0,0 +1,154 @@
+from collections import namedtuple
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from .models import Note, NoteAccess
+from .breaker import breaker
+from .redisutil import RedisUtils
+
+
+# Counter moved on whenever an access version bump was lost, such as while
+# Redis was unavailable, so every cached access entry is dropped.
+ACCESS_EPOCH_KEY = 'note_access_epoch'
+
+NoteAccessResult = namedtuple('NoteAccessResult', ['note', 'owner_id', 'access_type'])
+
+
+def access_version_key(note_id):
+    return f"note_{note_id}_access_version"
+
+
+def bump_access_version(note_id):
+    """
+    Invalidate every cached access entry of a note by moving it to a new version.
+    """
+    bump_access_versions([note_id])
+
+
+def bump_access_versions(note_ids):
+    """
+    Move the notes to new access versions now and again once the current
+    transaction commits: a read racing the change can still cache the old rows
+    under the first new version, but never under the one set after the commit.
+    """
+    note_ids = list(note_ids)
+    if not incr_access_versions(note_ids):
+        access_bump_lost()
+    transaction.on_commit(lambda: incr_access_versions(note_ids) or access_bump_lost())
+
+
+def incr_access_versions(note_ids):
+    """
+    Increment the access versions in one round trip; False when any increment
+    did not reach Redis.
+    """
+    redis = RedisUtils()
+    with redis.pipeline() as pipe:
+        results = [pipe.command('incr', redis.cache.make_key(access_version_key(note_id))) for note_id in note_ids]
+    return all(result.value is not None for result in results)
+
+
+# Set while an access version bump is lost and the epoch has not been moved
+# past it yet; until then this process neither reads nor writes cached access.
+_lost_bumps = {'outstanding': False}
+
+
+def access_bump_lost():
+    """
+    Entries cached before a lost bump would stay valid, so move every entry to
+    a new epoch instead, retrying from access_type() until that succeeds.
+    """
+    _lost_bumps['outstanding'] = True
+    settle_lost_bumps()
+
+
+def settle_lost_bumps():
+    """
+    Retry the epoch move of a lost bump; True once none is outstanding.
+    """
+    if _lost_bumps['outstanding'] and RedisUtils().incr(ACCESS_EPOCH_KEY) is not None:
+        _lost_bumps['outstanding'] = False
+    return not _lost_bumps['outstanding']
+
+
+@breaker.on_recover
+def invalidate_access_cache():
+    # Every bump made while the breaker was open was lost.
+    access_bump_lost()
+
+
+class NotePermissionResolver:
+
+    """
+    Resolves the caller's access to a note with one annotated query, memoizes the
+    result on the request and optionally caches the access type in Redis keyed on
+    the note's collaborator version.
+    """
+
+    def __init__(self):
+        self.redis = RedisUtils()
+
+    def _memo(self, request):
+        if not hasattr(request, '_note_access'):
+            request._note_access = {}
+        return request._note_access
+
+    def _access_cache_key(self, note_id, user_id):
+        counters = self.redis.get_counters([access_version_key(note_id), ACCESS_EPOCH_KEY])
+        return f"note_{note_id}_access_v{counters[access_version_key(note_id)]}_e{counters[ACCESS_EPOCH_KEY]}_user_{user_id}"
+
+    def _query(self, user_id):
+        caller_access = NoteAccess.objects.filter(note=OuterRef('pk'), user_id=user_id).values('access_type')[:1]
+        return Note.objects.annotate(caller_access=Subquery(caller_access))
+
+    def resolve(self, request, pk):
+        """
+        Return the note, its owner id and the caller's access type.
+        Raises Note.DoesNotExist when the note is missing.
+        """
+        memo = self._memo(request)
+        result = memo.get(int(pk))
+        if result is not None and result.note is not None:
+            return result
+
+        note = self._query(request.user.id).get(id=pk)
+        result = NoteAccessResult(note, note.user_id, note.caller_access)
+        memo[note.id] = result
+        return result
+
+    def access(self, request, pk):
+        """
+        Return the memoized NoteAccessResult of the caller, or one without the
+        note (note is None) when only the owner and access type had to be read,
+        from the cache when possible. Raises Note.DoesNotExist when the note is
+        missing.
+        """
+        memo = self._memo(request)
+        result = memo.get(int(pk))
+        if result is not None:
+            return result
+
+        cache_key = None
+        if settings.NOTE_ACCESS_CACHE_TIMEOUT and self.redis.available() and settle_lost_bumps():
+            # The version is read before the database and moved again once a
+            # collaborator change commits, so an entry read from rows that were
+            # about to change is only ever left behind under an outdated version.
+            cache_key = self._access_cache_key(pk, request.user.id)
+            cached = self.redis.get(cache_key)
+            if cached:
+                result = NoteAccessResult(None, cached['owner_id'], cached['access_type'])
+                memo[int(pk)] = result
+                return result
+
+        owner_id, access_type = self._query(request.user.id).filter(id=pk).values_list('user_id', 'caller_access').get()
+        result = NoteAccessResult(None, owner_id, access_type)
+        memo[int(pk)] = result
+        if cache_key:
+            self.redis.save(cache_key, {'owner_id': owner_id, 'access_type': access_type}, ex=settings.NOTE_ACCESS_CACHE_TIMEOUT, adaptive=True)
+        return result
+
+    def access_type(self, request, pk):
+        """
+        Return only the caller's access type, without loading the note.
+        """
+        return self.access(request, pk).access_type
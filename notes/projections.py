@@ -0,0 +1,110 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db.models import Q
+from django.db.models.functions import Left
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from .models import Note
+from .images import derivative_urls
+from .serializers import NoteSerializer, NoteProjectionSerializer
+
+
+def image_url(name):
+    return Note._meta.get_field('image').storage.url(name) if name else None
+
+
+# Fields whose serializer representation differs from the raw column value.
+converters = {
+    'reminder': serializers.DateTimeField().to_representation,
+    'image': image_url,
+    'image_derivatives': derivative_urls,
+}
+
+
+class NoteProjection:
+
+    """
+    The shape of the notes a list returns: every field (the default), the
+    lightweight summary used by list screens, or the fields picked with
+    ?fields=. Only the columns and relations a projection needs are loaded, and
+    each projection gets its own cached fragments.
+    """
+
+    summary_fields = ('id', 'title', 'color', 'snippet', 'is_archive', 'is_trash', 'reminder')
+    allowed_fields = NoteProjectionSerializer.Meta.fields
+    relations = ('label', 'collaborator')
+
+    def __init__(self, fields=None, name='full'):
+        self.fields = tuple(fields) if fields else None
+        self.name = name
+
+    @classmethod
+    def named(cls, name):
+        """
+        The full or summary projection, by name.
+        """
+        if name == 'summary':
+            return cls(cls.summary_fields, 'summary')
+        return cls()
+
+    @classmethod
+    def from_request(cls, request):
+        if request.query_params.get('mode') == 'summary':
+            return cls.named('summary')
+
+        fields = request.query_params.get('fields')
+        if not fields:
+            return cls()
+        names = list(dict.fromkeys(name.strip() for name in fields.split(',') if name.strip()))
+        unknown = [name for name in names if name not in cls.allowed_fields]
+        if unknown:
+            raise ValidationError({'fields': f"Unknown fields: {', '.join(unknown)}"})
+        return cls(names, 'fields-' + '-'.join(sorted(names)))
+
+    def apply(self, queryset):
+        """
+        Limit the queryset to what the projection renders: deferred columns,
+        the snippet computed by the database and only the requested prefetches.
+        """
+        if self.fields is None:
+            return queryset.prefetch_related(*self.relations)
+
+        columns = [name for name in self.fields if name not in self.relations and name != 'snippet']
+        queryset = queryset.only('id', 'version', *columns)
+        if 'snippet' in self.fields:
+            queryset = queryset.annotate(snippet=Left('description', settings.NOTE_SNIPPET_LENGTH))
+        relations = [name for name in self.relations if name in self.fields]
+        if relations:
+            queryset = queryset.prefetch_related(*relations)
+        return queryset
+
+    def serialize(self, note):
+        if self.fields is None:
+            return NoteSerializer(note).data
+        return NoteProjectionSerializer(note, fields=self.fields).data
+
+    def values(self, queryset):
+        """
+        Yield (row, data) pairs with data identical to what serialize() gives
+        for the same row, built from a values() query instead of model
+        instances and serializers. Label and collaborator ids are aggregated in
+        SQL, ordered by id.
+        """
+        # Serializers emit fields in declaration order, whatever order they were asked in.
+        wanted = self.fields or NoteSerializer.Meta.fields
+        fields = [name for name in self.allowed_fields if name in wanted]
+        columns = [name for name in fields if name not in self.relations and name != 'snippet']
+        queryset = queryset.values(*dict.fromkeys(['id', 'version', *columns]))
+        if 'snippet' in fields:
+            queryset = queryset.annotate(snippet=Left('description', settings.NOTE_SNIPPET_LENGTH))
+        aggregates = {
+            f'{name}_ids': ArrayAgg(f'{name}__id', distinct=True, ordering=f'{name}__id', filter=Q(**{f'{name}__isnull': False}), default=[])
+            for name in self.relations if name in fields
+        }
+        if aggregates:
+            queryset = queryset.annotate(**aggregates)
+
+        sources = [(name, f'{name}_ids' if name in self.relations else name, converters.get(name)) for name in fields]
+        for row in queryset:
+            yield row, {name: (convert(row[source]) if convert and row[source] is not None else row[source]) for name, source, convert in sources}
+
@@ -1,24 +1,282 @@
 from django.conf import settings
-from django.core.cache import cache
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+from django_redis import get_redis_connection
+from loguru import logger
+from contextlib import contextmanager
 import json
+import random
+import time
+from .breaker import CacheUnavailable, breaker
+
+
+# Sampled access counts per key (decayed periodically), sampled value sizes,
+# and sampled hit/miss totals.
+KEY_HITS_KEY = 'cache_key_hits'
+VALUE_SIZES_KEY = 'cache_value_sizes'
+HIT_STATS_KEY = 'cache_hit_stats'
+
+
+def sampled():
+    return random.random() < settings.CACHE_STATS_SAMPLE_RATE
+
+
+def record_access(hits):
+    """
+    Count sampled reads, given as {key: hit}, weighted so the counts estimate
+    the real number of reads.
+    """
+    if breaker.is_open():
+        return
+    weight = 1 / settings.CACHE_STATS_SAMPLE_RATE
+    try:
+        pipe = get_redis_connection("default").pipeline(transaction=False)
+        for key, hit in hits.items():
+            pipe.zincrby(KEY_HITS_KEY, weight, key)
+            pipe.hincrbyfloat(HIT_STATS_KEY, 'hits' if hit else 'misses', weight)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Could not record a cache access: {str(e)}")
+
+
+def record_sizes(sizes):
+    if breaker.is_open():
+        return
+    try:
+        get_redis_connection("default").zadd(VALUE_SIZES_KEY, sizes)
+    except Exception as e:
+        logger.error(f"Could not record cached value sizes: {str(e)}")
+
+
+# This process's copy of the access counts of the keys read at least
+# CACHE_COLD_KEY_HITS times, and when it was loaded.
+_read_counts = {'counts': {}, 'loaded_at': None}
+
+
+def read_counts():
+    """
+    The access counts adaptive timeouts go by, reloaded from Redis at most every
+    CACHE_READ_COUNTS_REFRESH_SECONDS, so an adaptive save normally costs no
+    extra round trip. Keys missing from it count as cold.
+    """
+    now = time.monotonic()
+    if _read_counts['loaded_at'] is None or now - _read_counts['loaded_at'] >= settings.CACHE_READ_COUNTS_REFRESH_SECONDS:
+        # Set first so an outage is not retried on every save.
+        _read_counts['loaded_at'] = now
+        try:
+            with breaker.guard():
+                pairs = get_redis_connection("default").zrangebyscore(KEY_HITS_KEY, settings.CACHE_COLD_KEY_HITS, '+inf', withscores=True)
+            _read_counts['counts'] = {key.decode(): score for key, score in pairs}
+        except CacheUnavailable:
+            pass
+    return _read_counts['counts']
+
+
+def adaptive_timeout(key, ex):
+    """
+    Stretch ex for keys read at least CACHE_HOT_KEY_HITS times per decay period
+    and shrink it for keys read fewer than CACHE_COLD_KEY_HITS times, within
+    CACHE_MIN_TIMEOUT and CACHE_MAX_TIMEOUT.
+    """
+    score = read_counts().get(key, 0)
+    if score >= settings.CACHE_HOT_KEY_HITS:
+        return max(ex, min(int(ex * settings.CACHE_HOT_TIMEOUT_FACTOR), settings.CACHE_MAX_TIMEOUT))
+    if score < settings.CACHE_COLD_KEY_HITS:
+        return min(ex, max(int(ex * settings.CACHE_COLD_TIMEOUT_FACTOR), settings.CACHE_MIN_TIMEOUT))
+    return ex
+
+
+def decay_access_counts():
+    """
+    Halve every access count, forget keys that fell below one read and keep
+    only the CACHE_STATS_MAX_KEYS most read and largest keys, so the stats
+    follow current traffic and stay bounded in size.
+    """
+    pipe = get_redis_connection("default").pipeline()
+    pipe.zunionstore(KEY_HITS_KEY, {KEY_HITS_KEY: 0.5})
+    pipe.zremrangebyscore(KEY_HITS_KEY, '-inf', '(1')
+    pipe.zremrangebyrank(KEY_HITS_KEY, 0, -settings.CACHE_STATS_MAX_KEYS - 1)
+    pipe.zremrangebyrank(VALUE_SIZES_KEY, 0, -settings.CACHE_STATS_MAX_KEYS - 1)
+    pipe.execute()
+
+
+def hot_keys(count):
+    """
+    The count most read keys as (key, estimated reads) pairs.
+    """
+    return [(key.decode(), score) for key, score in get_redis_connection("default").zrevrange(KEY_HITS_KEY, 0, count - 1, withscores=True)]
+
+
+def largest_values(count):
+    """
+    The count largest sampled values as (key, bytes) pairs.
+    """
+    return [(key.decode(), int(size)) for key, size in get_redis_connection("default").zrevrange(VALUE_SIZES_KEY, 0, count - 1, withscores=True)]
+
+
+def hit_stats():
+    return {field.decode(): float(value) for field, value in get_redis_connection("default").hgetall(HIT_STATS_KEY).items()}
+
+
+def reset_stats():
+    get_redis_connection("default").delete(KEY_HITS_KEY, VALUE_SIZES_KEY, HIT_STATS_KEY)
+    _read_counts['loaded_at'] = None
+
+
+class Deferred:
+
+    """
+    The result of a pipelined command, set once the pipeline has run.
+    """
+
+    def __init__(self, transform=None, fallback=None):
+        self.transform = transform
+        self.fallback = fallback
+        self.value = None
+
+
+class RedisPipeline:
+
+    """
+    Commands queued on Redis pipelines and sent by execute(), in a single
+    round trip per node. Keys and values go through the cache like RedisUtils
+    does, so both read each other's entries; command() queues any raw Redis
+    command. On a sharded cache each get, save and delete is queued for the
+    node holding its key, and raw commands go to the node of the key the
+    pipeline was opened with. When Redis is unavailable gets, saves and
+    deletes use the local fallback cache and raw commands take their default.
+    """
+
+    def __init__(self, cache, key=None):
+        self.cache = cache
+        self.key = key
+        self.sharded = hasattr(cache.client, 'pipeline_for')
+        self.pipes = {}
+        self.results = []
+        self.reads = []
+
+    def pipe_for(self, key):
+        """
+        The pipeline of the node holding key, created on first use.
+        """
+        if self.sharded:
+            if key is None:
+                raise ValueError("Raw commands on a sharded cache need the pipeline to be opened with a key")
+            client = self.cache.client.get_server(self.cache.make_key(key))
+        else:
+            client = self.cache.client.get_client(write=True)
+        if client not in self.pipes:
+            self.pipes[client] = client.pipeline(transaction=False)
+        return self.pipes[client]
+
+    def command(self, name, *args, transform=None, default=None, **kwargs):
+        pipe = self.pipe_for(self.key)
+        getattr(pipe, name)(*args, **kwargs)
+        return self.queue(pipe, transform, lambda: default)
+
+    def queue(self, pipe, transform, fallback):
+        result = Deferred(transform, fallback)
+        self.results.append((pipe, result))
+        return result
+
+    def decode(self, raw):
+        value = self.cache.client.decode(raw) if raw is not None else None
+        return json.loads(value) if value else None
+
+    def get(self, key):
+        pipe = self.pipe_for(key)
+        pipe.get(self.cache.make_key(key))
+        result = self.queue(pipe, self.decode, lambda: local_get(key))
+        self.reads.append((key, result))
+        return result
+
+    def save(self, key, value, ex=None):
+        serialized_value = json.dumps(value)
+        pipe = self.pipe_for(key)
+        pipe.set(self.cache.make_key(key), self.cache.client.encode(serialized_value), ex=ex)
+        return self.queue(pipe, None, lambda: local_cache().set(key, serialized_value, local_timeout(ex)))
+
+    def delete(self, key):
+        pipe = self.pipe_for(key)
+        pipe.delete(self.cache.make_key(key))
+        return self.queue(pipe, None, lambda: local_cache().delete(key))
+
+    def execute(self):
+        try:
+            with breaker.guard():
+                raws = {pipe: iter(pipe.execute()) for pipe in self.pipes.values()}
+        except CacheUnavailable:
+            for _, result in self.results:
+                result.value = result.fallback()
+            return
+        for pipe, result in self.results:
+            raw = next(raws[pipe])
+            result.value = result.transform(raw) if result.transform else raw
+        if self.reads and sampled():
+            record_access({key: result.value is not None for key, result in self.reads})
+
+
+def local_cache():
+    return caches['fallback']
+
+
+def local_timeout(ex):
+    return min(ex, settings.REDIS_FALLBACK_TIMEOUT) if ex else settings.REDIS_FALLBACK_TIMEOUT
+
+
+def local_get(key):
+    value = local_cache().get(key)
+    return json.loads(value) if value else None
 
 
 class RedisUtils:
+
+    """
+    JSON values in a Redis cache: "default" unless another alias is given, such
+    as the sharded "notes" cache of the per-user note lists and details. Calls
+    go through the circuit breaker: while Redis is unavailable values are kept
+    in the bounded in-process fallback cache for at most REDIS_FALLBACK_TIMEOUT
+    seconds, and deletes are applied there before CacheUnavailable is raised,
+    so invalidations can be retried.
+    """
     
-    def __init__(self):
-        self.cache = cache
+    def __init__(self, alias="default"):
+        self.cache = ConnectionProxy(caches, alias)
         
         
-    
-    def save(self,key,value,ex=None):
+    def available(self):
+        return not breaker.is_open()
+        
+        
+    def save(self,key,value,ex=None,adaptive=False):
+        """
+        Store value as JSON for ex seconds. With adaptive the timeout follows
+        how often the key is read; leave it off for keys whose expiry has a
+        meaning of its own.
+        """
         serialized_value = json.dumps(value)
-        self.cache.set(key,serialized_value, ex)
+        if adaptive and ex and settings.CACHE_ADAPTIVE_TIMEOUTS:
+            ex = adaptive_timeout(key, ex)
+        try:
+            with breaker.guard():
+                self.cache.set(key,serialized_value, ex)
+        except CacheUnavailable:
+            local_cache().set(key, serialized_value, local_timeout(ex))
+            return
+        if sampled():
+            record_sizes({key: len(serialized_value)})
         
         
         
     def get(self,key):
         
-        value = self.cache.get(key)
+        try:
+            with breaker.guard():
+                value = self.cache.get(key)
+        except CacheUnavailable:
+            return local_get(key)
+        if sampled():
+            record_access({key: value is not None})
         
         if value:
             return json.loads(value)
@@ -26,6 +284,97 @@ class RedisUtils:
     
     
     def delete(self,key):
-        self.cache.delete(key)
+        self.delete_many([key])
+        
+        
+    def get_many(self,keys,raw=False):
+        """
+        Return {key: value} for the keys that are cached, read with one MGET
+        (one per node on a sharded cache). With raw the values are the bytes
+        stored by set_many(raw=True), handed back without decoding.
+        """
+        keys = list(keys)
+        if not keys:
+            return {}
+        try:
+            with breaker.guard():
+                found = self.cache.get_many(keys)
+        except CacheUnavailable:
+            found = local_cache().get_many(keys)
+        else:
+            if sampled():
+                record_access({key: key in found for key in keys})
+        if raw:
+            return found
+        return {key: json.loads(value) for key, value in found.items() if value}
+        
+        
+    def set_many(self,mapping,ex=None,raw=False):
+        """
+        Store each value as JSON for ex seconds, encoding it once and writing
+        them all in one pipelined round trip. With raw the values are bytes
+        that are already encoded, such as rendered JSON, and are stored as is.
+        """
+        encoded = dict(mapping) if raw else {key: json.dumps(value) for key, value in mapping.items()}
+        if not encoded:
+            return
+        try:
+            with breaker.guard():
+                self.cache.set_many(encoded, ex)
+        except CacheUnavailable:
+            local_cache().set_many(encoded, local_timeout(ex))
+            return
+        if sampled():
+            record_sizes({key: len(value) for key, value in encoded.items()})
         
         
+    def delete_many(self,keys):
+        keys = list(keys)
+        if keys:
+            local_cache().delete_many(keys)
+            with breaker.guard():
+                self.cache.delete_many(keys)
+        
+        
+    @contextmanager
+    def pipeline(self, key=None):
+        """
+        Queue save/get/delete calls on the yielded RedisPipeline and run them in
+        one round trip per node when the block exits; get() results are
+        Deferred values. On a sharded cache raw command() calls need key: they
+        run on the node holding it, which holds the other keys of the same user.
+        """
+        pipe = RedisPipeline(self.cache, key)
+        yield pipe
+        pipe.execute()
+        
+        
+    def incr(self,key):
+        """
+        Atomically increment an integer counter, creating it when missing.
+        Returns None when Redis is unavailable and the increment is lost.
+        """
+        try:
+            with breaker.guard():
+                self.cache.add(key,0,None)
+                return self.cache.incr(key)
+        except CacheUnavailable as e:
+            logger.error(f"Could not increment {key}: {str(e)}")
+            return None
+    
+    
+    def get_counters(self,keys):
+        """
+        Return {key: value} for integer counters, 0 for missing ones; all 0
+        when Redis is unavailable.
+        """
+        try:
+            with breaker.guard():
+                found = self.cache.get_many(keys)
+        except CacheUnavailable:
+            found = {}
+        return {key: found.get(key, 0) for key in keys}
+    
+    
+    def get_counter(self,key):
+        return self.get_counters([key])[key]
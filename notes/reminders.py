@@ -0,0 +1,181 @@
+import hashlib
+import json
+import uuid
+from datetime import timezone as dt_timezone
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django_celery_beat.models import PeriodicTask, PeriodicTasks, CrontabSchedule
+from rest_framework.pagination import CursorPagination
+from .bulk import reserve_ids, copy_instances
+from .fragments import list_index_key
+from .models import Note, NoteAccess, ReminderDispatch
+from .redisutil import RedisUtils
+
+
+def reminder_task_name(note_id):
+    return f'reminder-task-{note_id}'
+
+
+def reminder_task_args(note_id, reminder):
+    # The reminder time goes with the task so the run can tell a stale schedule apart.
+    return json.dumps([note_id, reminder.astimezone(dt_timezone.utc).isoformat()])
+
+
+def schedule_reminders(notes, use_copy=False):
+    """
+    Create the one-off reminder tasks of many notes at once: one crontab lookup
+    per distinct reminder minute and a single bulk insert (or COPY) of the
+    periodic tasks.
+    """
+    notes = [note for note in notes if note.reminder]
+    if not notes:
+        return
+
+    schedules = {}
+    tasks = []
+    for note in notes:
+        reminder_time = timezone.localtime(note.reminder)
+        crontab_key = (reminder_time.minute, reminder_time.hour, reminder_time.day, reminder_time.month)
+        if crontab_key not in schedules:
+            schedules[crontab_key], _ = CrontabSchedule.objects.get_or_create(
+                minute=reminder_time.minute,
+                hour=reminder_time.hour,
+                day_of_month=reminder_time.day,
+                month_of_year=reminder_time.month,
+                day_of_week='*',
+            )
+        tasks.append(PeriodicTask(
+            crontab=schedules[crontab_key],
+            name=reminder_task_name(note.id),
+            task='user.task.send_reminder',
+            args=reminder_task_args(note.id, note.reminder),
+            one_off=True,
+        ))
+
+    if use_copy:
+        for task, task_id in zip(tasks, reserve_ids(PeriodicTask, len(tasks))):
+            task.id = task_id
+        copy_instances(PeriodicTask, tasks)
+    else:
+        PeriodicTask.objects.bulk_create(tasks, ignore_conflicts=True)
+    # bulk_create skips the signals that normally tell beat to reload its schedule.
+    PeriodicTasks.update_changed()
+
+
+def sync_reminder(note_id, reminder):
+    """
+    Point the one-off reminder task of a note at reminder (an aware datetime),
+    or remove it when the reminder was cleared. A task already set for that
+    time is left alone, so no row is written and beat does not reload; this
+    also keeps a task that has already fired from being enabled again. Return
+    True when the task was written or removed.
+    """
+    if reminder is None:
+        return PeriodicTask.objects.filter(name=reminder_task_name(note_id)).delete()[0] > 0
+
+    reminder_time = timezone.localtime(reminder)
+    crontab = {
+        'minute': str(reminder_time.minute),
+        'hour': str(reminder_time.hour),
+        'day_of_month': str(reminder_time.day),
+        'month_of_year': str(reminder_time.month),
+        'day_of_week': '*',
+    }
+    args = reminder_task_args(note_id, reminder)
+    task = PeriodicTask.objects.select_related('crontab').filter(name=reminder_task_name(note_id)).first()
+    if task is not None and task.args == args and task.crontab is not None \
+            and all(getattr(task.crontab, field) == value for field, value in crontab.items()):
+        return False
+
+    schedule, _ = CrontabSchedule.objects.get_or_create(**crontab)
+    PeriodicTask.objects.update_or_create(
+        name=reminder_task_name(note_id),
+        defaults={
+            'crontab': schedule,
+            'task': 'user.task.send_reminder',
+            'args': args,
+            'one_off': True,
+            'enabled': True,
+        },
+    )
+    return True
+
+
+def claim_dispatch(note_id, reminder):
+    """
+    Record that the reminder at the given time of the note is being mailed and
+    return True, or False when it already was. Dispatches of the note's earlier
+    reminder times are dropped, so a note keeps at most one row.
+    """
+    _, created = ReminderDispatch.objects.get_or_create(note_id=note_id, reminder=reminder)
+    if created:
+        ReminderDispatch.objects.filter(note_id=note_id).exclude(reminder=reminder).delete()
+    return created
+
+
+def release_dispatch(note_id, reminder):
+    # The mail could not be sent: let a retry claim it again.
+    ReminderDispatch.objects.filter(note_id=note_id, reminder=reminder).delete()
+
+
+def upcoming_queryset(user_id, start, end):
+    """
+    Notes the user owns or shares with a reminder in [start, end), trash left
+    out. The ids come from a UNION kept in SQL: the owned notes from the
+    partial (user, reminder) index and the shared ones through the user's
+    NoteAccess rows. An OR of the two would make Postgres scan every note.
+    """
+    upcoming = Q(reminder__gte=start, reminder__lt=end, reminder__isnull=False, is_trash=False)
+    shared = NoteAccess.objects.filter(user_id=user_id).exclude(access_type=NoteAccess.owner).values('note_id')
+    owned_ids = Note.objects.filter(upcoming, user_id=user_id).values('id')
+    shared_ids = Note.objects.filter(upcoming, id__in=shared).values('id')
+    return Note.objects.filter(id__in=owned_ids.union(shared_ids))
+
+
+class ReminderPagination(CursorPagination):
+    ordering = ('reminder', 'id')
+    page_size = settings.NOTE_REMINDER_PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = settings.NOTE_REMINDER_MAX_PAGE_SIZE
+
+
+class ReminderPageCache:
+
+    """
+    Pages of a user's upcoming reminders, cached with the user's reminders
+    generation and only served while it is still current. Every change to one
+    of the user's notes drops the generation (see user_list_keys), which
+    orphans all the cached pages at once. The generation and the pages share
+    the user's node, so one round trip reads both.
+    """
+
+    def __init__(self):
+        self.redis = RedisUtils("notes")
+
+    def generation_key(self, user_id):
+        return list_index_key(user_id, 'reminders')
+
+    def page_key(self, user_id, start, end, cursor='', limit=''):
+        page = hashlib.md5(f"{start.isoformat()}|{end.isoformat()}|{cursor}|{limit}".encode()).hexdigest()
+        return f"user_{user_id}_reminders_{page}"
+
+    def get(self, user_id, page_key):
+        """
+        Return (page, generation): the cached page, or None when it is missing
+        or stale, and the generation a freshly built page is saved with.
+        """
+        generation_key = self.generation_key(user_id)
+        cached = self.redis.get_many([generation_key, page_key])
+        generation = cached.get(generation_key)
+        if generation is not None and cached.get(page_key, {}).get('generation') == generation:
+            return cached[page_key]['page'], generation
+        if generation is None:
+            # Stored before the database read: a change committed meanwhile
+            # drops it again, so the page saved with it is never served.
+            generation = uuid.uuid4().hex
+            self.redis.save(generation_key, generation, ex=settings.NOTE_REMINDER_CACHE_TIMEOUT)
+        return None, generation
+
+    def save(self, page_key, generation, page):
+        self.redis.save(page_key, {'generation': generation, 'page': page}, ex=settings.NOTE_REMINDER_CACHE_TIMEOUT)
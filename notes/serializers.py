@@ -1,17 +1,121 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Note , Collaborator
+from .models import Note , Collaborator, ExportJob
+from .images import derivative_urls
+
+class ImageDerivativesField(serializers.JSONField):
+    """
+    URLs of the resized copies of the note image, once they have been generated.
+    """
+    def to_representation(self, value):
+        return derivative_urls(value)
+
+
+class StorageImageField(serializers.ImageField):
+    """
+    The image URL as the storage gives it, whatever the request: detail responses
+    then match the list fragments, which are rendered without one. It is absolute
+    when NOTE_IMAGE_URL is.
+    """
+    def to_representation(self, value):
+        return value.url if value else None
+
 
 class NoteSerializer(serializers.ModelSerializer):
+    image_derivatives = ImageDerivativesField(read_only=True)
+    serializer_field_mapping = {**serializers.ModelSerializer.serializer_field_mapping, models.ImageField: StorageImageField}
+    
     class Meta:
         model = Note
-        fields = ['id','title','description','color','image','is_archive','is_trash','reminder','user','label','collaborator']
+        fields = ['id','title','description','color','image','image_derivatives','is_archive','is_trash','reminder','user','label','collaborator']
         
         read_only_fields  = ("user","label","collaborator",)
         # fields = '__all__'
 
 
+class NoteProjectionSerializer(NoteSerializer):
+    """
+    NoteSerializer limited to the requested fields, with the SQL-computed snippet.
+    """
+    snippet = serializers.CharField(read_only=True)
+    
+    class Meta(NoteSerializer.Meta):
+        fields = NoteSerializer.Meta.fields + ['snippet']
+        
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
 class CollaboratorSerializer(serializers.ModelSerializer):
      
     class Meta:
         model = Collaborator
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    
+    class Meta:
+        model = ExportJob
+        fields = ['id','status','compress','total','processed','error','created_at','finished_at']
+        read_only_fields = ('status','total','processed','error','created_at','finished_at')
+
+
+class NoteImportSerializer(serializers.ModelSerializer):
+    label = serializers.ListField(child=serializers.IntegerField(), required=False)
+    
+    class Meta:
+        model = Note
+        fields = ['title','description','color','is_archive','is_trash','reminder','label']
+
+
+class TextOperationSerializer(serializers.Serializer):
+    """
+    One edit of a description: insert text or delete length characters at a
+    character offset of the text left by the operations before it.
+    """
+    op = serializers.ChoiceField(choices=['insert','delete'])
+    offset = serializers.IntegerField(min_value=0)
+    text = serializers.CharField(required=False, allow_blank=True, trim_whitespace=False)
+    length = serializers.IntegerField(required=False, min_value=0)
+    
+    def validate(self, data):
+        if data['op'] == 'insert' and 'text' not in data:
+            raise serializers.ValidationError({'text': 'Inserts need the text to insert.'})
+        if data['op'] == 'delete' and 'length' not in data:
+            raise serializers.ValidationError({'length': 'Deletes need the number of characters to delete.'})
+        return data
+
+
+class DescriptionPatchSerializer(serializers.Serializer):
+    version = serializers.IntegerField(min_value=1)
+    operations = TextOperationSerializer(many=True, required=False)
+    diff = serializers.CharField(required=False, trim_whitespace=False)
+    
+    def validate(self, data):
+        if ('operations' in data) == ('diff' in data):
+            raise serializers.ValidationError('Send either operations or a unified diff.')
+        if len(data.get('operations', ())) > settings.NOTE_DESCRIPTION_MAX_OPERATIONS:
+            raise serializers.ValidationError({'operations': 'Too many operations in one patch.'})
+        return data
+
+
+class UpcomingRemindersSerializer(serializers.Serializer):
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+    
+    def validate(self, data):
+        # Whole minutes, so the default window keeps hitting the cache for a minute.
+        start = data.get('start') or timezone.now().replace(second=0, microsecond=0)
+        end = data.get('end') or start + timedelta(days=settings.NOTE_REMINDER_WINDOW_DAYS)
+        if end <= start:
+            raise serializers.ValidationError({'end': 'The end must be after the start.'})
+        if end - start > timedelta(days=settings.NOTE_REMINDER_MAX_WINDOW_DAYS):
+            raise serializers.ValidationError({'end': f'The window can span at most {settings.NOTE_REMINDER_MAX_WINDOW_DAYS} days.'})
+        return {'start': start, 'end': end}
@@ -0,0 +1,108 @@
+import bisect
+import hashlib
+import re
+from collections import OrderedDict, defaultdict
+from django.conf import settings
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django_redis.client import ShardClient
+from django_redis.client.default import DefaultClient
+from django_redis.exceptions import ConnectionInterrupted
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+
+
+USER_KEY_RE = re.compile(r'(?:^|:)user_(\d+)(?:_|$)')
+
+
+def shard_key(key):
+    """
+    The part of a key that picks its node: the user id for user_<id>... keys,
+    so all of a user's keys live together, else the whole key.
+    """
+    match = USER_KEY_RE.search(key)
+    return f"user_{match.group(1)}" if match else key
+
+
+class HashRing:
+
+    """
+    Consistent hash ring with `replicas` points per node: adding or removing
+    one of n nodes moves only about 1/n of the keys.
+    """
+
+    def __init__(self, nodes, replicas):
+        self.points = []
+        self.owners = {}
+        for node in nodes:
+            for index in range(replicas):
+                point = self.hash(f"{node}#{index}")
+                self.owners[point] = node
+                bisect.insort(self.points, point)
+
+    @staticmethod
+    def hash(value):
+        return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], 'big')
+
+    def node_for(self, key):
+        index = bisect.bisect(self.points, self.hash(key)) % len(self.points)
+        return self.owners[self.points[index]]
+
+
+class UserShardClient(ShardClient):
+
+    """
+    django-redis client spreading keys over the LOCATION nodes by consistent
+    hashing on the user id (see shard_key). The batched calls make one round
+    trip per node instead of one per key, and pipeline_for() gives a pipeline
+    on the node of a key, which holds every other key of the same user.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._ring = HashRing(self._server, settings.NOTE_CACHE_RING_REPLICAS)
+
+    def get_server_name(self, key):
+        return self._ring.node_for(shard_key(str(key)))
+
+    def pipeline_for(self, key):
+        return self.get_server(self.make_key(key)).pipeline(transaction=False)
+
+    def group(self, keys, version=None):
+        """
+        {node client: {full key: key}} for the keys.
+        """
+        groups = defaultdict(OrderedDict)
+        for key in keys:
+            full_key = self.make_key(key, version=version)
+            groups[self.get_server(full_key)][full_key] = key
+        return groups
+
+    def get_many(self, keys, version=None):
+        found = {}
+        for client, keys_of_node in self.group(keys, version).items():
+            try:
+                values = client.mget(*keys_of_node)
+            except (RedisConnectionError, RedisTimeoutError) as e:
+                raise ConnectionInterrupted(connection=client) from e
+            for key, value in zip(keys_of_node.values(), values):
+                if value is not None:
+                    found[key] = self.decode(value)
+        return OrderedDict((key, found[key]) for key in keys if key in found)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        for client, keys_of_node in self.group(data, version).items():
+            try:
+                pipe = client.pipeline()
+                for full_key, key in keys_of_node.items():
+                    DefaultClient.set(self, full_key, data[key], timeout, version=version, client=pipe)
+                pipe.execute()
+            except (RedisConnectionError, RedisTimeoutError) as e:
+                raise ConnectionInterrupted(connection=client) from e
+
+    def delete_many(self, keys, version=None):
+        deleted = 0
+        for client, keys_of_node in self.group(keys, version).items():
+            try:
+                deleted += client.delete(*keys_of_node)
+            except (RedisConnectionError, RedisTimeoutError) as e:
+                raise ConnectionInterrupted(connection=client) from e
+        return deleted
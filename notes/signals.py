@@ -0,0 +1,147 @@
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_init, pre_save, post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from label.models import Label
+from .models import Note, Collaborator, NoteAccess
+from .access import grant_owner_access, grant_collaborator_access, revoke_collaborator_access
+from .images import DEFERRED, stored_image, previous_image, track_image_change, image_name, release_many
+from .outbox import record, record_many
+from .permissions import bump_access_version, bump_access_versions
+from .task import generate_image_derivatives
+
+
+# Fields whose loaded values are kept to tell what a save changed.
+TRACKED_FIELDS = ('is_archive', 'is_trash', 'reminder')
+
+
+def note_representation_changed(note_ids, user_ids=(), kind='updated'):
+    # Labels and collaborators are part of a note's JSON, so they version it too.
+    Note.objects.filter(id__in=note_ids).update(version=F('version') + 1)
+    record_many('note', kind, note_ids, user_ids=list(user_ids))
+
+
+def stored_state(note):
+    return {name: note.__dict__[name] for name in TRACKED_FIELDS if name in note.__dict__}
+
+
+def changed(note, name):
+    # A field that was deferred when the note was loaded counts as changed.
+    return name in note.__dict__ and note._stored_state.get(name, DEFERRED) != note.__dict__[name]
+
+
+def change_kind(note, created):
+    """
+    Name the change a save made, from the archive and trash flags the note was loaded with.
+    """
+    if created:
+        return 'created'
+    if changed(note, 'is_trash'):
+        return 'trashed' if note.is_trash else 'restored'
+    if changed(note, 'is_archive'):
+        return 'archived' if note.is_archive else 'unarchived'
+    return 'updated'
+
+
+@receiver(post_init, sender=Note)
+def note_loaded(sender, instance, **kwargs):
+    instance._stored_image = stored_image(instance)
+    instance._stored_state = stored_state(instance)
+
+
+@receiver(pre_save, sender=Note)
+def note_saving(sender, instance, **kwargs):
+    if 'image' in instance.__dict__:
+        instance._previous_image = previous_image(instance)
+
+
+@receiver(post_save, sender=Note)
+def note_saved(sender, instance, created, **kwargs):
+    if hasattr(instance.version, 'resolve_expression'):
+        # Read the bumped version back now so the change event carries it.
+        instance.refresh_from_db(using=instance._state.db, fields=['version'])
+    if created:
+        grant_owner_access(instance)
+    if 'image' in instance.__dict__:
+        pending = track_image_change(instance, instance._previous_image)
+        if pending:
+            # Resizing runs on the image workers, never in the upload request.
+            transaction.on_commit(lambda: generate_image_derivatives.delay(pending))
+
+    payload = {'version': instance.version}
+    if (created and instance.reminder) or (not created and changed(instance, 'reminder')):
+        payload['reminder'] = instance.reminder.isoformat() if instance.reminder else None
+    record('note', change_kind(instance, created), instance.id, **payload)
+    instance._stored_state = stored_state(instance)
+
+
+def notes_deleting(notes):
+    """
+    Apply the side effects of deleting notes before their rows go: a "deleted"
+    outbox event per note for everyone who can see it, new access versions and
+    the release of the images. Shared by note_deleting and purge_notes, which
+    deletes rows without the delete signals, so that the two stay in step.
+    """
+    note_ids = [note.id for note in notes]
+    # Read now: the visibility rows are deleted with the notes. Collaborators
+    # of trashed notes are included, their detail caches go too.
+    viewers = defaultdict(list)
+    for note_id, user_id in NoteAccess.objects.filter(note_id__in=note_ids).order_by('user_id').values_list('note_id', 'user_id'):
+        viewers[note_id].append(user_id)
+    by_viewers = defaultdict(list)
+    for note_id in note_ids:
+        by_viewers[tuple(viewers[note_id])].append(note_id)
+    for user_ids, deleted in by_viewers.items():
+        record_many('note', 'deleted', deleted, user_ids=list(user_ids), reminder=None)
+    # Stays synchronous: a cached permission must not outlive the note.
+    bump_access_versions(note_ids)
+    release_many(image_name(note.__dict__.get('image')) for note in notes)
+
+
+@receiver(pre_delete, sender=Note)
+def note_deleting(sender, instance, **kwargs):
+    notes_deleting([instance])
+
+
+@receiver(post_save, sender=Collaborator)
+def collaborator_saved(sender, instance, **kwargs):
+    if instance.note_id.user_id == instance.user_id_id:
+        return
+    grant_collaborator_access(instance.note_id_id, [instance.user_id_id], instance.access_type)
+    bump_access_version(instance.note_id_id)
+    note_representation_changed([instance.note_id_id], kind='shared')
+
+
+@receiver(post_delete, sender=Collaborator)
+def collaborator_deleted(sender, instance, **kwargs):
+    revoke_collaborator_access(instance.note_id_id, [instance.user_id_id])
+    bump_access_version(instance.note_id_id)
+    note_representation_changed([instance.note_id_id], [instance.user_id_id], kind='unshared')
+
+
+@receiver(m2m_changed, sender=Note.label.through)
+def note_labels_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        note_representation_changed([instance.id])
+    elif pk_set:
+        note_representation_changed(pk_set)
+
+
+@receiver(pre_delete, sender=Label)
+def label_deleting(sender, instance, **kwargs):
+    note_ids = list(Note.objects.filter(label=instance).values_list('id', flat=True))
+    if note_ids:
+        note_representation_changed(note_ids)
+
+
+@receiver(post_save, sender=Label)
+def label_saved(sender, instance, created, **kwargs):
+    record('label', 'created' if created else 'updated', instance.id, user_id=instance.user_id)
+
+
+@receiver(post_delete, sender=Label)
+def label_deleted(sender, instance, **kwargs):
+    record('label', 'deleted', instance.id, user_id=instance.user_id)
@@ -0,0 +1,91 @@
+import hashlib
+import os
+import re
+import tempfile
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+
+
+BLOB_NAME_RE = re.compile(r'[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(\.[a-z0-9]{1,10})?')
+# Resized copies of a blob are named after it: <hash>-<variant>.<format>.
+DERIVATIVE_NAME_RE = re.compile(r'[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})-([a-z]+)\.([a-z]+)')
+UPLOAD_PREFIX = '.upload-'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    """
+    File storage that names every file after the SHA-256 of its content. The
+    hash is computed while the upload streams to a temporary file, and a blob
+    that already exists is kept instead of being written twice, so identical
+    images share one file and its URL never changes.
+    """
+
+    # Read the settings on every access (unlike MEDIA_ROOT) so they can be overridden.
+    @property
+    def base_location(self):
+        return self._value_or_setting(self._location, settings.NOTE_IMAGE_ROOT)
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+    @property
+    def base_url(self):
+        return self._value_or_setting(self._base_url, settings.NOTE_IMAGE_URL)
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is only known once the content is hashed in _save().
+        return name
+
+    def _save(self, name, content):
+        extension = os.path.splitext(name)[1].lower()
+        os.makedirs(self.location, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.location, prefix=UPLOAD_PREFIX)
+        digest = hashlib.sha256()
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    fh.write(chunk)
+
+            hexdigest = digest.hexdigest()
+            name = f"{hexdigest[:2]}/{hexdigest[2:4]}/{hexdigest}{extension}"
+            path = self.path(name)
+            if os.path.exists(path):
+                os.unlink(temp_path)
+                # A fresh mtime keeps the garbage collector away from a blob
+                # that is about to be referenced again.
+                os.utime(path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.chmod(temp_path, self.file_permissions_mode or 0o644)
+                os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        return name
+
+
+    def save_derivative(self, name, data):
+        """
+        Write a derived file under its exact name, atomically.
+        """
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.location, prefix=UPLOAD_PREFIX)
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                fh.write(data)
+            os.chmod(temp_path, self.file_permissions_mode or 0o644)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        return name
+
+
+def image_storage():
+    return ContentAddressedStorage()
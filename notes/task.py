@@ -0,0 +1,336 @@
+from __future__ import absolute_import,unicode_literals
+import gzip
+import os
+import time
+from datetime import timedelta
+from celery import shared_task
+from django.conf import settings
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, models, transaction
+from django.db.models import F
+from django.db.models import Q
+from django.utils import timezone
+from loguru import logger
+from label.models import Label
+from user.activity import recently_active
+from .models import Note, Collaborator, ExportJob, ImageBlob, OutboxEvent
+from .storage import BLOB_NAME_RE, DERIVATIVE_NAME_RE, UPLOAD_PREFIX
+from .images import build_derivatives
+from . import outbox
+from .autosave import AutosaveBuffer
+from .fragments import NoteFragmentCache
+from .redisutil import decay_access_counts
+
+
+def note_references():
+    """
+    (table, column) of every row that points at a note: the label links and
+    each foreign key to Note. A foreign key that does not cascade is refused
+    instead of being skipped.
+    """
+    through = Note.label.through
+    references = [(through._meta.db_table, through._meta.get_field('note').column)]
+    for relation in Note._meta.related_objects:
+        if relation.many_to_many or relation.on_delete is not models.CASCADE:
+            raise ValueError(f"purge_notes cannot delete {relation.related_model.__name__} rows of a note")
+        references.append((relation.related_model._meta.db_table, relation.field.column))
+    return references
+
+
+def purge_notes(note_ids):
+    """
+    Hard-delete a bounded chunk of trashed notes and return the number deleted.
+    The rows go with one DELETE per table, skipping the collector and the
+    per-row delete signals; their side effects come in bulk from
+    notes_deleting, the helper the delete signal uses: one outbox event per
+    set of viewers, one Redis round trip for the access versions and one image
+    release per distinct reference count.
+    """
+    from .signals import notes_deleting
+
+    notes = list(Note.objects.filter(id__in=note_ids).only('id', 'image'))
+    note_ids = [note.id for note in notes]
+    notes_deleting(notes)
+
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for table, column in note_references():
+            cursor.execute(f"DELETE FROM {quote(table)} WHERE {quote(column)} = ANY(%s)", [note_ids])
+        cursor.execute(f"DELETE FROM {quote(Note._meta.db_table)} WHERE id = ANY(%s)", [note_ids])
+        return cursor.rowcount
+
+
+@shared_task
+def purge_trashed_notes(user_id=None, retention_days=None):
+    """
+    Hard-delete notes that have been in the trash longer than the retention
+    period, optionally for a single user, in short chunked transactions.
+    """
+    if retention_days is None:
+        retention_days = settings.NOTE_TRASH_RETENTION_DAYS
+    cutoff = timezone.now() - timedelta(days=retention_days)
+
+    trashed = Note.objects.filter(is_trash=True, trashed_at__lte=cutoff)
+    if user_id is not None:
+        trashed = trashed.filter(user_id=user_id)
+
+    purged = 0
+    while True:
+        chunk = list(trashed.order_by('id').values_list('id', flat=True)[:settings.NOTE_PURGE_CHUNK_SIZE])
+        if not chunk:
+            break
+        # Caches, reminder tasks and pushes follow from the outbox events.
+        with transaction.atomic():
+            purged += purge_notes(chunk)
+
+    logger.info(f"Purged {purged} trashed notes older than {retention_days} days")
+    return purged
+
+
+def export_path(job):
+    return os.path.join(settings.NOTE_EXPORT_DIR, job.file_name)
+
+
+def export_sections(user_id):
+    """
+    Return (record type, queryset) pairs making up a user's export. Every
+    queryset yields plain dicts so rows can be streamed without model instances.
+    """
+    labels = Label.objects.filter(user_id=user_id).order_by('id').values('id', 'name', 'color')
+    notes = (Note.objects.filter(user_id=user_id).order_by('id')
+             .values('id', 'title', 'description', 'color', 'image', 'is_archive', 'is_trash', 'reminder')
+             .annotate(label=ArrayAgg('label', filter=Q(label__isnull=False), default=[])))
+    collaborators = (Collaborator.objects.filter(note_id__user_id=user_id).order_by('id')
+                     .values('note_id', 'user_id', 'user_id__email', 'access_type'))
+    return [('label', labels), ('note', notes), ('collaborator', collaborators)]
+
+
+@shared_task
+def export_user_data(job_id):
+    """
+    Stream a user's labels, notes and collaborators to an NDJSON file (gzipped
+    when requested), keeping memory constant and recording progress per chunk.
+    """
+    job = ExportJob.objects.get(id=job_id)
+    chunk_size = settings.NOTE_EXPORT_CHUNK_SIZE
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+
+    try:
+        sections = export_sections(job.user_id)
+        total = sum(queryset.count() for _, queryset in sections)
+        job.file_name = f"export-{job.user_id}-{job.id}.ndjson" + (".gz" if job.compress else "")
+        job.status = ExportJob.running
+        job.total = total
+        job.save(update_fields=['file_name', 'status', 'total'])
+
+        os.makedirs(settings.NOTE_EXPORT_DIR, exist_ok=True)
+        path = export_path(job)
+        partial_path = path + ".part"
+        opener = gzip.open if job.compress else open
+        processed = 0
+
+        with opener(partial_path, 'wt', encoding='utf-8') as fh:
+            for record_type, queryset in sections:
+                lines = []
+                for row in queryset.iterator(chunk_size=chunk_size):
+                    row['type'] = record_type
+                    lines.append(encoder.encode(row))
+                    if len(lines) == chunk_size:
+                        fh.write('\n'.join(lines) + '\n')
+                        processed += len(lines)
+                        lines = []
+                        ExportJob.objects.filter(id=job.id).update(processed=processed)
+                if lines:
+                    fh.write('\n'.join(lines) + '\n')
+                    processed += len(lines)
+                    ExportJob.objects.filter(id=job.id).update(processed=processed)
+
+        os.replace(partial_path, path)
+        ExportJob.objects.filter(id=job.id).update(status=ExportJob.completed, processed=processed, finished_at=timezone.now())
+        logger.info(f"Export {job.id} for user {job.user_id} finished with {processed} records")
+
+    except Exception as e:
+        logger.error(f"Export {job.id} for user {job.user_id} failed: {str(e)}")
+        ExportJob.objects.filter(id=job.id).update(status=ExportJob.failed, error=str(e), finished_at=timezone.now())
+
+
+@shared_task
+def generate_image_derivatives(name):
+    """
+    Resize an image blob into the configured derivatives and hand them to every
+    note using it. Routed to the "images" queue, whose worker concurrency bounds
+    how many images are resized at once.
+    """
+    blob = ImageBlob.objects.filter(name=name).first()
+    if blob is None:
+        return None
+    storage = Note._meta.get_field('image').storage
+    derivatives = blob.derivatives
+    if derivatives is None:
+        try:
+            derivatives = build_derivatives(storage, name)
+        except Exception as e:
+            logger.error(f"Could not generate derivatives of image {name}: {str(e)}")
+            return None
+        ImageBlob.objects.filter(id=blob.id).update(derivatives=derivatives)
+
+    with transaction.atomic():
+        note_ids = list(Note.objects.filter(image=name).exclude(image_derivatives=derivatives).values_list('id', flat=True))
+        Note.objects.filter(id__in=note_ids).update(image_derivatives=derivatives, version=F('version') + 1)
+        outbox.record_many('note', 'updated', note_ids)
+    logger.info(f"Derivatives of image {name} ready for {len(note_ids)} notes")
+    return derivatives
+
+
+@shared_task
+def flush_autosave(note_id):
+    """
+    Debounced flush of one note's autosave buffer, queued by its first buffered edit.
+    """
+    buffer = AutosaveBuffer()
+    # Cleared first so edits arriving during the flush queue another one.
+    buffer.clear_schedule(note_id)
+    return buffer.flush(note_id)
+
+
+@shared_task
+def flush_autosave_buffers():
+    """
+    Flush every autosave buffer that has held edits for longer than
+    NOTE_AUTOSAVE_MAX_DELAY_SECONDS, covering debounced flushes that were lost.
+    """
+    buffer = AutosaveBuffer()
+    flushed = 0
+    for note_id in buffer.due(settings.NOTE_AUTOSAVE_MAX_DELAY_SECONDS):
+        try:
+            buffer.flush(note_id)
+            flushed += 1
+        except Exception as e:
+            logger.error(f"Could not flush the autosave buffer of note {note_id}: {str(e)}")
+    if flushed:
+        logger.info(f"Flushed {flushed} autosave buffers")
+    return flushed
+
+
+@shared_task
+def drain_outbox():
+    """
+    Apply the pending outbox events. Queued when a transaction that wrote events
+    commits, and run every minute by beat in case such a kick was lost.
+    """
+    applied = outbox.drain()
+    # Released only now, then checked once more: an event committed while the
+    # kick was still held is picked up here instead of waiting for beat.
+    outbox.release_kick()
+    return applied + outbox.drain()
+
+
+@shared_task
+def prune_outbox(retention_days=None):
+    """
+    Delete applied outbox events older than the retention period.
+    """
+    retention_days = settings.NOTE_OUTBOX_RETENTION_DAYS if retention_days is None else retention_days
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    deleted, _ = OutboxEvent.objects.filter(processed_at__lt=cutoff).delete()
+    logger.info(f"Pruned {deleted} outbox events")
+    return deleted
+
+
+def blob_is_stale(storage, name, cutoff):
+    try:
+        return storage.get_modified_time(name) <= cutoff
+    except FileNotFoundError:
+        return True
+
+
+@shared_task
+def collect_image_blobs():
+    """
+    Delete image blobs no note has referenced for the grace period, plus files
+    in the store that never got a blob row (abandoned uploads).
+    """
+    storage = Note._meta.get_field('image').storage
+    cutoff = timezone.now() - timedelta(seconds=settings.NOTE_IMAGE_GC_GRACE_SECONDS)
+    removed = 0
+
+    for blob_id in ImageBlob.objects.filter(refcount__lte=0, updated_at__lte=cutoff).values_list('id', flat=True).iterator():
+        with transaction.atomic():
+            blob = ImageBlob.objects.select_for_update().filter(id=blob_id, refcount__lte=0).first()
+            if blob is None or not blob_is_stale(storage, blob.name, cutoff):
+                continue
+            # The refcount is only a hint; the notes table has the final word.
+            references = Note.objects.filter(image=blob.name).count()
+            if references:
+                blob.refcount = references
+                blob.save(update_fields=['refcount', 'updated_at'])
+                continue
+            for formats in (blob.derivatives or {}).values():
+                for derivative in formats.values():
+                    storage.delete(derivative)
+            storage.delete(blob.name)
+            blob.delete()
+            removed += 1
+
+    if os.path.isdir(storage.location):
+        for root, _, files in os.walk(storage.location):
+            for file_name in files:
+                path = os.path.join(root, file_name)
+                name = os.path.relpath(path, storage.location).replace(os.sep, '/')
+                if os.path.getmtime(path) > time.time() - settings.NOTE_IMAGE_GC_GRACE_SECONDS:
+                    continue
+                derivative = DERIVATIVE_NAME_RE.fullmatch(name)
+                if file_name.startswith(UPLOAD_PREFIX) or (
+                    BLOB_NAME_RE.fullmatch(name)
+                    and not ImageBlob.objects.filter(name=name).exists()
+                    and not Note.objects.filter(image=name).exists()
+                ) or (
+                    derivative
+                    and not ImageBlob.objects.filter(name__startswith=name.rsplit('-', 1)[0]).exists()
+                ):
+                    os.unlink(path)
+                    removed += 1
+
+    logger.info(f"Removed {removed} unreferenced image blobs")
+    return removed
+
+
+@shared_task
+def warm_user_caches(user_id):
+    """
+    Fill the cached note, archived and trashed lists of the user so their first
+    request after a login or a cache flush is not a miss.
+    """
+    return NoteFragmentCache().warm(user_id)
+
+
+@shared_task
+def warm_active_users(limit=None, active_within=None):
+    """
+    Warm the caches of the most recently active users, one user at a time and
+    at most NOTE_WARMUP_USERS_PER_SECOND of them, so a warm-up after a deploy
+    or a Redis flush does not flood Postgres. Returns the number of users warmed.
+    """
+    limit = limit or settings.NOTE_WARMUP_USERS
+    if active_within is None:
+        active_within = settings.NOTE_WARMUP_ACTIVE_HOURS * 3600
+    interval = 1 / settings.NOTE_WARMUP_USERS_PER_SECOND
+    cache = NoteFragmentCache()
+    warmed = 0
+    for user_id in recently_active(limit, active_within):
+        started = time.monotonic()
+        try:
+            cache.warm(user_id)
+            warmed += 1
+        except Exception as e:
+            logger.error(f"Could not warm the caches of user {user_id}: {str(e)}")
+        time.sleep(max(0, interval - (time.monotonic() - started)))
+
+    logger.info(f"Warmed the caches of {warmed} active users")
+    return warmed
+
+
+@shared_task
+def decay_cache_stats():
+    decay_access_counts()
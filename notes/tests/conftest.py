@@ -0,0 +1,41 @@
+import pytest
+from rest_framework.reverse import reverse
+
+
+#Create Note Pytest
+@pytest.fixture
+def generate_usertoken(client, django_user_model):
+    django_user_model.objects.create_user(
+        # first_name="Sonal",
+        # last_name="Rajupt",
+        email="sonalraj2001@gmail.com",
+        password="Sonal@2002"
+    )
+
+    data = {
+       "email":"sonalraj2001@gmail.com",
+       "password":"Sonal@2002",
+    }
+    url = reverse('login_user')
+    response = client.post(url, data=data, content_type='application/json')
+    # print(f"res  : {response.data}")
+    return response.data["data"]["access"]
+
+
+@pytest.fixture
+def generate_usertoken2(client, django_user_model):
+    django_user_model.objects.create_user(
+        # first_name="Sonal",
+        # last_name="Rajupt",
+        email="sonalraj2002@gmail.com",
+        password="Sonal@2002"
+    )
+
+    data = {
+       "email":"sonalraj2002@gmail.com",
+       "password":"Sonal@2002",
+    }
+    url = reverse('login_user')
+    response = client.post(url, data=data, content_type='application/json')
+    # print(f"res  : {response.data}")
+    return response.data["data"]["access"]
@@ -0,0 +1,26 @@
+import io
+from rest_framework.reverse import reverse
+from rest_framework import status
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+
+def create_note(client, token, **fields):
+    data = {
+        "title": "Meeting",
+        "description": "This is the description of my secret note.",
+        "color": "violet",
+        "is_archive": False,
+        "is_trash": False,
+    }
+    data.update(fields)
+    url = reverse('note-list')
+    response = client.post(url, HTTP_AUTHORIZATION=f'Bearer {token}', data=data, content_type='application/json')
+    assert response.status_code == status.HTTP_201_CREATED
+    return response.data['data']['id']
+
+
+def png_upload(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (4, 4), color).save(buffer, format='PNG')
+    return SimpleUploadedFile('photo.PNG', buffer.getvalue(), content_type='image/png')
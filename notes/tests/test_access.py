@@ -0,0 +1,41 @@
+import pytest
+from user.models import User
+from rest_framework.reverse import reverse
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from notes.models import NoteAccess
+from notes.tests.helpers import create_note
+
+
+@pytest.mark.django_db
+@pytest.mark.note_access
+class TestNoteAccess:
+
+    def test_owner_access_created(self, client, generate_usertoken):
+        note_id = create_note(client, generate_usertoken)
+        
+        access = NoteAccess.objects.get(note_id=note_id)
+        assert access.access_type == NoteAccess.owner
+        
+    def test_collaborator_access_added_and_removed(self, client, generate_usertoken, generate_usertoken2):
+        note_id = create_note(client, generate_usertoken)
+        user_id = User.objects.get(email="sonalraj2002@gmail.com").id
+        
+        data = {"note_id": note_id, "user_id": [user_id], "access_type": "read_write"}
+        url = reverse('collab-add_collaborator')
+        client.post(url, data, HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}', content_type='application/json')
+        assert NoteAccess.objects.get(note_id=note_id, user_id=user_id).access_type == "read_write"
+        
+        url = reverse('collab-remove_collaborator')
+        client.post(url, data, HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}', content_type='application/json')
+        assert not NoteAccess.objects.filter(note_id=note_id, user_id=user_id).exists()
+        
+    def test_check_note_access_repairs_drift(self, client, generate_usertoken):
+        note_id = create_note(client, generate_usertoken)
+        NoteAccess.objects.filter(note_id=note_id).delete()
+        
+        with pytest.raises(CommandError):
+            call_command('check_note_access')
+        call_command('backfill_note_access')
+        call_command('check_note_access')
+        assert NoteAccess.objects.filter(note_id=note_id).exists()
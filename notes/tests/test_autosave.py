@@ -0,0 +1,85 @@
+import pytest
+from user.models import User
+from rest_framework.reverse import reverse
+from rest_framework import status
+from notes.models import Note, Collaborator
+from notes.task import flush_autosave, flush_autosave_buffers
+from notes.autosave import AutosaveBuffer
+from notes.tests.helpers import create_note
+
+
+@pytest.mark.django_db
+@pytest.mark.note_autosave
+class TestAutosave:
+
+    @pytest.fixture(autouse=True)
+    def scheduled(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(flush_autosave, 'apply_async', lambda args, countdown: calls.append((args, countdown)))
+        return calls
+
+    def autosave(self, client, token, note_id, **fields):
+        url = reverse('note-autosave', args=[note_id])
+        return client.patch(url, data=fields, HTTP_AUTHORIZATION=f'Bearer {token}', content_type='application/json')
+
+    def test_edits_are_buffered_then_flushed_once(self, client, generate_usertoken, scheduled):
+        note_id = create_note(client, generate_usertoken, title="Draft")
+        for title in ("Dra", "Draft two", "Draft three"):
+            response = self.autosave(client, generate_usertoken, note_id, title=title, description="typing")
+            assert response.status_code == status.HTTP_202_ACCEPTED
+        assert scheduled == [((note_id,), 3)]
+        assert Note.objects.get(id=note_id).title == "Draft"
+        
+        detail = client.get(reverse('note-detail', args=[note_id]), HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}')
+        assert detail.data['data']['title'] == "Draft three"
+        listed = client.get(reverse('note-list') + '?mode=summary', HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}').json()
+        assert listed['data'][0]['title'] == "Draft three" and listed['data'][0]['snippet'] == "typing"
+        
+        assert flush_autosave(note_id) == 2
+        note = Note.objects.get(id=note_id)
+        assert (note.title, note.description, note.version) == ("Draft three", "typing", 2)
+        assert AutosaveBuffer().read(note_id) == {}
+        
+        self.autosave(client, generate_usertoken, note_id, title="Final")
+        assert len(scheduled) == 2
+        response = client.post(reverse('note-commit_autosave', args=[note_id]), HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}')
+        assert response.data['data']['title'] == "Final"
+
+    def test_failed_flush_keeps_edits(self, client, generate_usertoken, generate_usertoken2, monkeypatch, settings):
+        note_id = create_note(client, generate_usertoken)
+        assert self.autosave(client, generate_usertoken, note_id, is_trash=True).status_code == status.HTTP_400_BAD_REQUEST
+        self.autosave(client, generate_usertoken, note_id, title="Unsaved")
+        
+        def fail(*args, **kwargs):
+            raise RuntimeError("database went away")
+        with monkeypatch.context() as patch:
+            patch.setattr(Note, 'save', fail)
+            with pytest.raises(RuntimeError):
+                flush_autosave(note_id)
+        assert AutosaveBuffer().read(note_id) == {'title': "Unsaved"}
+        
+        settings.NOTE_AUTOSAVE_MAX_DELAY_SECONDS = -1
+        flush_autosave_buffers()
+        assert Note.objects.get(id=note_id).title == "Unsaved"
+        assert note_id not in AutosaveBuffer().due(-1)
+        
+        other = User.objects.get(email="sonalraj2002@gmail.com")
+        Collaborator.objects.create(note_id_id=note_id, user_id=other, access_type=Collaborator.read_only)
+        assert self.autosave(client, generate_usertoken2, note_id, title="Mine").status_code == status.HTTP_403_FORBIDDEN
+
+    def test_edit_lands_autosaves_only_with_write_access(self, client, generate_usertoken, generate_usertoken2):
+        note_id = create_note(client, generate_usertoken, title="Draft")
+        other = User.objects.get(email="sonalraj2002@gmail.com")
+        Collaborator.objects.create(note_id_id=note_id, user_id=other, access_type=Collaborator.read_only)
+        self.autosave(client, generate_usertoken, note_id, title="Buffered")
+        version = Note.objects.get(id=note_id).version
+        
+        url = reverse('note-detail', args=[note_id])
+        response = client.patch(url, data={"color": "red"}, HTTP_AUTHORIZATION=f'Bearer {generate_usertoken2}', content_type='application/json')
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert Note.objects.filter(id=note_id).values_list('title', 'version').get() == ("Draft", version)
+        assert AutosaveBuffer().read(note_id) == {'title': "Buffered"}
+        
+        response = client.patch(url, data={"color": "red"}, HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}', content_type='application/json')
+        assert (response.data['data']['title'], response.data['data']['color']) == ("Buffered", "red")
+        assert AutosaveBuffer().read(note_id) == {}
@@ -0,0 +1,92 @@
+import pytest
+from user.models import User
+from rest_framework.reverse import reverse
+from rest_framework import status
+from notes.models import Note, Collaborator
+from notes.permissions import NotePermissionResolver
+from types import SimpleNamespace
+from notes.redisutil import RedisUtils
+from notes.breaker import CacheUnavailable, breaker
+from notes.permissions import ACCESS_EPOCH_KEY
+from notes import permissions
+from django.core.cache import caches
+from redis.exceptions import ConnectionError as RedisConnectionError
+import time
+from notes.tests.helpers import create_note
+
+
+@pytest.mark.django_db
+@pytest.mark.redis_outage
+class TestRedisOutage:
+
+    @pytest.fixture
+    def redis_outage(self, settings):
+        settings.REDIS_BREAKER_RESET_SECONDS = 60
+        for _ in range(settings.REDIS_BREAKER_FAILURES):
+            breaker.failed()
+        yield
+        breaker.succeeded()
+        caches['fallback'].clear()
+
+    def test_breaker_opens_and_recovers(self, settings):
+        settings.REDIS_BREAKER_FAILURES = 2
+        settings.REDIS_BREAKER_RESET_SECONDS = 0.05
+        epoch = RedisUtils().get_counter(ACCESS_EPOCH_KEY)
+        for _ in range(2):
+            with pytest.raises(CacheUnavailable):
+                with breaker.guard():
+                    raise RedisConnectionError("connection refused")
+        assert breaker.is_open()
+        with pytest.raises(CacheUnavailable):
+            with breaker.guard():
+                pytest.fail("an open breaker must not reach Redis")
+        
+        time.sleep(0.06)
+        with breaker.guard():
+            pass
+        assert not breaker.is_open() and breaker.state == breaker.closed
+        # Access versions bumped during the outage were lost, so cached permissions move to a new epoch.
+        assert RedisUtils().get_counter(ACCESS_EPOCH_KEY) == epoch + 1
+
+    def test_values_fall_back_to_local_cache(self, redis_outage):
+        redis = RedisUtils()
+        redis.save('outage_key', {'a': 1}, ex=300)
+        assert redis.get('outage_key') == {'a': 1}
+        with pytest.raises(CacheUnavailable):
+            redis.delete('outage_key')
+        assert redis.get('outage_key') is None
+        assert redis.incr('outage_counter') is None
+
+    def test_lost_access_bump_moves_the_epoch(self, client, generate_usertoken, generate_usertoken2, monkeypatch, django_capture_on_commit_callbacks):
+        note_id = create_note(client, generate_usertoken, title="Shared")
+        collaborator = User.objects.get(email="sonalraj2002@gmail.com")
+        Collaborator.objects.create(note_id_id=note_id, user_id=collaborator, access_type=Collaborator.read_write)
+        resolver = NotePermissionResolver()
+        assert resolver.access_type(SimpleNamespace(user=collaborator), note_id) == Collaborator.read_write
+        
+        # A transient failure, too short to open the breaker, loses the bumps and the epoch move.
+        monkeypatch.setattr(permissions, 'incr_access_versions', lambda note_ids: False)
+        monkeypatch.setattr(RedisUtils, 'incr', lambda self, key: None)
+        with django_capture_on_commit_callbacks(execute=True):
+            Collaborator.objects.get(note_id_id=note_id, user_id=collaborator).delete()
+        assert resolver.access_type(SimpleNamespace(user=collaborator), note_id) is None
+        
+        monkeypatch.undo()
+        epoch = RedisUtils().get_counter(ACCESS_EPOCH_KEY)
+        assert resolver.access_type(SimpleNamespace(user=collaborator), note_id) is None
+        assert RedisUtils().get_counter(ACCESS_EPOCH_KEY) == epoch + 1
+
+    def test_note_api_serves_from_database(self, client, generate_usertoken, redis_outage):
+        note_id = create_note(client, generate_usertoken, title="First")
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {generate_usertoken}'}
+        
+        response = client.get(reverse('note-list'), **headers)
+        assert [note['title'] for note in response.json()['data']] == ["First"]
+        response = client.get(reverse('note-detail', args=[note_id]), **headers)
+        assert response.status_code == status.HTTP_200_OK and response.data['data']['title'] == "First"
+        
+        response = client.patch(reverse('note-autosave', args=[note_id]), data={"title": "Autosaved"}, content_type='application/json', **headers)
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert Note.objects.get(id=note_id).title == "Autosaved"
+        response = client.patch(reverse('note-detail', args=[note_id]), data={"color": "blue"}, content_type='application/json', **headers)
+        assert response.status_code == status.HTTP_200_OK
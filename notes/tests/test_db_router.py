@@ -0,0 +1,53 @@
+import pytest
+from user.models import User
+from rest_framework.reverse import reverse
+from rest_framework import status
+from django.core.management import call_command
+from notes.models import Note
+from types import SimpleNamespace
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from django_redis import get_redis_connection
+from fundoonote import db_router
+from notes.redisutil import RedisUtils
+from notes.tests.helpers import create_note
+
+
+@pytest.mark.django_db(transaction=True, databases=['default', 'replica'])
+@pytest.mark.replica
+class TestReplicaRouting:
+
+    def replica_queries(self, client, token, user_id):
+        RedisUtils("notes").delete(f"user_{user_id}")
+        with CaptureQueriesContext(connections['replica']) as queries:
+            response = client.get(reverse('note-list'), HTTP_AUTHORIZATION=f'Bearer {token}')
+        assert response.status_code == status.HTTP_200_OK
+        return len([query for query in queries if Note._meta.db_table in query['sql']])
+
+    def test_reads_stick_to_primary_after_write(self, client, generate_usertoken):
+        user_id = User.objects.get(email="sonalraj2001@gmail.com").id
+        RedisUtils().delete(db_router.pin_key(user_id))
+        assert self.replica_queries(client, generate_usertoken, user_id) > 0
+        
+        create_note(client, generate_usertoken)
+        assert self.replica_queries(client, generate_usertoken, user_id) == 0
+        
+        RedisUtils().delete(db_router.pin_key(user_id))
+        assert self.replica_queries(client, generate_usertoken, user_id) > 0
+
+    def test_routing_decisions(self, settings):
+        assert db_router.read_alias() == ('default', 'outside_request')
+        with db_router.routing(SimpleNamespace(method='GET')):
+            assert db_router.read_alias() == ('replica', 'replica')
+        with db_router.routing(SimpleNamespace(method='PATCH')):
+            assert db_router.read_alias() == ('default', 'write_request')
+        settings.DATABASE_REPLICAS = []
+        with db_router.routing(SimpleNamespace(method='GET')):
+            assert db_router.read_alias() == ('default', 'no_replica')
+
+    def test_routing_stats_command(self, capsys):
+        get_redis_connection("default").delete(db_router.ROUTING_STATS_KEY)
+        with db_router.routing(SimpleNamespace(method='GET')):
+            list(Note.objects.all())
+        call_command('db_routing_stats', '--reset')
+        assert "replica      replica" in capsys.readouterr().out
@@ -0,0 +1,65 @@
+import json
+import pytest
+from user.models import User
+from rest_framework.reverse import reverse
+from notes.models import Collaborator
+from notes.task import drain_outbox
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from fundoonote.asgi import application
+from notes.tests.helpers import create_note
+
+
+@pytest.mark.django_db
+@pytest.mark.note_events
+class TestNoteEvents:
+
+    @pytest.fixture(autouse=True)
+    def memory_layer(self, settings):
+        settings.NOTE_EVENTS_LAYER = 'notes.events.InMemoryEventLayer'
+
+    def connect(self, token):
+        scope = {'type': 'websocket', 'path': '/ws/notes/', 'query_string': f'token={token}'.encode()}
+        return ApplicationCommunicator(application, scope)
+
+    def test_collaborator_receives_changes(self, client, generate_usertoken, generate_usertoken2, django_capture_on_commit_callbacks):
+        note_id = create_note(client, generate_usertoken)
+        drain_outbox()
+        other = User.objects.get(email="sonalraj2002@gmail.com")
+        
+        def share():
+            with django_capture_on_commit_callbacks(execute=True):
+                Collaborator.objects.create(note_id_id=note_id, user_id=other, access_type=Collaborator.read_write)
+        
+        def edit():
+            with django_capture_on_commit_callbacks(execute=True):
+                client.patch(reverse('note-detail', args=[note_id]), data={"title": "Renamed"}, HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}', content_type='application/json')
+                client.patch(reverse('note-toggle_trash', args=[note_id]), HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}')
+        
+        async def session():
+            communicator = self.connect(generate_usertoken2)
+            await communicator.send_input({'type': 'websocket.connect'})
+            assert (await communicator.receive_output(1))['type'] == 'websocket.accept'
+            assert json.loads((await communicator.receive_output(1))['text']) == {'event': 'ready', 'poll': False}
+            
+            await sync_to_async(share)()
+            await sync_to_async(edit)()
+            events = [json.loads((await communicator.receive_output(1))['text']) for _ in range(3)]
+            assert await communicator.receive_nothing()
+            await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            await communicator.wait(1)
+            return events
+        
+        events = async_to_sync(session)()
+        assert [(event['event'], event['note']) for event in events] == [
+            ('note.shared', note_id), ('note.updated', note_id), ('note.trashed', note_id),
+        ]
+        assert events[1]['version'] < events[2]['version']
+
+    def test_rejects_missing_token(self):
+        async def session():
+            communicator = self.connect('not-a-token')
+            await communicator.send_input({'type': 'websocket.connect'})
+            return await communicator.receive_output(1)
+        
+        assert async_to_sync(session)() == {'type': 'websocket.close', 'code': 4401}
@@ -0,0 +1,48 @@
+import gzip
+import json
+import pytest
+from rest_framework.reverse import reverse
+from rest_framework import status
+from notes.models import ExportJob
+from notes.task import export_user_data
+from notes.tests.helpers import create_note
+
+
+@pytest.mark.django_db
+@pytest.mark.note_export
+class TestExport:
+
+    def test_export_streams_ndjson(self, client, generate_usertoken, settings, tmp_path):
+        settings.NOTE_EXPORT_DIR = tmp_path
+        note_id = create_note(client, generate_usertoken)
+        
+        url = reverse('export-list')
+        response = client.post(url, data={"compress": True}, HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}', content_type='application/json')
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        job_id = response.data['data']['id']
+        
+        url = reverse('export-download', args=[job_id])
+        response = client.get(url, HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}')
+        assert response.status_code == status.HTTP_409_CONFLICT
+        
+        export_user_data(job_id)
+        job = ExportJob.objects.get(id=job_id)
+        assert job.status == ExportJob.completed
+        assert job.processed == job.total == 1
+        
+        response = client.get(url, HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}')
+        assert response.status_code == status.HTTP_200_OK
+        records = [json.loads(line) for line in gzip.decompress(b"".join(response.streaming_content)).splitlines()]
+        assert records[0]['type'] == 'note' and records[0]['id'] == note_id
+        
+        (tmp_path / job.file_name).unlink()
+        response = client.get(url, HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}')
+        assert response.status_code == status.HTTP_410_GONE
+        
+    def test_export_of_other_user_hidden(self, client, generate_usertoken, generate_usertoken2):
+        url = reverse('export-list')
+        response = client.post(url, data={}, HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}', content_type='application/json')
+        
+        url = reverse('export-detail', args=[response.data['data']['id']])
+        response = client.get(url, HTTP_AUTHORIZATION=f'Bearer {generate_usertoken2}')
+        assert response.status_code == status.HTTP_404_NOT_FOUND
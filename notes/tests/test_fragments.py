@@ -0,0 +1,62 @@
+import json
+import pytest
+from user.models import User
+from rest_framework.reverse import reverse
+from rest_framework import status
+from notes.models import Note, Collaborator
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from notes.task import drain_outbox
+from notes.tests.helpers import create_note
+
+
+@pytest.mark.django_db
+@pytest.mark.note_fragments
+class TestNoteFragments:
+
+    def list_notes(self, client, token):
+        with CaptureQueriesContext(connections['default']) as queries:
+            response = client.get(reverse('note-list'), HTTP_AUTHORIZATION=f'Bearer {token}')
+        assert response.status_code == status.HTTP_200_OK
+        note_queries = [query for query in queries if Note._meta.db_table in query['sql']]
+        return json.loads(response.content), len(note_queries)
+
+    def test_cached_list_is_assembled_from_fragments(self, client, generate_usertoken):
+        create_note(client, generate_usertoken, title="First")
+        create_note(client, generate_usertoken, title="Second")
+        
+        body, queries = self.list_notes(client, generate_usertoken)
+        assert [note['title'] for note in body['data']] == ["First", "Second"]
+        assert body['Message'] == "The list of notes of user " and queries > 0
+        
+        cached, queries = self.list_notes(client, generate_usertoken)
+        assert cached == body and queries == 0
+
+    def test_changes_create_new_fragment_versions(self, client, generate_usertoken, generate_usertoken2):
+        first = create_note(client, generate_usertoken, title="First")
+        second = create_note(client, generate_usertoken, title="Second")
+        self.list_notes(client, generate_usertoken)
+        
+        url = reverse('note-detail', args=[first])
+        client.patch(url, data={"title": "Renamed"}, HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}', content_type='application/json')
+        assert Note.objects.get(id=first).version == 2
+        
+        other = User.objects.get(email="sonalraj2002@gmail.com")
+        Collaborator.objects.create(note_id_id=second, user_id=other, access_type=Collaborator.read_only)
+        drain_outbox()
+        
+        body, _ = self.list_notes(client, generate_usertoken)
+        assert [note['title'] for note in body['data']] == ["Renamed", "Second"]
+        assert body['data'][1]['collaborator'] == [other.id]
+        
+        shared, _ = self.list_notes(client, generate_usertoken2)
+        assert [note['id'] for note in shared['data']] == [second]
+
+    def test_list_and_detail_share_the_image_url(self, client, generate_usertoken):
+        note_id = create_note(client, generate_usertoken)
+        Note.objects.filter(id=note_id).update(image="notes/photo.png")
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {generate_usertoken}'}
+        
+        listed = client.get(reverse('note-list'), **headers).json()['data'][0]['image']
+        detail = client.get(reverse('note-detail', args=[note_id]), **headers).data['data']['image']
+        assert listed == detail == Note.objects.get(id=note_id).image.url
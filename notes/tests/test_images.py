@@ -0,0 +1,87 @@
+import pytest
+from rest_framework.reverse import reverse
+from rest_framework import status
+from notes.models import Note
+from django.test.client import encode_multipart, BOUNDARY, MULTIPART_CONTENT
+from notes.models import ImageBlob
+from notes.task import collect_image_blobs, generate_image_derivatives
+from notes.tests.helpers import create_note, png_upload
+
+
+@pytest.mark.django_db
+@pytest.mark.note_images
+class TestImageStore:
+
+    @pytest.fixture(autouse=True)
+    def image_root(self, settings, tmp_path):
+        settings.NOTE_IMAGE_ROOT = tmp_path
+        return tmp_path
+
+    def upload(self, client, token, note_id, color):
+        url = reverse('note-detail', args=[note_id])
+        data = encode_multipart(BOUNDARY, {'image': png_upload(color)})
+        response = client.patch(url, data=data, content_type=MULTIPART_CONTENT, HTTP_AUTHORIZATION=f'Bearer {token}')
+        assert response.status_code == status.HTTP_200_OK
+        return response.data['data']['image']
+
+    def resize_callbacks(self, callbacks):
+        return [callback for callback in callbacks if callback.__qualname__.startswith('note_saved')]
+
+    def test_identical_uploads_share_one_blob(self, client, generate_usertoken, image_root):
+        notes = [create_note(client, generate_usertoken) for _ in range(2)]
+        urls = [self.upload(client, generate_usertoken, note_id, 'red') for note_id in notes]
+        
+        assert urls[0] == urls[1] and urls[0].endswith('.png')
+        assert len([path for path in image_root.rglob('*') if path.is_file()]) == 1
+        blob = ImageBlob.objects.get()
+        assert blob.refcount == 2 and blob.size > 0
+        
+        self.upload(client, generate_usertoken, notes[0], 'blue')
+        Note.objects.get(id=notes[1]).delete()
+        assert ImageBlob.objects.get(name=blob.name).refcount == 0
+        
+        response = client.get(urls[0])
+        assert response['Cache-Control'] == 'public, max-age=31536000, immutable'
+        assert client.get(urls[0], HTTP_IF_NONE_MATCH=response['ETag']).status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_gc_removes_unreferenced_blobs(self, client, generate_usertoken, image_root, settings):
+        note_id = create_note(client, generate_usertoken)
+        self.upload(client, generate_usertoken, note_id, 'red')
+        self.upload(client, generate_usertoken, note_id, 'green')
+        (image_root / '.upload-abandoned').write_bytes(b'partial')
+        
+        settings.NOTE_IMAGE_GC_GRACE_SECONDS = -1
+        assert collect_image_blobs() == 2
+        assert list(ImageBlob.objects.values_list('name', flat=True)) == [Note.objects.get(id=note_id).image.name]
+        assert len([path for path in image_root.rglob('*') if path.is_file()]) == 1
+
+    def test_derivatives_generated_after_commit(self, client, generate_usertoken, image_root, settings, django_capture_on_commit_callbacks):
+        note_id = create_note(client, generate_usertoken)
+        with django_capture_on_commit_callbacks() as callbacks:
+            url = self.upload(client, generate_usertoken, note_id, 'red')
+        assert len(self.resize_callbacks(callbacks)) == 1
+        assert Note.objects.get(id=note_id).image_derivatives is None
+        
+        name = Note.objects.get(id=note_id).image.name
+        derivatives = generate_image_derivatives(name)
+        assert set(derivatives) == {'thumbnail', 'medium'}
+        assert all((image_root / path).is_file() for formats in derivatives.values() for path in formats.values())
+        
+        response = client.get(reverse('note-list'), HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}')
+        listed = response.json()['data'][0]['image_derivatives']
+        assert listed['thumbnail']['webp'].endswith('-thumbnail.webp')
+        assert listed['medium']['jpeg'].endswith('-medium.jpg')
+        assert client.get(listed['thumbnail']['webp'])['Cache-Control'] == 'public, max-age=31536000, immutable'
+        
+        # A second note with the same image gets the derivatives straight away.
+        other_id = create_note(client, generate_usertoken)
+        with django_capture_on_commit_callbacks() as callbacks:
+            assert self.upload(client, generate_usertoken, other_id, 'red') == url
+        assert not self.resize_callbacks(callbacks)
+        assert Note.objects.get(id=other_id).image_derivatives == derivatives
+        
+        ImageBlob.objects.filter(name=name).update(refcount=0)
+        Note.objects.filter(image=name).update(image=None)
+        settings.NOTE_IMAGE_GC_GRACE_SECONDS = -1
+        collect_image_blobs()
+        assert not [path for path in image_root.rglob('*') if path.is_file()]
@@ -0,0 +1,75 @@
+import json
+import pytest
+from rest_framework.reverse import reverse
+from rest_framework import status
+from django.core.management import call_command
+from notes.models import Note, NoteAccess
+from notes.importer import NoteImporter
+from notes.serializers import NoteImportSerializer
+from rest_framework.exceptions import ValidationError
+from notes.tests.helpers import create_note
+
+
+@pytest.mark.django_db
+@pytest.mark.note_import
+class TestBulkImport:
+
+    def test_bulk_import_reports_row_errors(self, client, generate_usertoken):
+        rows = [
+            {"title": "First", "description": "one", "reminder": "2030-01-01T10:00"},
+            {"description": "missing title"},
+            {"title": "Trashed", "is_trash": True},
+        ]
+        url = reverse('note-bulk_import')
+        response = client.post(url, data=rows, HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}', content_type='application/json')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['data']['created'] == 2
+        assert [error['row'] for error in response.data['data']['errors']] == [1]
+        assert NoteAccess.objects.filter(access_type=NoteAccess.owner).count() == 2
+        assert Note.objects.get(title="Trashed").trashed_at is not None
+        
+    def test_field_validation_matches_the_serializer(self, generate_usertoken):
+        serializer = NoteImportSerializer()
+        fields = NoteImporter.plain_fields(serializer)
+        valid = [
+            {"title": "  Plain  ", "description": None, "color": "red", "is_archive": True, "reminder": "2030-01-02T09:30"},
+            {"title": "Aware", "reminder": "2030-01-02T09:30:00+02:00"},
+            {"title": "No extras"},
+            {"title": "Null reminder", "reminder": None, "description": ""},
+            {"title": "Loose bool", "is_trash": "true", "label": ["1"]},
+        ]
+        invalid = [
+            {"title": "   "},
+            {"title": "x" * 201},
+            {"title": "Nul\x00"},
+            {"title": ["list"]},
+            {"title": "Bad bool", "is_trash": "maybe"},
+            {"description": "No title", "color": "x" * 51},
+            {"title": "Bad date", "reminder": "soon"},
+            {"title": "Bad label", "label": ["one"]},
+        ]
+        for row in valid:
+            data = NoteImporter.validate_fields(fields, row)
+            expected = dict(serializer.to_internal_value(row))
+            assert data == expected
+            assert getattr(data.get('reminder'), 'tzinfo', None) == getattr(expected.get('reminder'), 'tzinfo', None)
+        for row in invalid:
+            with pytest.raises(ValidationError) as fast:
+                NoteImporter.validate_fields(fields, row)
+            with pytest.raises(ValidationError) as slow:
+                serializer.to_internal_value(row)
+            assert fast.value.detail == slow.value.detail
+
+    def test_import_notes_command_with_copy(self, client, generate_usertoken, tmp_path):
+        label_id = client.post(reverse('label'), data={"name": "Work", "color": "Red"}, HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}', content_type='application/json').data["id"]
+        path = tmp_path / "notes.ndjson"
+        path.write_text("\n".join(json.dumps({"title": f"Note {i}", "description": "tab\there\nnew line", "label": [label_id]}) for i in range(5)))
+        
+        call_command('import_notes', "sonalraj2001@gmail.com", str(path), '--copy', '--batch-size', '2')
+        
+        notes = Note.objects.filter(title__startswith="Note ")
+        assert notes.count() == 5
+        assert notes.first().description == "tab\there\nnew line"
+        assert Note.label.through.objects.filter(label_id=label_id).count() == 5
+        create_note(client, generate_usertoken)
@@ -6,45 +6,6 @@ from rest_framework.test import APIClient
 from rest_framework_simplejwt.tokens import RefreshToken
 
 
-#Create Note Pytest
-@pytest.fixture
-def generate_usertoken(client, django_user_model):
-    django_user_model.objects.create_user(
-        # first_name="Sonal",
-        # last_name="Rajupt",
-        email="sonalraj2001@gmail.com",
-        password="Sonal@2002"
-    )
-
-    data = {
-       "email":"sonalraj2001@gmail.com",
-       "password":"Sonal@2002",
-    }
-    url = reverse('login_user')
-    response = client.post(url, data=data, content_type='application/json')
-    # print(f"res  : {response.data}")
-    return response.data["data"]["access"]
-
-
-@pytest.fixture
-def generate_usertoken2(client, django_user_model):
-    django_user_model.objects.create_user(
-        # first_name="Sonal",
-        # last_name="Rajupt",
-        email="sonalraj2002@gmail.com",
-        password="Sonal@2002"
-    )
-
-    data = {
-       "email":"sonalraj2002@gmail.com",
-       "password":"Sonal@2002",
-    }
-    url = reverse('login_user')
-    response = client.post(url, data=data, content_type='application/json')
-    # print(f"res  : {response.data}")
-    return response.data["data"]["access"]
-
-
 @pytest.mark.django_db
 @pytest.mark.note
 class TestNoteSuccess:
@@ -188,7 +149,7 @@ class TestNoteCreateFailure:
     "reminder":"2024-08-26T11:50"
 }
         url = reverse('note-list')
-        response = client.post(url, HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}',data=data,content_type='application/json')
+        response = client.post(url, HTTP_AUTHORIZATION='Bearer invalid',data=data,content_type='application/json')
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
         
             
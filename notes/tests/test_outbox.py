@@ -0,0 +1,54 @@
+import pytest
+from rest_framework.reverse import reverse
+from notes.models import OutboxEvent
+from django_celery_beat.models import PeriodicTask
+from notes.task import drain_outbox
+from notes import outbox
+from notes.tests.helpers import create_note
+
+
+@pytest.mark.django_db
+@pytest.mark.note_outbox
+class TestOutbox:
+
+    def list_titles(self, client, token):
+        response = client.get(reverse('note-list'), HTTP_AUTHORIZATION=f'Bearer {token}')
+        return [note['title'] for note in response.json()['data']]
+
+    def test_side_effects_follow_the_drain(self, client, generate_usertoken, django_capture_on_commit_callbacks):
+        note_id = create_note(client, generate_usertoken, title="First", reminder="2030-01-02T09:30")
+        assert list(OutboxEvent.objects.values_list('topic', 'action', 'object_id')) == [('note', 'created', note_id)]
+        assert not PeriodicTask.objects.filter(name=f'reminder-task-{note_id}').exists()
+        
+        assert drain_outbox() == 1
+        assert PeriodicTask.objects.get(name=f'reminder-task-{note_id}').crontab.hour == '9'
+        assert self.list_titles(client, generate_usertoken) == ["First"]
+        
+        with django_capture_on_commit_callbacks() as callbacks:
+            client.patch(reverse('note-detail', args=[note_id]), data={"title": "Renamed", "reminder": None}, HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}', content_type='application/json')
+        # The editor's own caches are dropped on commit, before the drain runs.
+        for callback in callbacks:
+            if callback.__qualname__.startswith('evict_own_caches'):
+                callback()
+        assert self.list_titles(client, generate_usertoken) == ["Renamed"]
+        assert PeriodicTask.objects.filter(name=f'reminder-task-{note_id}').exists()
+        drain_outbox()
+        assert not PeriodicTask.objects.filter(name=f'reminder-task-{note_id}').exists()
+        assert not OutboxEvent.objects.filter(processed_at__isnull=True).exists()
+
+    def test_failing_event_blocks_then_is_set_aside(self, client, generate_usertoken, monkeypatch, settings):
+        first = create_note(client, generate_usertoken)
+        second = create_note(client, generate_usertoken)
+        
+        def fail_first(event):
+            if event.object_id == first:
+                raise RuntimeError("cache unavailable")
+        monkeypatch.setitem(outbox.handlers, 'note', fail_first)
+        settings.NOTE_OUTBOX_MAX_ATTEMPTS = 2
+        
+        assert outbox.drain() == 0
+        assert OutboxEvent.objects.filter(processed_at__isnull=True).count() == 2
+        assert outbox.drain() == 1
+        failed = OutboxEvent.objects.get(object_id=first)
+        assert failed.attempts == 2 and failed.error == "cache unavailable" and failed.processed_at is not None
+        assert OutboxEvent.objects.get(object_id=second).processed_at is not None
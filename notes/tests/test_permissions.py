@@ -0,0 +1,65 @@
+import pytest
+from user.models import User
+from rest_framework.reverse import reverse
+from rest_framework import status
+from notes.models import NoteAccess, Collaborator
+from notes.permissions import NotePermissionResolver
+from notes.access import grant_collaborator_access, revoke_collaborator_access
+from types import SimpleNamespace
+from notes.tests.helpers import create_note
+
+
+@pytest.mark.django_db
+@pytest.mark.note_permission
+class TestNotePermissionResolver:
+
+    def test_resolve_is_memoized_per_request(self, client, generate_usertoken, django_assert_num_queries):
+        note_id = create_note(client, generate_usertoken)
+        user = User.objects.get(email="sonalraj2001@gmail.com")
+        request = SimpleNamespace(user=user)
+        resolver = NotePermissionResolver()
+        
+        with django_assert_num_queries(1):
+            access = resolver.resolve(request, note_id)
+            resolver.resolve(request, note_id)
+            assert resolver.access(request, note_id) is access
+        assert access.owner_id == user.id
+        assert access.access_type == NoteAccess.owner
+        
+    def test_access_type_cached_across_requests(self, client, generate_usertoken, django_assert_num_queries):
+        note_id = create_note(client, generate_usertoken)
+        user = User.objects.get(email="sonalraj2001@gmail.com")
+        resolver = NotePermissionResolver()
+        
+        resolver.access_type(SimpleNamespace(user=user), note_id)
+        with django_assert_num_queries(0):
+            assert resolver.access_type(SimpleNamespace(user=user), note_id) == NoteAccess.owner
+            
+    def test_read_during_uncommitted_revoke_is_not_cached(self, client, generate_usertoken, generate_usertoken2, django_capture_on_commit_callbacks):
+        note_id = create_note(client, generate_usertoken)
+        collaborator = User.objects.get(email="sonalraj2002@gmail.com")
+        Collaborator.objects.create(note_id_id=note_id, user_id=collaborator, access_type=Collaborator.read_write)
+        resolver = NotePermissionResolver()
+        
+        with django_capture_on_commit_callbacks() as callbacks:
+            Collaborator.objects.get(note_id_id=note_id, user_id=collaborator).delete()
+            # A concurrent request reads the committed rows until the revoke commits.
+            grant_collaborator_access(note_id, [collaborator.id], Collaborator.read_write)
+            assert resolver.access_type(SimpleNamespace(user=collaborator), note_id) == Collaborator.read_write
+            revoke_collaborator_access(note_id, [collaborator.id])
+        for callback in callbacks:
+            callback()
+        
+        assert resolver.access_type(SimpleNamespace(user=collaborator), note_id) is None
+        
+    def test_read_only_collaborator_cannot_toggle(self, client, generate_usertoken, generate_usertoken2):
+        note_id = create_note(client, generate_usertoken)
+        user_id = User.objects.get(email="sonalraj2002@gmail.com").id
+        
+        data = {"note_id": note_id, "user_id": [user_id], "access_type": "read_only"}
+        url = reverse('collab-add_collaborator')
+        client.post(url, data, HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}', content_type='application/json')
+        
+        url = reverse('note-toggle_archive', args=[note_id])
+        response = client.patch(url, HTTP_AUTHORIZATION=f'Bearer {generate_usertoken2}', content_type='application/json')
+        assert response.status_code == status.HTTP_403_FORBIDDEN
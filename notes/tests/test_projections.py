@@ -0,0 +1,72 @@
+import json
+import pytest
+from user.models import User
+from rest_framework.reverse import reverse
+from rest_framework import status
+from notes.models import Note, Collaborator
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from datetime import datetime, timezone as dt_timezone
+from fundoonote.renderers import ORJSONRenderer
+from notes.projections import NoteProjection
+from label.models import Label
+from notes.tests.helpers import create_note
+
+
+@pytest.mark.django_db
+@pytest.mark.note_projection
+class TestNoteProjection:
+
+    def get(self, client, token, url, **params):
+        response = client.get(url, params, HTTP_AUTHORIZATION=f'Bearer {token}')
+        return response.status_code, json.loads(response.content)
+
+    def test_summary_mode(self, client, generate_usertoken, settings):
+        settings.NOTE_SNIPPET_LENGTH = 10
+        create_note(client, generate_usertoken, title="Long", description="0123456789 and much more text")
+        
+        with CaptureQueriesContext(connections['default']) as queries:
+            code, body = self.get(client, generate_usertoken, reverse('note-list'), mode='summary')
+        assert code == status.HTTP_200_OK
+        assert body['data'] == [{**body['data'][0], 'title': "Long", 'snippet': "0123456789"}]
+        assert set(body['data'][0]) == {'id', 'title', 'color', 'snippet', 'is_archive', 'is_trash', 'reminder'}
+        
+        note_sql = [query['sql'] for query in queries if 'LEFT(' in query['sql']]
+        assert len(note_sql) == 1 and ', "notes_note"."description",' not in note_sql[0]
+        
+        code, full = self.get(client, generate_usertoken, reverse('note-list'))
+        assert full['data'][0]['description'] == "0123456789 and much more text"
+
+    def test_fields_and_archived(self, client, generate_usertoken):
+        create_note(client, generate_usertoken, title="Archived", is_archive=True)
+        
+        code, body = self.get(client, generate_usertoken, reverse('note-archived_notes'), fields='title,label')
+        assert code == status.HTTP_200_OK
+        assert body['data'] == [{'title': "Archived", 'label': []}]
+        
+        code, body = self.get(client, generate_usertoken, reverse('note-trashed_notes'), fields='title,secret')
+        assert code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+@pytest.mark.note_projection
+class TestFastSerializer:
+
+    def test_values_path_matches_serializer(self, client, generate_usertoken, generate_usertoken2):
+        owner = User.objects.get(email="sonalraj2001@gmail.com")
+        other = User.objects.get(email="sonalraj2002@gmail.com")
+        labels = [Label.objects.create(name=f"L{i}", color="red", user=owner) for i in range(3)]
+        
+        first = Note.objects.create(title="First", description="ünïcode\ttext", reminder=datetime(2030, 5, 1, 8, 30, tzinfo=dt_timezone.utc), user=owner)
+        first.label.add(*labels)
+        Collaborator.objects.create(note_id=first, user_id=other, access_type=Collaborator.read_write)
+        second = Note.objects.create(title="Second", description=None, image="notes/photo.png", user=owner)
+        second.label.add(labels[1])
+        Note.objects.create(title="Third", user=owner)
+        
+        queryset = Note.objects.filter(access_set__user=owner).order_by('id')
+        renderer = ORJSONRenderer()
+        for projection in [NoteProjection(), NoteProjection(NoteProjection.summary_fields, 'summary'), NoteProjection(['label', 'image', 'title'], 'custom')]:
+            slow = [renderer.render(projection.serialize(note)) for note in projection.apply(queryset)]
+            fast = [renderer.render(data) for _, data in projection.values(queryset)]
+            assert fast == slow
@@ -0,0 +1,71 @@
+import pytest
+from user.models import User
+from rest_framework.reverse import reverse
+from rest_framework import status
+from notes.models import Note, NoteAccess, Collaborator
+from notes.task import purge_trashed_notes
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from notes.redisutil import RedisUtils
+from notes.models import OutboxEvent
+from django_celery_beat.models import PeriodicTask
+from notes.task import drain_outbox
+from notes.tests.helpers import create_note
+
+
+@pytest.mark.django_db
+@pytest.mark.note_purge
+class TestTrashPurge:
+
+    def test_purge_trashed_notes(self, client, generate_usertoken):
+        note_id = create_note(client, generate_usertoken)
+        kept_id = create_note(client, generate_usertoken)
+        
+        url = reverse('note-toggle_trash', args=[note_id])
+        client.patch(url, HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}', content_type='application/json')
+        assert Note.objects.get(id=note_id).trashed_at is not None
+        
+        assert purge_trashed_notes(retention_days=1) == 0
+        assert purge_trashed_notes(retention_days=0) == 1
+        assert not Note.objects.filter(id=note_id).exists()
+        assert Note.objects.filter(id=kept_id).exists()
+        
+    def test_purge_applies_side_effects_in_bulk(self, client, generate_usertoken, generate_usertoken2):
+        note_id = create_note(client, generate_usertoken, title="Shared", reminder="2030-01-02T09:30")
+        collaborator = User.objects.get(email="sonalraj2002@gmail.com")
+        Collaborator.objects.create(note_id_id=note_id, user_id=collaborator, access_type=Collaborator.read_only)
+        client.patch(reverse('note-toggle_trash', args=[note_id]), HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}', content_type='application/json')
+        drain_outbox()
+        redis = RedisUtils("notes")
+        redis.save(f"user_{collaborator.id}_note_{note_id}", {'title': "Shared"}, ex=60)
+        version = RedisUtils().get_counter(f"note_{note_id}_access_version")
+        
+        with CaptureQueriesContext(connections['default']) as queries:
+            assert purge_trashed_notes(retention_days=0) == 1
+        assert len([query for query in queries if query['sql'].startswith('DELETE')]) == 5
+        assert list(OutboxEvent.objects.filter(processed_at__isnull=True).values_list('action', 'object_id')) == [('deleted', note_id)]
+        assert RedisUtils().get_counter(f"note_{note_id}_access_version") == version + 1
+        assert not NoteAccess.objects.filter(note_id=note_id).exists()
+        
+        drain_outbox()
+        assert redis.get(f"user_{collaborator.id}_note_{note_id}") is None
+        assert not PeriodicTask.objects.filter(name=f'reminder-task-{note_id}').exists()
+        
+    def test_purge_records_the_same_events_as_a_delete(self, client, generate_usertoken, generate_usertoken2):
+        collaborator = User.objects.get(email="sonalraj2002@gmail.com")
+        events = []
+        for delete in (lambda note_id: Note.objects.get(id=note_id).delete(), lambda note_id: purge_trashed_notes(retention_days=0)):
+            note_id = create_note(client, generate_usertoken, title="Shared", reminder="2030-01-02T09:30")
+            Collaborator.objects.create(note_id_id=note_id, user_id=collaborator, access_type=Collaborator.read_only)
+            client.patch(reverse('note-toggle_trash', args=[note_id]), HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}', content_type='application/json')
+            drain_outbox()
+            delete(note_id)
+            events.append(list(OutboxEvent.objects.filter(processed_at__isnull=True).values_list('topic', 'action', 'payload')))
+            drain_outbox()
+        assert events[0] == events[1]
+        assert sorted(events[0][0][2]['user_ids']) == sorted([User.objects.get(email="sonalraj2001@gmail.com").id, collaborator.id])
+        
+    def test_empty_trash(self, client, generate_usertoken):
+        url = reverse('note-empty_trash')
+        response = client.post(url, HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}', content_type='application/json')
+        assert response.status_code == status.HTTP_202_ACCEPTED
@@ -0,0 +1,90 @@
+import io
+import pytest
+from django.core.management import call_command
+from notes.redisutil import RedisUtils, decay_access_counts, hot_keys, largest_values, reset_stats
+
+
+@pytest.mark.django_db
+@pytest.mark.cache_stats
+class TestCacheStats:
+
+    @pytest.fixture(autouse=True)
+    def sample_everything(self, settings):
+        settings.CACHE_STATS_SAMPLE_RATE = 1
+        reset_stats()
+        yield
+        reset_stats()
+
+    def test_timeout_follows_read_frequency(self, settings):
+        settings.CACHE_READ_COUNTS_REFRESH_SECONDS = 0
+        redis = RedisUtils()
+        redis.save('stats_cold', [1], ex=300, adaptive=True)
+        assert 0 < redis.cache.ttl('stats_cold') <= 75
+        
+        for _ in range(settings.CACHE_HOT_KEY_HITS):
+            redis.get('stats_cold')
+        redis.save('stats_cold', [1], ex=300, adaptive=True)
+        assert redis.cache.ttl('stats_cold') > 1700
+        
+        redis.save('stats_fixed', [1], ex=300)
+        assert 290 < redis.cache.ttl('stats_fixed') <= 300
+
+    def test_adaptive_saves_reuse_the_read_counts(self, settings, monkeypatch):
+        redis = RedisUtils()
+        for _ in range(settings.CACHE_HOT_KEY_HITS):
+            redis.get('stats_hot')
+        settings.CACHE_STATS_SAMPLE_RATE = 0
+        redis.save('stats_hot', [1], ex=300, adaptive=True)
+        
+        def no_round_trip(alias):
+            raise AssertionError("unexpected Redis round trip")
+        with monkeypatch.context() as patch:
+            patch.setattr('notes.redisutil.get_redis_connection', no_round_trip)
+            for _ in range(3):
+                redis.save('stats_hot', [1], ex=300, adaptive=True)
+        assert redis.cache.ttl('stats_hot') > 1700
+
+    def test_report_and_decay(self):
+        redis = RedisUtils()
+        redis.save('stats_big', list(range(100)), ex=60)
+        redis.save('stats_small', [1], ex=60)
+        for _ in range(4):
+            redis.get('stats_big')
+        redis.get('stats_missing')
+        assert hot_keys(1) == [('stats_big', 4.0)]
+        assert [key for key, _ in largest_values(2)] == ['stats_big', 'stats_small']
+        
+        out = io.StringIO()
+        call_command('cache_stats', '--top', '2', stdout=out)
+        assert 'stats_big' in out.getvalue() and 'Hit rate 80.0% of ~5 reads' in out.getvalue()
+        
+        decay_access_counts()
+        assert hot_keys(5) == [('stats_big', 2.0)]
+
+
+@pytest.mark.django_db
+@pytest.mark.redis_batch
+class TestRedisBatch:
+
+    def test_many_round_trip_with_single_key_calls(self):
+        redis = RedisUtils()
+        redis.set_many({'batch_a': {'title': "A"}, 'batch_b': [1, 2]}, ex=60)
+        assert redis.get('batch_a') == {'title': "A"}
+        assert redis.get_many(['batch_a', 'batch_b', 'batch_missing']) == {'batch_a': {'title': "A"}, 'batch_b': [1, 2]}
+        assert 0 < redis.cache.ttl('batch_b') <= 60
+        
+        redis.delete_many(['batch_a', 'batch_b'])
+        assert redis.get_many(['batch_a', 'batch_b']) == {}
+        redis.delete_many([])
+
+    def test_pipeline_runs_on_exit(self):
+        redis = RedisUtils()
+        redis.save('batch_old', "old")
+        with redis.pipeline() as pipe:
+            old = pipe.get('batch_old')
+            pipe.delete('batch_old')
+            pipe.save('batch_new', {'n': 1}, ex=60)
+            missing = pipe.get('batch_missing')
+            assert old.value is None
+        assert old.value == "old" and missing.value is None
+        assert redis.get('batch_old') is None and redis.get('batch_new') == {'n': 1}
@@ -0,0 +1,115 @@
+import json
+import pytest
+from user.models import User
+from rest_framework.reverse import reverse
+from rest_framework import status
+from notes.models import Note, Collaborator
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from datetime import datetime, timezone as dt_timezone
+from notes.projections import NoteProjection
+from notes.models import ReminderDispatch
+from notes.reminders import sync_reminder, upcoming_queryset
+from user.task import send_reminder
+from django.core import mail
+from django_celery_beat.models import PeriodicTask
+from notes.task import drain_outbox
+from notes.tests.helpers import create_note
+
+
+@pytest.mark.django_db
+@pytest.mark.upcoming_reminders
+class TestUpcomingReminders:
+
+    def reminders(self, client, token, **params):
+        with CaptureQueriesContext(connections['default']) as queries:
+            response = client.get(reverse('note-upcoming_reminders'), data=params, HTTP_AUTHORIZATION=f'Bearer {token}')
+        note_queries = [query for query in queries if Note._meta.db_table in query['sql']]
+        return response, len(note_queries)
+
+    def test_window_covers_shared_notes_in_time_order(self, client, generate_usertoken, generate_usertoken2):
+        later = create_note(client, generate_usertoken, title="Later", reminder="2030-01-03T09:00")
+        sooner = create_note(client, generate_usertoken, title="Sooner", reminder="2030-01-01T09:00")
+        create_note(client, generate_usertoken, title="Trashed", reminder="2030-01-02T09:00", is_trash=True)
+        create_note(client, generate_usertoken, title="Outside", reminder="2031-01-01T09:00")
+        create_note(client, generate_usertoken, title="No reminder")
+        shared = create_note(client, generate_usertoken2, title="Shared", reminder="2030-01-02T09:00")
+        create_note(client, generate_usertoken2, title="Not shared", reminder="2030-01-02T10:00")
+        Collaborator.objects.create(note_id_id=shared, user_id=User.objects.get(email="sonalraj2001@gmail.com"), access_type=Collaborator.read_only)
+        
+        window = {'start': "2030-01-01T00:00Z", 'end': "2030-02-01T00:00Z"}
+        response, _ = self.reminders(client, generate_usertoken, **window, limit=2)
+        assert response.status_code == status.HTTP_200_OK
+        assert [note['id'] for note in response.data['data']] == [sooner, shared]
+        assert set(response.data['data'][0]) == set(NoteProjection.summary_fields)
+        
+        next_page = client.get(response.data['next'], HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}')
+        assert [note['id'] for note in next_page.data['data']] == [later] and next_page.data['next'] is None
+        
+        response, _ = self.reminders(client, generate_usertoken, start="2030-02-01T00:00Z", end="2030-01-01T00:00Z")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_collaborator_sees_shared_reminders(self, client, generate_usertoken, generate_usertoken2):
+        collaborator = User.objects.get(email="sonalraj2002@gmail.com")
+        shared = create_note(client, generate_usertoken, title="Shared", reminder="2030-01-02T09:00")
+        trashed = create_note(client, generate_usertoken, title="Shared trashed", reminder="2030-01-03T09:00", is_trash=True)
+        outside = create_note(client, generate_usertoken, title="Shared later", reminder="2031-01-01T09:00")
+        create_note(client, generate_usertoken, title="Not shared", reminder="2030-01-04T09:00")
+        for note_id in (shared, trashed, outside):
+            Collaborator.objects.create(note_id_id=note_id, user_id=collaborator, access_type=Collaborator.read_only)
+        
+        # The collaborator owns no reminders, so only the shared branch of the UNION finds these.
+        start, end = datetime(2030, 1, 1, tzinfo=dt_timezone.utc), datetime(2030, 2, 1, tzinfo=dt_timezone.utc)
+        assert list(upcoming_queryset(collaborator.id, start, end).values_list('id', flat=True)) == [shared]
+        response, _ = self.reminders(client, generate_usertoken2, start="2030-01-01T00:00Z", end="2030-02-01T00:00Z")
+        assert [note['id'] for note in response.data['data']] == [shared]
+        
+        Collaborator.objects.get(note_id_id=shared, user_id=collaborator).delete()
+        assert not upcoming_queryset(collaborator.id, start, end).exists()
+
+    def test_pages_are_cached_until_a_reminder_changes(self, client, generate_usertoken):
+        note_id = create_note(client, generate_usertoken, title="First", reminder="2030-01-02T09:30")
+        window = {'start': "2030-01-01T00:00Z", 'end': "2030-02-01T00:00Z"}
+        first, queries = self.reminders(client, generate_usertoken, **window)
+        assert queries > 0
+        cached, queries = self.reminders(client, generate_usertoken, **window)
+        assert cached.data == first.data and queries == 0
+        
+        client.patch(reverse('note-detail', args=[note_id]), data={"reminder": "2030-03-01T09:30"}, HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}', content_type='application/json')
+        drain_outbox()
+        response, _ = self.reminders(client, generate_usertoken, **window)
+        assert response.data['data'] == []
+
+
+@pytest.mark.django_db
+@pytest.mark.reminder_dispatch
+class TestReminderDispatch:
+
+    def test_unchanged_reminder_is_not_rescheduled(self, client, generate_usertoken):
+        note_id = create_note(client, generate_usertoken, title="First", reminder="2030-01-02T09:30")
+        drain_outbox()
+        task = PeriodicTask.objects.get(name=f'reminder-task-{note_id}')
+        note = Note.objects.get(id=note_id)
+        
+        assert sync_reminder(note_id, note.reminder) is False
+        assert PeriodicTask.objects.get(id=task.id).date_changed == task.date_changed
+        
+        assert sync_reminder(note_id, datetime(2030, 1, 3, 9, 30, tzinfo=dt_timezone.utc)) is True
+        assert json.loads(PeriodicTask.objects.get(id=task.id).args) == [note_id, "2030-01-03T09:30:00+00:00"]
+
+    def test_reminder_is_mailed_once_per_time(self, client, generate_usertoken):
+        note_id = create_note(client, generate_usertoken, title="First", reminder="2030-01-02T09:30")
+        scheduled = Note.objects.get(id=note_id).reminder.isoformat()
+        
+        send_reminder(note_id, scheduled)
+        send_reminder(note_id, scheduled)
+        send_reminder(note_id)
+        assert len(mail.outbox) == 1
+        
+        client.patch(reverse('note-detail', args=[note_id]), data={"reminder": "2030-01-03T09:30"}, HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}', content_type='application/json')
+        send_reminder(note_id, scheduled)
+        assert len(mail.outbox) == 1
+        
+        send_reminder(note_id, Note.objects.get(id=note_id).reminder.isoformat())
+        assert len(mail.outbox) == 2
+        assert ReminderDispatch.objects.filter(note_id=note_id).count() == 1
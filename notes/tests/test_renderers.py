@@ -0,0 +1,39 @@
+import pytest
+from rest_framework.reverse import reverse
+from rest_framework import status
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from fundoonote.renderers import ORJSONRenderer
+
+
+@pytest.mark.json
+class TestORJSON:
+
+    def test_renderer_matches_drf(self):
+        data = {
+            "reminder": datetime(2030, 1, 1, 10, 30, 15, 250000, tzinfo=dt_timezone.utc),
+            "local": datetime(2030, 1, 1, 10, 30),
+            "price": Decimal("1.25"),
+            "lazy": gettext_lazy("Note"),
+            "ids": [1, 2],
+            "text": "line separator",
+            1: None,
+        }
+        assert ORJSONRenderer().render(data) == JSONRenderer().render(data)
+
+    def test_renderer_edge_cases(self):
+        big = {"id": 2 ** 70, "ids": [-(2 ** 64)]}
+        assert ORJSONRenderer().render(big) == JSONRenderer().render(big)
+        # Unlike DRF's strict renderer, non-finite floats are rendered as null.
+        with pytest.raises(ValueError):
+            JSONRenderer().render({"score": float("nan")})
+        assert ORJSONRenderer().render({"score": float("nan"), "max": float("inf")}) == b'{"score":null,"max":null}'
+
+    @pytest.mark.django_db
+    def test_invalid_json_is_rejected(self, client, generate_usertoken):
+        url = reverse('note-list')
+        response = client.post(url, data='{"title": NaN}', HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}', content_type='application/json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "JSON parse error" in response.data['detail']
@@ -0,0 +1,25 @@
+import pytest
+from user.models import User
+from django.core.management import call_command
+from notes.models import Note, Collaborator
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.seed
+class TestSeedCommand:
+
+    def snapshot(self):
+        notes = Note.objects.order_by('id').values_list('user__email', 'title', 'description', 'is_trash', 'reminder')
+        collaborators = Collaborator.objects.order_by('note_id', 'user_id').values_list('note_id__title', 'user_id__email', 'access_type')
+        return list(notes), list(collaborators)
+
+    def test_seed_is_deterministic(self):
+        call_command('seed_fundoo', '--users', '30', '--max-notes', '40', '--collab-rate', '0.3', '--workers', '2', '--batch-users', '4')
+        first = self.snapshot()
+        call_command('check_note_access')
+        
+        User.objects.filter(email__startswith="seed42-").delete()
+        call_command('seed_fundoo', '--users', '30', '--max-notes', '40', '--collab-rate', '0.3', '--workers', '1', '--batch-users', '30')
+        
+        assert self.snapshot() == first
+        assert len(first[0]) > 30
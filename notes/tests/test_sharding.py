@@ -0,0 +1,63 @@
+import pytest
+from notes.redisutil import RedisUtils
+from django_redis.cache import RedisCache
+from notes.sharding import HashRing, shard_key
+
+
+@pytest.mark.django_db
+@pytest.mark.cache_sharding
+class TestCacheSharding:
+
+    # Separate instances, as in production: logical databases of one instance are not nodes.
+    nodes = ["redis://127.0.0.1:6381/0", "redis://127.0.0.1:6382/0", "redis://127.0.0.1:6383/0"]
+
+    @pytest.fixture
+    def sharded(self, settings):
+        cache = RedisCache(self.nodes, {"OPTIONS": dict(settings.CACHES["notes"]["OPTIONS"])})
+        yield cache
+        cache.delete_many([f"user_{user_id}" for user_id in range(50)])
+
+    def test_user_keys_share_a_node(self, sharded):
+        keys = [f"user_{user_id}{suffix}" for user_id in range(50) for suffix in ("", "_archived_notes", "_note_7")]
+        sharded.set_many({key: key.upper() for key in keys}, 60)
+        
+        for user_id in range(50):
+            nodes = {sharded.client.get_server_name(sharded.make_key(f"user_{user_id}{suffix}")) for suffix in ("", "_archived_notes", "_note_7")}
+            assert len(nodes) == 1
+        assert len({sharded.client.get_server_name(sharded.make_key(f"user_{user_id}")) for user_id in range(50)}) == 3
+        assert sharded.get_many(keys + ["user_99"]) == {key: key.upper() for key in keys}
+        
+        pipe = sharded.client.pipeline_for("user_3")
+        pipe.get(sharded.make_key("user_3_note_7"))
+        pipe.delete(sharded.make_key("user_3"))
+        assert pipe.execute() == [sharded.client.encode("USER_3_NOTE_7"), 1]
+        
+        sharded.delete_many(keys)
+        assert sharded.get_many(keys) == {}
+
+    def test_pipeline_spans_nodes(self, sharded):
+        redis = RedisUtils("notes")
+        redis.cache = sharded
+        users = list(range(10))
+        with redis.pipeline() as pipe:
+            for user_id in users:
+                pipe.save(f"user_{user_id}", [user_id], ex=60)
+        with redis.pipeline() as pipe:
+            found = [pipe.get(f"user_{user_id}") for user_id in users]
+        assert [result.value for result in found] == [[user_id] for user_id in users]
+        assert len({sharded.client.get_server_name(sharded.make_key(f"user_{user_id}")) for user_id in users}) > 1
+        
+        with redis.pipeline("user_3") as pipe:
+            ttl = pipe.command('ttl', sharded.make_key("user_3"))
+        assert 0 < ttl.value <= 60
+        with pytest.raises(ValueError):
+            with redis.pipeline() as pipe:
+                pipe.command('ttl', sharded.make_key("user_3"))
+
+    def test_adding_a_node_moves_few_users(self):
+        users = [shard_key(f"user_{user_id}_note_1") for user_id in range(10000)]
+        before = HashRing(self.nodes, 160)
+        after = HashRing(self.nodes + ["redis://127.0.0.1:6384/0"], 160)
+        moved = [user for user in users if before.node_for(user) != after.node_for(user)]
+        assert 0.15 < len(moved) / len(users) < 0.35
+        assert {after.node_for(user) for user in moved} == {"redis://127.0.0.1:6384/0"}
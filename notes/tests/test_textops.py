@@ -0,0 +1,74 @@
+import pytest
+from rest_framework.reverse import reverse
+from rest_framework import status
+from notes.models import Note
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from notes.task import flush_autosave, drain_outbox
+from notes.autosave import AutosaveBuffer
+from notes.tests.helpers import create_note
+
+
+@pytest.mark.django_db
+@pytest.mark.note_patch
+class TestDescriptionPatch:
+
+    def patch(self, client, token, note_id, **data):
+        url = reverse('note-patch_description', args=[note_id])
+        return client.patch(url, data=data, HTTP_AUTHORIZATION=f'Bearer {token}', content_type='application/json')
+
+    def test_operations_are_applied_in_sql(self, client, generate_usertoken):
+        note_id = create_note(client, generate_usertoken, description="héllo world")
+        operations = [
+            {"op": "delete", "offset": 0, "length": 5},
+            {"op": "insert", "offset": 0, "text": "hi"},
+            {"op": "insert", "offset": 8, "text": "!"},
+        ]
+        with CaptureQueriesContext(connections['default']) as queries:
+            response = self.patch(client, generate_usertoken, note_id, version=1, operations=operations)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['data'] == {"id": note_id, "version": 2}
+        assert not [query for query in queries if query['sql'].startswith('SELECT "notes_note"."description"')]
+        assert Note.objects.get(id=note_id).description == "hi world!"
+        
+        stale = self.patch(client, generate_usertoken, note_id, version=1, operations=operations)
+        assert stale.status_code == status.HTTP_409_CONFLICT and stale.data['data']['version'] == 2
+        
+        too_far = self.patch(client, generate_usertoken, note_id, version=2, operations=[{"op": "delete", "offset": 5, "length": 10}])
+        assert too_far.status_code == status.HTTP_400_BAD_REQUEST
+        assert Note.objects.get(id=note_id).version == 2
+
+    def test_unified_diff(self, client, generate_usertoken):
+        note_id = create_note(client, generate_usertoken, description="one\ntwo\nthree\n")
+        client.get(reverse('note-list'), HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}')
+        diff = "--- a\n+++ b\n@@ -1,3 +1,3 @@\n one\n-two\n+2\n three\n"
+        response = self.patch(client, generate_usertoken, note_id, version=1, diff=diff)
+        assert response.data['data']['version'] == 2
+        drain_outbox()
+        
+        listed = client.get(reverse('note-list'), HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}').json()
+        # Note creation trims the trailing newline, which the diff's context keeps.
+        assert listed['data'][0]['description'] == "one\n2\nthree"
+        
+        mismatch = self.patch(client, generate_usertoken, note_id, version=2, diff=diff)
+        assert mismatch.status_code == status.HTTP_400_BAD_REQUEST
+        both = self.patch(client, generate_usertoken, note_id, version=2, diff=diff, operations=[])
+        assert both.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_patch_applies_pending_autosaves(self, client, generate_usertoken, monkeypatch):
+        monkeypatch.setattr(flush_autosave, 'apply_async', lambda args, countdown: None)
+        note_id = create_note(client, generate_usertoken, title="Draft", description="hello")
+        url = reverse('note-autosave', args=[note_id])
+        client.patch(url, data={"title": "Typed", "description": "hello world"}, HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}', content_type='application/json')
+        
+        # The client patches the text it shows, autosaves included, against the version it knows.
+        response = self.patch(client, generate_usertoken, note_id, version=1, operations=[{"op": "insert", "offset": 11, "text": "!"}])
+        assert response.status_code == status.HTTP_200_OK and response.data['data'] == {"id": note_id, "version": 2}
+        assert Note.objects.filter(id=note_id).values_list('title', 'description').get() == ("Typed", "hello world!")
+        assert AutosaveBuffer().read(note_id) == {}
+        
+        client.patch(url, data={"description": "one\ntwo"}, HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}', content_type='application/json')
+        response = self.patch(client, generate_usertoken, note_id, version=2, diff="@@ -1,2 +1,2 @@\n one\n-two\n+2\n")
+        assert response.data['data'] == {"id": note_id, "version": 3}
+        assert Note.objects.get(id=note_id).description == "one\n2\n"
+        assert AutosaveBuffer().read(note_id) == {}
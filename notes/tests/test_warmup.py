@@ -0,0 +1,54 @@
+import io
+import pytest
+from user.models import User
+from rest_framework.reverse import reverse
+from django.core.management import call_command
+from notes.models import Note
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from django_redis import get_redis_connection
+from notes.redisutil import RedisUtils
+from notes.task import warm_user_caches
+from notes.fragments import fragment_key, list_index_key
+from user import activity
+from notes.tests.helpers import create_note
+
+
+@pytest.mark.django_db
+@pytest.mark.cache_warmup
+class TestCacheWarmup:
+
+    def test_warm_fills_every_list(self, client, generate_usertoken):
+        first = create_note(client, generate_usertoken, title="First")
+        archived = create_note(client, generate_usertoken, title="Archived", is_archive=True)
+        user_id = User.objects.get(email="sonalraj2001@gmail.com").id
+        redis = RedisUtils("notes")
+        
+        assert warm_user_caches(user_id) == 4
+        assert redis.get(list_index_key(user_id)) == [[first, 1]]
+        assert redis.get(list_index_key(user_id, 'archived_notes')) == [[archived, 1]]
+        assert redis.get(list_index_key(user_id, 'trashed_notes')) == []
+        conn = get_redis_connection("default")
+        assert conn.exists(RedisUtils().cache.make_key(fragment_key(first, 1, 'summary')))
+        
+        with CaptureQueriesContext(connections['default']) as queries:
+            response = client.get(reverse('note-list'), HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}')
+        assert [note['title'] for note in response.json()['data']] == ["First"]
+        assert not [query for query in queries if Note._meta.db_table in query['sql']]
+
+    def test_active_users_are_warmed_most_recent_first(self, client, generate_usertoken, generate_usertoken2, settings):
+        settings.NOTE_WARMUP_USERS_PER_SECOND = 1000
+        activity.flush_activity(force=True)
+        get_redis_connection("default").delete(activity.ACTIVITY_KEY)
+        first = User.objects.get(email="sonalraj2001@gmail.com").id
+        second = User.objects.get(email="sonalraj2002@gmail.com").id
+        
+        client.get(reverse('note-list'), HTTP_AUTHORIZATION=f'Bearer {generate_usertoken2}')
+        client.get(reverse('note-list'), HTTP_AUTHORIZATION=f'Bearer {generate_usertoken}')
+        activity.flush_activity(force=True)
+        assert activity.recently_active(10) == [first, second]
+        assert activity.recently_active(1) == [first]
+        
+        out = io.StringIO()
+        call_command('warm_caches', '--users', '2', stdout=out)
+        assert "Warmed the caches of 2 users" in out.getvalue()
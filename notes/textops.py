@@ -0,0 +1,146 @@
+import re
+from django.db import transaction
+from django.db.models import F, Func, TextField, Value
+from django.db.models.functions import Coalesce, Length
+from django.db.models.lookups import GreaterThanOrEqual
+from .models import Note
+from .outbox import record
+
+
+HUNK_RE = re.compile(r'@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+
+
+class TextPatchError(ValueError):
+    pass
+
+
+class Overlay(Func):
+
+    """
+    OVERLAY(text PLACING replacement FROM start FOR count), with a 1-based start
+    counted in characters.
+    """
+
+    output_field = TextField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        sqls, params = [], []
+        for expression in self.get_source_expressions():
+            sql, expression_params = compiler.compile(expression)
+            sqls.append(sql)
+            params.extend(expression_params)
+        return 'OVERLAY(%s PLACING %s FROM %s FOR %s)' % tuple(sqls), params
+
+
+def operations_expression(operations, base):
+    """
+    Turn insert/delete operations, each at a character offset of the text left
+    by the ones before it, into a single SQL expression over base, the
+    description expression. Also returns the shortest description the
+    operations can apply to.
+    """
+    expression = base
+    shift = 0
+    min_length = 0
+    for operation in operations:
+        offset = operation['offset']
+        if operation['op'] == 'insert':
+            text, removed = operation['text'], 0
+        else:
+            text, removed = '', operation['length']
+        min_length = max(min_length, offset + removed - shift)
+        expression = Overlay(expression, Value(text), Value(offset + 1), Value(removed))
+        shift += len(text) - removed
+    return expression, min_length
+
+
+def apply_unified_diff(text, diff):
+    """
+    Apply a unified diff to text, checking every context and removed line.
+    Raises TextPatchError when the diff does not match.
+    """
+    lines = text.splitlines(keepends=True)
+    result = []
+    position = 0
+    diff_lines = diff.splitlines(keepends=True)
+    index = 0
+    hunks = 0
+    line_kind = None
+    while index < len(diff_lines):
+        header = HUNK_RE.match(diff_lines[index])
+        index += 1
+        if header is None:
+            # File headers and anything else outside a hunk.
+            continue
+        hunks += 1
+        start, count = int(header.group(1)), int(header.group(2) or 1)
+        # A hunk that removes nothing starts after the line it names.
+        start = start if count else start + 1
+        if start - 1 < position:
+            raise TextPatchError("Hunks overlap or are out of order")
+        result.extend(lines[position:start - 1])
+        position = start - 1
+
+        while index < len(diff_lines) and not diff_lines[index].startswith('@@'):
+            line = diff_lines[index]
+            index += 1
+            if line.startswith('\\'):
+                # "\ No newline at end of file" belongs to the line before it.
+                if line_kind == '+':
+                    result[-1] = result[-1].rstrip('\n')
+                continue
+            line_kind, content = (' ', line) if line == '\n' else (line[:1], line[1:])
+            if line_kind == '+':
+                result.append(content)
+                continue
+            if line_kind not in (' ', '-'):
+                raise TextPatchError(f"Invalid diff line: {line.rstrip()}")
+            expected = lines[position] if position < len(lines) else None
+            if expected is None or expected.rstrip('\n') != content.rstrip('\n'):
+                raise TextPatchError(f"Diff does not match line {position + 1}")
+            if line_kind == ' ':
+                result.append(expected)
+            position += 1
+
+    if not hunks:
+        raise TextPatchError("The diff has no hunks")
+    result.extend(lines[position:])
+    return ''.join(result)
+
+
+def patch_description(note_id, version, operations=None, diff=None, pending=None):
+    """
+    Apply operations (in SQL, without loading the description) or a unified
+    diff to the description of the note if it is still at version. pending are
+    autosaved field values not flushed yet: they are written by the same
+    update, and the operations or diff apply to a pending description, so the
+    client's version stays the one to patch against. Returns the new version,
+    or None when the note has moved on. Raises Note.DoesNotExist and
+    TextPatchError.
+    """
+    pending = dict(pending or {})
+    notes = Note.objects.filter(id=note_id, version=version)
+    with transaction.atomic():
+        if diff is None:
+            described = Value(pending['description'], output_field=TextField()) if 'description' in pending else F('description')
+            base = Coalesce(described, Value(''), output_field=TextField())
+            expression, min_length = operations_expression(operations, base)
+            pending['description'] = expression
+            updated = notes.filter(GreaterThanOrEqual(Length(base), min_length)).update(version=F('version') + 1, **pending)
+            if not updated:
+                current = Note.objects.filter(id=note_id).values_list('version', flat=True).get()
+                if current != version:
+                    return None
+                raise TextPatchError("The operations reach past the end of the description")
+        else:
+            row = notes.values_list('description').first()
+            if row is None:
+                Note.objects.filter(id=note_id).values_list('id', flat=True).get()
+                return None
+            text = pending['description'] if 'description' in pending else row[0]
+            pending['description'] = apply_unified_diff(text or '', diff)
+            if not notes.update(version=F('version') + 1, **pending):
+                return None
+
+        record('note', 'updated', note_id, version=version + 1)
+    return version + 1
@@ -1,15 +1,17 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import NoteViewSet,CollaboratorView,LabelsAddRemove
+from .views import NoteViewSet,CollaboratorView,LabelsAddRemove,ExportView,ImageBlobView
 
 router = DefaultRouter()
 router.register(r'notes', NoteViewSet ,basename="note")
 router.register(r'collabs', CollaboratorView ,basename="collab")
 router.register(r'labels', LabelsAddRemove ,basename="labels")
+router.register(r'exports', ExportView ,basename="export")
 
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('images/<path:name>', ImageBlobView.as_view(), name='image-blob'),
     # path('collab/', include(router.urls)),
     
 ]
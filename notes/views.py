@@ -4,19 +4,28 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.decorators import action
-from .models import Note ,Collaborator
+from .models import Note ,Collaborator, ExportJob
 from user.models import User
-from .serializers import NoteSerializer , CollaboratorSerializer
+from .serializers import NoteSerializer , CollaboratorSerializer, ExportJobSerializer, NoteImportSerializer, DescriptionPatchSerializer, UpcomingRemindersSerializer
+from .reminders import ReminderPageCache, ReminderPagination, upcoming_queryset
+from .textops import patch_description, TextPatchError
+from .importer import NoteImporter
 from loguru import logger
 from .redisutil import RedisUtils
-from django_celery_beat.models import PeriodicTask, CrontabSchedule
-from datetime import datetime
-from user.task import send_reminder
+from .permissions import NotePermissionResolver
+from .autosave import AutosaveBuffer, overlay
+from .breaker import CacheUnavailable
+from .fragments import NoteFragmentCache, evict_own_caches, list_index_key, list_queryset
+from .projections import NoteProjection
+from .task import purge_trashed_notes, export_user_data, export_path, flush_autosave
 from django.shortcuts import get_object_or_404
-import json
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from django.db.models import Q
+from django.db import transaction
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, Http404
+from django.views import View
+from .storage import BLOB_NAME_RE, DERIVATIVE_NAME_RE
+from django.conf import settings
 from label.models import Label
 
 class NoteViewSet(viewsets.ModelViewSet):
@@ -28,7 +37,13 @@ class NoteViewSet(viewsets.ModelViewSet):
     serializer_class = NoteSerializer
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
-    redis = RedisUtils()
+    redis = RedisUtils("notes")
+    resolver = NotePermissionResolver()
+    fragments = NoteFragmentCache()
+    reminder_pages = ReminderPageCache()
+    autosave = AutosaveBuffer()
+    # Heavier actions use up more of the caller's rate limit.
+    throttle_costs = {'bulk_import': 10, 'empty_trash': 5}
     
     """ Swagger_atuo_schema()"""
     @swagger_auto_schema( operation_description="An Notes curd operatuon API endpoint",
@@ -40,8 +55,7 @@ class NoteViewSet(viewsets.ModelViewSet):
         """
         Returns notes for the logged-in user with is_archive and is_trash as False.
         """
-        lookup=Q(user=self.request.user)|Q(collaborator__id=self.request.user.id)
-        return Note.objects.filter(lookup,is_archive=False, is_trash=False).distinct('id')
+        return list_queryset(self.request.user.id)
         
         # return Note.objects.filter(user=self.request.user, is_archive=False, is_trash=False)
 
@@ -50,22 +64,10 @@ class NoteViewSet(viewsets.ModelViewSet):
         List all notes for the logged-in user that are not archived or trashed.
         """
         try:
-            cache_key = f"user_{request.user.id}"
-            cache_note = self.redis.get(cache_key)
-            print(cache_note)
-
-            if cache_note:
-                logger.info(f"Notes feteched from the cache for user {request.user.id}")
-                return Response({"Message":"The list of cache notes of user","satus":"Sucess","data":cache_note},status=status.HTTP_200_OK)
-                
-            queryset = self.get_queryset()
-            # print(f"querset = {queryset}")
-            serializer = self.get_serializer(queryset, many=True)
-            # print(f"ser = {serializer}")
-            
-            
-            self.redis.save(cache_key,serializer.data,ex=300)
-            return Response({"Message":"The list of notes of user ","status":"Sucess","data":serializer.data},status=status.HTTP_200_OK)
+            projection = NoteProjection.from_request(request)
+            envelope = {"Message":"The list of notes of user ","status":"Sucess"}
+            body = self.fragments.list_response(list_index_key(request.user.id), self.get_queryset(), envelope, projection)
+            return HttpResponse(body, content_type='application/json', status=status.HTTP_200_OK)
             
         except Exception as e:
             logger.error(f"Error retrieving notes: {str(e)}")
@@ -74,44 +76,29 @@ class NoteViewSet(viewsets.ModelViewSet):
                 'detail': str(e)
             }, status=status.HTTP_400_BAD_REQUEST)
             
-    def sechdule_reminder(self,note,reminder_time):
+    def check_write_access(self,access):
+        """
+        Return a 403 response when the caller may not modify the note, otherwise None.
+        """
+        if access.access_type is None:
+            return Response({"Message":"You are not collaborator of this note","satus":"Error"},status=status.HTTP_403_FORBIDDEN)
+        
+        if access.access_type == Collaborator.read_only:
+            return Response({"Message":"You only have read_only permission on this note","satus":"Error"},status=status.HTTP_403_FORBIDDEN)
+        return None
+            
+    def land_autosave(self,note):
+        """
+        Flush the note's buffered autosaves before an edit, which is newer, and
+        reload the flushed fields into note. While Redis is unavailable they
+        cannot be read and the edit goes ahead alone.
+        """
         try:
-           
-            reminder_time=datetime.strptime(reminder_time, "%Y-%m-%dT%H:%M")
-            # print(reminder_time)
-            task_name = f'reminder-task-{note.id}'
-            periodic_task= PeriodicTask.objects.filter(name=task_name).first()
-
-        # Create or get a CrontabSchedule that matches the reminder time
-            schedule, _ = CrontabSchedule.objects.get_or_create(
-                minute=reminder_time.minute,
-                hour=reminder_time.hour,
-                day_of_month=reminder_time.day,
-                month_of_year=reminder_time.month,
-                day_of_week='*',
-            )
-                
-            if periodic_task:
-                periodic_task.crontab=schedule
-                periodic_task.args = json.dumps([note.id])
-                periodic_task.save()
-                logger.info(f"Updated reminder task for note {note.id}")
-                
-            else:
-
-            # Create a PeriodicTask to run the send_reminder task
-                PeriodicTask.objects.create(
-                    crontab=schedule,
-                    name=task_name,
-                    task='user.task.send_reminder',
-                    args=json.dumps([note.id]),
-                    one_off=True,
-                )
+            if self.autosave.flush(note.id):
+                note.refresh_from_db(fields=list(self.autosave.fields))
+        except CacheUnavailable as e:
+            logger.warning(f"Autosaves of note {note.id} not flushed before the edit: {str(e)}")
             
-        except Exception as e:
-            logger.error(f"Error scheduling reminder: {str(e)}")
-         
-
     def create(self, request, *args, **kwargs):
         """
         Create a new note for the logged-in user.
@@ -120,19 +107,10 @@ class NoteViewSet(viewsets.ModelViewSet):
             request.data.update(user=request.user.id)
             serializer = self.get_serializer(data=request.data)
             serializer.is_valid(raise_exception=True)
-            serializer.save(user=request.user)
-            note_id = serializer.data['id']
-        
-        # Schedule the reminder if it exists
-            if serializer.instance.reminder:
-                self.sechdule_reminder(serializer.instance,request.data['reminder'])
-            cache_key = f"user_{request.user.id}"
-            cache_note = self.redis.get(cache_key)
-            if cache_note is None:
-                cache_note=[]
-            cache_note.append(serializer.data)
-            self.redis.save(cache_key,cache_note,ex=300)
-            headers = self.get_success_headers(serializer.data)
+            with transaction.atomic():
+                serializer.save(user=request.user)
+                evict_own_caches(request.user.id, serializer.instance.id)
+            # Other users' caches, the reminder task and pushes follow from the outbox once this commits.
             return Response({"Message":"The notes  is created of user ","satus":"Sucess","data":serializer.data}, status=status.HTTP_201_CREATED)
         except Exception as e:
             logger.error(f"Error creating note: {str(e)}")
@@ -150,11 +128,11 @@ class NoteViewSet(viewsets.ModelViewSet):
             cache_note = self.redis.get(cache_key)
             if cache_note:
                 logger.info(f"Notes are  fetched from the cache of user {cache_key}")
-                return Response({"Message":"The data of the retrive note from cache","satus":"Sucess","data":cache_note},status=status.HTTP_200_OK)   
+                return Response({"Message":"The data of the retrive note from cache","satus":"Sucess","data":overlay(cache_note, self.autosave.read(pk))},status=status.HTTP_200_OK)   
             instance = self.get_object()
             serializer = self.get_serializer(instance)
-            self.redis.save(cache_key, serializer.data, ex=300) 
-            return Response({"Message":"The data of the retrive note","satus":"Sucess","data":serializer.data},status=status.HTTP_200_OK)
+            self.redis.save(cache_key, serializer.data, ex=settings.NOTE_DETAIL_CACHE_TIMEOUT, adaptive=True)
+            return Response({"Message":"The data of the retrive note","satus":"Sucess","data":overlay(dict(serializer.data), self.autosave.read(pk))},status=status.HTTP_200_OK)
         except Exception as e:
             logger.error(f"Error retrieving note with ID {pk}: {str(e)}")
             return Response({
@@ -167,38 +145,20 @@ class NoteViewSet(viewsets.ModelViewSet):
         Update a specific note by its ID.
         """
         try:
-            
-            # request.data.update(user=request.user.id)
-            # user=request.user,collaborator__id=self.request.user.id
-            # instance = self.get_object()
-            instance = Note.objects.get(id=pk)
-            if instance.user.id == request.user.id:
-                data = request.data.copy()
-                data['user'] = request.user.id
-                
-            else:
-                collabrator = instance.collaborators_set.filter(user_id=request.user.id).first()
-                
-                if collabrator is None:
-                    return Response({"Message":"You are not collaborator of this note","satus":"Error"},status=status.HTTP_403_FORBIDDEN)
-                
-                if collabrator.access_type == "read_only":
-                    return Response({"Message":"You only have read_only permission on this note","satus":"Error"},status=status.HTTP_403_FORBIDDEN)
-                    
-                data = request.data.copy()
-                data.pop('user',None)    
-                        
+            access = self.resolver.resolve(request, pk)
+            denied = self.check_write_access(access)
+            if denied:
+                return denied
+            instance = access.note
+            # Only once the caller may edit the note: landing autosaves writes it.
+            self.land_autosave(instance)
+            if instance.reminder and 'reminder' not in request.data:
+                # A full update replaces the reminder too; PATCH is for leaving it as it is.
+                return Response({"Message":"A full update must include the reminder","satus":"Error"},status=status.HTTP_400_BAD_REQUEST)
             serializer = self.get_serializer(instance, data=request.data, partial=False)
             serializer.is_valid(raise_exception=True)
             self.perform_update(serializer)
-            # self.sechdule_reminder(pk)
-            if serializer.instance.reminder:
-                self.sechdule_reminder(serializer.instance,request.data['reminder'])
-            note_cache_key = f"user_{request.user.id}_note_{pk}"
-            self.redis.save(note_cache_key,serializer.data,ex=300)
-            cache_key = f"user_{request.user.id}"
-            queryset = self.get_queryset()
-            self.redis.save(cache_key,self.get_serializer(queryset,many=True).data,ex=300)
+            evict_own_caches(request.user.id, instance.id)
             return Response({"Message":"The note is updated","satus":"Sucess","data":serializer.data},status=status.HTTP_200_OK)
             
         except Exception as e:
@@ -213,38 +173,16 @@ class NoteViewSet(viewsets.ModelViewSet):
         Partially update a specific note by its ID.
         """
         try:
-            
-            
-            # instance = Note.objects.get(id=pk,user=request.user,collaborator__id=self.request.user.id)
-            instance = Note.objects.get(id=pk)
-            # user=request.user,collaborator__id=self.request.user.id
-            # instance = self.get_object()
-            if instance.user.id == request.user.id:
-                data = request.data.copy()
-                data['user'] = request.user.id
-                
-            else:
-                collabrator = instance.collaborators_set.filter(user_id=request.user.id).first()
-                
-                if collabrator is None:
-                    return Response({"Message":"You are not collaborator of this note","satus":"Error"},status=status.HTTP_403_FORBIDDEN)
-                
-                if collabrator.access_type == "read_only":
-                    return Response({"Message":"You only have read_only permission on this note","satus":"Error"},status=status.HTTP_403_FORBIDDEN)
-                    
-                data = request.data.copy()
-                data.pop('user',None)    
+            access = self.resolver.resolve(request, pk)
+            denied = self.check_write_access(access)
+            if denied:
+                return denied
+            instance = access.note
+            self.land_autosave(instance)
             serializer = self.get_serializer(instance, data=request.data, partial=True)
             serializer.is_valid(raise_exception=True) 
             self.perform_update(serializer)
-            
-            if serializer.instance.reminder:
-                self.sechdule_reminder(serializer.instance,request.data['reminder'])
-            note_cache_key = f"user_{request.user.id}_note_{pk}"
-            self.redis.save(note_cache_key,serializer.data,ex=300)
-            cache_key =  f"user_{request.user.id}"
-            queryset=self.get_queryset()
-            self.redis.save(cache_key,self.get_serializer(queryset,many=True).data,ex=300)
+            evict_own_caches(request.user.id, instance.id)
             return Response({"Message":"The note is partial updated","satus":"Sucess","data":serializer.data},status=status.HTTP_200_OK)
             
         except Exception as e:
@@ -259,31 +197,12 @@ class NoteViewSet(viewsets.ModelViewSet):
         Delete a specific note by its ID.
         """
         try:
-            instance = Note.objects.get(id=pk)
-
-            if instance.user.id == request.user.id:
-                self.perform_destroy(instance)
-                
-                
-            else:
-                
-                collabrator = instance.collaborators_set.filter(user_id=request.user.id).first()
-                
-                if collabrator is None:
-                    return Response({"Message":"You are not collaborator of this note","satus":"Error"},status=status.HTTP_403_FORBIDDEN)
-                
-                if collabrator.access_type == "read_only":
-                    return Response({"Message":"You only have read_only permission on this note","satus":"Error"},status=status.HTTP_403_FORBIDDEN)
-                    
-                self.perform_destroy(instance)
-                
-            
-            note_cache_key = f"user_{request.user.id}_note_{pk}"
-            
-            self.redis.delete(note_cache_key)
-            cache_key = f"user_{request.user.id}"
-            queryset = self.get_queryset()
-            self.redis.save(cache_key,self.get_serializer(queryset,many=True).data,ex=300)
+            access = self.resolver.resolve(request, pk)
+            denied = self.check_write_access(access)
+            if denied:
+                return denied
+            self.perform_destroy(access.note)
+            evict_own_caches(request.user.id, int(pk))
             
             return Response({"Message":"The note is deleted","satus":"Sucess"},status=status.HTTP_200_OK)
             
@@ -294,41 +213,112 @@ class NoteViewSet(viewsets.ModelViewSet):
                 'detail': str(e)
             }, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=True, methods=['patch'], url_path='autosave', url_name='autosave', permission_classes=[IsAuthenticated])
+    def autosave_note(self, request, pk=None):
+        """
+        Buffer the title, description and color of a note in Redis; they are
+        written to the database by a debounced flush or by commit_autosave.
+        """
+        try:
+            denied = self.check_write_access(self.resolver.access(request, pk))
+            if denied:
+                return denied
+            unknown = [name for name in request.data if name not in self.autosave.fields]
+            if unknown:
+                return Response({"Message":f"Only {', '.join(self.autosave.fields)} can be autosaved","satus":"Error"},status=status.HTTP_400_BAD_REQUEST)
+            serializer = NoteSerializer(data=request.data, partial=True)
+            serializer.is_valid(raise_exception=True)
+            values = {name: serializer.validated_data[name] for name in self.autosave.fields if name in serializer.validated_data}
+            
+            try:
+                if values and self.autosave.write(int(pk), values):
+                    flush_autosave.apply_async((int(pk),), countdown=settings.NOTE_AUTOSAVE_DEBOUNCE_SECONDS)
+            except CacheUnavailable:
+                # Without Redis there is no buffer: the edit is written right away.
+                self.autosave.store(int(pk), values)
+                return Response({"Message":"The note is autosaved","satus":"Sucess","data":values},status=status.HTTP_202_ACCEPTED)
+            return Response({"Message":"The note is autosaved","satus":"Sucess","data":self.autosave.read(pk)},status=status.HTTP_202_ACCEPTED)
+        except Exception as e:
+            logger.error(f"Error autosaving note with ID {pk}: {str(e)}")
+            return Response({
+                'error': 'An error occurred while autosaving the note.',
+                'detail': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=True, methods=['post'], url_path='commit_autosave', url_name='commit_autosave', permission_classes=[IsAuthenticated])
+    def commit_autosave(self, request, pk=None):
+        """
+        Write the autosaved edits of a note to the database now.
+        """
+        try:
+            denied = self.check_write_access(self.resolver.access(request, pk))
+            if denied:
+                return denied
+            self.autosave.flush(pk)
+            note = Note.objects.get(id=pk)
+            return Response({"Message":"The autosaved note is committed","satus":"Sucess","data":NoteSerializer(note).data},status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error(f"Error committing autosaved note with ID {pk}: {str(e)}")
+            return Response({
+                'error': 'An error occurred while committing the autosaved note.',
+                'detail': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=True, methods=['patch'], url_path='description', url_name='patch_description', permission_classes=[IsAuthenticated])
+    def patch_description(self, request, pk=None):
+        """
+        Edit the description of a note with insert/delete operations or a unified
+        diff made against a known version, and return only the new version.
+        """
+        try:
+            denied = self.check_write_access(self.resolver.access(request, pk))
+            if denied:
+                return denied
+            serializer = DescriptionPatchSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            data = serializer.validated_data
+            
+            try:
+                pending, raw = self.autosave.pending(pk)
+            except CacheUnavailable as e:
+                logger.warning(f"Autosaves of note {pk} not read before the patch: {str(e)}")
+                pending, raw = {}, {}
+            try:
+                version = patch_description(int(pk), data['version'], operations=data.get('operations'), diff=data.get('diff'), pending=pending)
+            except TextPatchError as e:
+                return Response({"Message":str(e),"satus":"Error"},status=status.HTTP_400_BAD_REQUEST)
+            if version is not None:
+                evict_own_caches(request.user.id, int(pk))
+            if version is not None and raw:
+                try:
+                    self.autosave.release(pk, raw)
+                except CacheUnavailable as e:
+                    logger.warning(f"Autosaves of note {pk} written with the patch but still buffered: {str(e)}")
+            if version is None:
+                current = Note.objects.filter(id=pk).values_list('version', flat=True).first()
+                return Response({"Message":"The note was changed since that version","satus":"Error","data":{"id":int(pk),"version":current}},status=status.HTTP_409_CONFLICT)
+            return Response({"Message":"The note description is patched","satus":"Sucess","data":{"id":int(pk),"version":version}},status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error(f"Error patching the description of note with ID {pk}: {str(e)}")
+            return Response({
+                'error': 'An error occurred while patching the note description.',
+                'detail': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
     @action(detail=True, methods=['patch'], url_path='toggle_archive',url_name='toggle_archive', permission_classes=[IsAuthenticated])
     def toggle_archive(self, request, pk=None):
         """
         Toggle the archive status of a note.
         """
         try:
-            note = Note.objects.get(id=pk)
-            
-            if note.user.id == request.user.id:
-                note.is_archive = not note.is_archive
-                
-            else :
-                collabrator = note.collaborators_set.filter(user_id=request.user.id).first()
-                
-                if collabrator is None:
-                    return Response({"Message":"You are not collaborator of this note","satus":"Error"},status=status.HTTP_403_FORBIDDEN)
-                
-                if collabrator.access_type == "read_only":
-                    return Response({"Message":"You only have read_only permission on this note","satus":"Error"},status=status.HTTP_403_FORBIDDEN)
-                
-                note.is_archive = not note.is_archive
-                
+            access = self.resolver.resolve(request, pk)
+            denied = self.check_write_access(access)
+            if denied:
+                return denied
+            note = access.note
+            note.is_archive = not note.is_archive
             note.save()
-            
-            note_cache_key = f"user_{request.user.id}"
-            
-            note_cache_data = self.redis.get(note_cache_key)
-
-            if note_cache_data:
-                for cache_note in note_cache_data:
-                    if cache_note['id'] == pk:           
-                        cache_note['is_archive'] = note.is_archive
-                self.redis.save(note_cache_key,note_cache_data,ex=300)
-                logger.info(f"Note {pk} archive status toggled in cache bjjlfor user {request.user.id}")
-
+            evict_own_caches(request.user.id, note.id)
             
             return Response({
                 'message': 'Note archive status toggled successfully.',
@@ -347,21 +337,11 @@ class NoteViewSet(viewsets.ModelViewSet):
         List all archived notes for the logged-in user.
         """
         try:
-            note_cache_key = f"user_{request.user.id}_archived_notes"
-            note_cache_data = self.redis.get(note_cache_key)
-            if note_cache_data:
-                logger.info(f"Archived Notes feteched from the cache for user {request.user.id}")
-                
-        
-                return Response({"Message":"Archived notes retrived from cache","satus":"Sucess","data":note_cache_data},status=status.HTTP_200_OK)   
-                            
-            queryset = Note.objects.filter(user=request.user, is_archive=True)
-            serializer = NoteSerializer(queryset, many=True)
-            self.redis.save(note_cache_key,serializer.data,ex=300)
-            return Response({
-                'message': 'Archived notes retrieved successfully.',
-                'data': serializer.data
-            }, status=status.HTTP_200_OK)
+            projection = NoteProjection.from_request(request)
+            queryset = list_queryset(request.user.id, 'archived_notes')
+            envelope = {'message': 'Archived notes retrieved successfully.'}
+            body = self.fragments.list_response(list_index_key(request.user.id, 'archived_notes'), queryset, envelope, projection)
+            return HttpResponse(body, content_type='application/json', status=status.HTTP_200_OK)
         except Exception as e:
             logger.error(f"Error retrieving archived notes: {str(e)}")
             return Response({
@@ -369,6 +349,43 @@ class NoteViewSet(viewsets.ModelViewSet):
                 'detail': str(e)
             }, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['get'], url_path='upcoming_reminders', url_name='upcoming_reminders', permission_classes=[IsAuthenticated])
+    def upcoming_reminders(self, request):
+        """
+        List the reminders of the notes the user owns or shares between start
+        and end (the next NOTE_REMINDER_WINDOW_DAYS by default), soonest first
+        and a page at a time. Pages are cached until one of the user's notes
+        changes (see ReminderPageCache).
+        """
+        try:
+            params = UpcomingRemindersSerializer(data=request.query_params)
+            params.is_valid(raise_exception=True)
+            start, end = params.validated_data['start'], params.validated_data['end']
+            
+            page_key = self.reminder_pages.page_key(request.user.id, start, end, request.query_params.get('cursor', ''), request.query_params.get('limit', ''))
+            page, generation = self.reminder_pages.get(request.user.id, page_key)
+            if page is not None:
+                return Response(page, status=status.HTTP_200_OK)
+            
+            projection = NoteProjection.named('summary')
+            paginator = ReminderPagination()
+            notes = paginator.paginate_queryset(projection.apply(upcoming_queryset(request.user.id, start, end)), request, view=self)
+            data = {
+                'message': 'Upcoming reminders retrieved successfully.',
+                'status': 'Success',
+                'data': [projection.serialize(note) for note in notes],
+                'next': paginator.get_next_link(),
+                'previous': paginator.get_previous_link(),
+            }
+            self.reminder_pages.save(page_key, generation, data)
+            return Response(data, status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error(f"Error retrieving upcoming reminders: {str(e)}")
+            return Response({
+                'error': 'An error occurred while retrieving upcoming reminders.',
+                'detail': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
     @action(detail=True, methods=['patch'], url_path='toggle_trash', url_name='toggle_trash',permission_classes=[IsAuthenticated])
     def toggle_trash(self, request, pk=None):
         
@@ -376,30 +393,15 @@ class NoteViewSet(viewsets.ModelViewSet):
         Toggle the trash status of a note.
         """
         try:
-            note = Note.objects.get(id=pk)
-            if note.user.id == request.user.id:
-                note.is_trash = not note.is_trash
-                
-            else :
-                collabrator = note.collaborators_set.filter(user_id=request.user.id).first()
-                
-                if collabrator is None:
-                    return Response({"Message":"You are not collaborator of this note","satus":"Error"},status=status.HTTP_403_FORBIDDEN)
-                
-                if collabrator.access_type == "read_only":
-                    return Response({"Message":"You only have read_only permission on this note","satus":"Error"},status=status.HTTP_403_FORBIDDEN)
-                
-                note.is_trash = not note.is_trash
-                
+            access = self.resolver.resolve(request, pk)
+            denied = self.check_write_access(access)
+            if denied:
+                return denied
+            note = access.note
+            note.is_trash = not note.is_trash
             note.save()
+            evict_own_caches(request.user.id, note.id)
             
-            note_cache_key = f"user_{request.user.id}"
-            note_cache_data = self.redis.get(note_cache_key)
-            if note_cache_data:
-                for cache_note in note_cache_data:
-                    if cache_note['id'] == pk:
-                        cache_note['is_trash'] = note.is_trash
-                self.redis.save(note_cache_key,note_cache_data,ex=300)
             return Response({
                 'message': 'Note trash status toggled successfully.',
                 'data': NoteSerializer(note).data
@@ -417,31 +419,65 @@ class NoteViewSet(viewsets.ModelViewSet):
         List all trashed notes for the logged-in user.
         """
         try:
-            note_cache_key = f"user_{request.user.id}"
-            note_cache_data = self.redis.get(note_cache_key)
-            if note_cache_data:
-                logger.info(f"Trash note of user {request.user.id}")
-                return Response({
-                'message': 'Trashed notes retrieved from cache successfully.',
-                'data': note_cache_data
-            }, status=status.HTTP_200_OK)
-                
-
+            projection = NoteProjection.from_request(request)
+            queryset = list_queryset(request.user.id, 'trashed_notes')
+            envelope = {'message': 'Trashed notes retrieved successfully.'}
+            body = self.fragments.list_response(list_index_key(request.user.id, 'trashed_notes'), queryset, envelope, projection)
+            return HttpResponse(body, content_type='application/json', status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error(f"Error retrieving trashed notes: {str(e)}")
+            return Response({
+                'error': 'An error occurred while retrieving trashed notes.',
+                'detail': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
             
-            queryset = Note.objects.filter(user=request.user, is_trash=True)
-            serializer = NoteSerializer(queryset, many=True)
-            self.redis.save(note_cache_key,serializer.data,ex=300)
+            
+    @swagger_auto_schema(
+        operation_description="Import many notes at once; invalid rows are reported without aborting the import",
+        request_body=NoteImportSerializer(many=True),
+        responses={200: 'Import summary with per-row errors', 400: 'Invalid input'}
+    )
+    @action(detail=False, methods=['post'], url_path='bulk_import', url_name='bulk_import', permission_classes=[IsAuthenticated])
+    def bulk_import(self, request):
+        """
+        Import a list of notes for the logged-in user.
+        """
+        try:
+            rows = request.data.get('notes') if isinstance(request.data, dict) else request.data
+            if not isinstance(rows, list):
+                return Response({"error": "Expected a list of notes."}, status=status.HTTP_400_BAD_REQUEST)
+            
+            use_copy = len(rows) >= settings.NOTE_IMPORT_COPY_THRESHOLD
+            result = NoteImporter(request.user).run(rows, use_copy=use_copy)
             return Response({
-                'message': 'Trashed notes retrieved successfully.',
-                'data': serializer.data
+                'message': f"{result['created']} notes imported.",
+                'status': 'Success',
+                'data': result
             }, status=status.HTTP_200_OK)
         except Exception as e:
-            logger.error(f"Error retrieving trashed notes: {str(e)}")
+            logger.error(f"Error importing notes for user {request.user.id}: {str(e)}")
             return Response({
-                'error': 'An error occurred while retrieving trashed notes.',
+                'error': 'An error occurred while importing notes.',
                 'detail': str(e)
             }, status=status.HTTP_400_BAD_REQUEST)
             
+    @action(detail=False, methods=['post'], url_path='empty_trash', url_name='empty_trash', permission_classes=[IsAuthenticated])
+    def empty_trash(self, request):
+        """
+        Queue a background purge of every trashed note of the logged-in user.
+        """
+        try:
+            purge_trashed_notes.delay(user_id=request.user.id, retention_days=0)
+            return Response({
+                'message': 'Emptying the trash has been queued.',
+                'status': 'Success'
+            }, status=status.HTTP_202_ACCEPTED)
+        except Exception as e:
+            logger.error(f"Error queueing empty trash for user {request.user.id}: {str(e)}")
+            return Response({
+                'error': 'An error occurred while emptying the trash.',
+                'detail': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
             
     
 class CollaboratorView(viewsets.ViewSet):
@@ -515,7 +551,8 @@ class CollaboratorView(viewsets.ViewSet):
                 
             serializer = CollaboratorSerializer(data=collaborators_to_create, many=True)
             serializer.is_valid(raise_exception=True)
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
             
             return Response({"message": "Collaborators added successfully.","status":"Success","data":serializer.data}, status=status.HTTP_201_CREATED)
         
@@ -665,8 +702,84 @@ class LabelsAddRemove(viewsets.ViewSet):
         except Exception as e:
             logger.error(f"Error while remove  Label: {str(e)}")
             return Response({"error": "An error occurred while remove Labels.", "detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ExportView(viewsets.ViewSet):
+    
+    """ This class is use to export all the notes, labels and collaborators of the user"""
+    
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    
+    @swagger_auto_schema(
+        operation_description="Start a background export of the user's data as NDJSON",
+        request_body=ExportJobSerializer,
+        responses={202: ExportJobSerializer}
+    )
+    def create(self, request, *args, **kwargs):
+        try:
+            serializer = ExportJobSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            job = serializer.save(user=request.user)
+            transaction.on_commit(lambda: export_user_data.delay(job.id))
+            return Response({"message": "Export has been queued.", "status": "Success", "data": ExportJobSerializer(job).data}, status=status.HTTP_202_ACCEPTED)
+        except Exception as e:
+            logger.error(f"Error starting export: {str(e)}")
+            return Response({"error": "An error occurred while starting the export.", "detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-            
-            
-            
-            
\ No newline at end of file
+    def retrieve(self, request, pk=None, *args, **kwargs):
+        """
+        Report the status and progress of an export.
+        """
+        try:
+            job = get_object_or_404(ExportJob, id=pk, user=request.user)
+            return Response({"message": "Export status", "status": "Success", "data": ExportJobSerializer(job).data}, status=status.HTTP_200_OK)
+        except Http404:
+            return Response({"error": "Export not found."}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error(f"Error retrieving export {pk}: {str(e)}")
+            return Response({"error": "An error occurred while retrieving the export.", "detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+    @action(detail=True, methods=['get'], url_path='download', url_name='download', permission_classes=[IsAuthenticated])
+    def download(self, request, pk=None):
+        """
+        Stream a finished export file back to the user.
+        """
+        job = get_object_or_404(ExportJob, id=pk, user=request.user)
+        if job.status != ExportJob.completed:
+            return Response({"error": "The export is not ready yet.", "data": ExportJobSerializer(job).data}, status=status.HTTP_409_CONFLICT)
+        
+        content_type = 'application/gzip' if job.compress else 'application/x-ndjson'
+        try:
+            export_file = open(export_path(job), 'rb')
+        except FileNotFoundError:
+            logger.error(f"File of completed export {job.id} is missing")
+            return Response({"error": "The export file is no longer available.", "data": ExportJobSerializer(job).data}, status=status.HTTP_410_GONE)
+        return FileResponse(export_file, as_attachment=True, filename=job.file_name, content_type=content_type)
+
+
+
+
+class ImageBlobView(View):
+    
+    """ Serve a note image, or one of its resized copies, from the
+    content-addressed store. Names are content hashes, so responses are cacheable forever and revalidate by ETag."""
+    
+    cache_control = 'public, max-age=31536000, immutable'
+    
+    def get(self, request, name):
+        match = BLOB_NAME_RE.fullmatch(name) or DERIVATIVE_NAME_RE.fullmatch(name)
+        if match is None:
+            raise Http404("Image not found")
+        etag = '"{}"'.format(name.rsplit('/', 1)[1].split('.')[0])
+        
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponseNotModified()
+        else:
+            try:
+                response = FileResponse(Note._meta.get_field('image').storage.open(name))
+            except FileNotFoundError:
+                raise Http404("Image not found")
+        response['ETag'] = etag
+        response['Cache-Control'] = self.cache_control
+        return response
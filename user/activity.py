@@ -0,0 +1,64 @@
+import threading
+import time
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+from django_redis import get_redis_connection
+from loguru import logger
+from notes.breaker import breaker
+
+
+# Sorted set of user ids scored by the time of their last request.
+ACTIVITY_KEY = 'user_activity'
+
+_seen = {}
+_seen_lock = threading.Lock()
+_last_flush = [time.monotonic()]
+
+
+def request_user_id(request):
+    # Only the user DRF authenticated; the lazy session user is not loaded for this.
+    user = request.__dict__.get('user')
+    if user is None or isinstance(user, SimpleLazyObject) or not user.is_authenticated:
+        return None
+    return user.id
+
+
+def touch(user_id):
+    with _seen_lock:
+        _seen[user_id] = time.time()
+
+
+def flush_activity(force=False):
+    """
+    Write the last-seen times noted by this process to the shared ranking, at
+    most once every USER_ACTIVITY_FLUSH_SECONDS, and trim it to the
+    USER_ACTIVITY_MAX_TRACKED most recent users.
+    """
+    now = time.monotonic()
+    if not force and now - _last_flush[0] < settings.USER_ACTIVITY_FLUSH_SECONDS:
+        return
+    with _seen_lock:
+        pending = dict(_seen)
+        _seen.clear()
+        _last_flush[0] = now
+    if not pending:
+        return
+    try:
+        with breaker.guard():
+            pipe = get_redis_connection("default").pipeline(transaction=False)
+            # GT: a process flushing late never moves a user back in the ranking.
+            pipe.zadd(ACTIVITY_KEY, pending, gt=True)
+            pipe.zremrangebyrank(ACTIVITY_KEY, 0, -settings.USER_ACTIVITY_MAX_TRACKED - 1)
+            pipe.execute()
+    except Exception as e:
+        logger.error(f"Could not flush user activity: {str(e)}")
+
+
+def recently_active(limit, active_within=None):
+    """
+    Ids of up to limit users, most recently active first, optionally only those
+    seen in the last active_within seconds.
+    """
+    oldest = time.time() - active_within if active_within else '-inf'
+    user_ids = get_redis_connection("default").zrevrangebyscore(ACTIVITY_KEY, '+inf', oldest, start=0, num=limit)
+    return [int(user_id) for user_id in user_ids]
@@ -1,4 +1,5 @@
 from .models import Log
+from .activity import flush_activity, request_user_id, touch
 from loguru import logger
 from rest_framework.response import Response
 from rest_framework  import status
@@ -29,6 +30,22 @@ class RequestLogMiddleware(object):
         
         
         return response
-        
-       
-            
\ No newline at end of file
+
+
+class UserActivityMiddleware:
+
+    """
+    Note when each authenticated user last made a request; the ranking picks
+    whose caches are warmed after a deploy.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        user_id = request_user_id(request)
+        if user_id is not None:
+            touch(user_id)
+        flush_activity()
+        return response
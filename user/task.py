@@ -4,6 +4,8 @@ from django.core.mail import send_mail
 from django.conf import settings
 # from time import sleep
 from notes.models import Note
+from notes.reminders import claim_dispatch, release_dispatch
+from django.utils.dateparse import parse_datetime
 from loguru import logger
 
 
@@ -19,20 +21,33 @@ def send_email_task(email_subject, email_body, recipient_email):
 
     
 @shared_task
-def send_reminder(note_id):
+def send_reminder(note_id, reminder=None):
+    """
+    Mail the note's reminder, at most once per (note, reminder time): a retry,
+    an overlapping beat run or a schedule left over from an earlier reminder
+    time sends nothing. reminder is the time the task was scheduled for; tasks
+    scheduled before it was passed only have the note id.
+    """
+    note = Note.objects.select_related('user').filter(id=note_id).first()
+    if note is None or note.reminder is None:
+        logger.info(f"Note {note_id} not found or has no reminder")
+        return
+    if reminder is not None and parse_datetime(reminder) != note.reminder:
+        logger.info(f"Skipping stale reminder of note {note_id} for {reminder}")
+        return
+    if not claim_dispatch(note.id, note.reminder):
+        logger.info(f"Reminder of note {note_id} for {note.reminder} already sent")
+        return
     try:
-        note = Note.objects.get(id=note_id)
-        user_email = note.user.email
-        body=f"Reminder for Note: {note.title} - {note.reminder}"
-        subject = f"Reminder"
         send_mail(
-        subject=subject,
-        message=body,
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[user_email],
-        fail_silently=False,
-    )
-    except Exception as e:
-        logger.info("Note not found")
+            subject="Reminder",
+            message=f"Reminder for Note: {note.title} - {note.reminder}",
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            recipient_list=[note.user.email],
+            fail_silently=False,
+        )
+    except Exception:
+        release_dispatch(note.id, note.reminder)
+        raise
     
     
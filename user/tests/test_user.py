@@ -7,6 +7,11 @@ import jwt
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.tokens import RefreshToken
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from django_redis import get_redis_connection
+from user.throttling import RedisAnonRateThrottle
+from notes.task import warm_user_caches
 
 
 #User Resigtration Pytest
@@ -99,6 +104,20 @@ def test_user_login(client):
     
 
 
+@pytest.mark.django_db
+@pytest.mark.login
+def test_user_login_queues_cache_warm_up(client, monkeypatch, django_capture_on_commit_callbacks):
+    user = User.objects.create_user(email='pinky1996@gmail.com', password='Pinky564')
+    queued = []
+    monkeypatch.setattr(warm_user_caches, 'delay', queued.append)
+    url = reverse('login_user')
+    with django_capture_on_commit_callbacks(execute=True):
+        for _ in range(2):
+            response = client.post(url, {"email": "pinky1996@gmail.com", "password": "Pinky564"}, content_type='application/json')
+            assert response.status_code == 200
+    assert queued == [user.id]
+
+
 @pytest.mark.django_db
 @pytest.mark.login_password
 def test_user_login_invalid_password(client):
@@ -168,3 +187,35 @@ def test_verify_user(client):
     assert user.is_verified is True 
 
 
+
+
+#Throttle Pytest
+class BurstThrottle(RedisAnonRateThrottle):
+    scope = 'burst_test'
+    rate = '10/min'
+
+
+@pytest.mark.throttle
+def test_throttle_exact_under_parallel_load():
+    get_redis_connection("default").delete("throttle_burst_test_10.0.0.1")
+    request = SimpleNamespace(META={'REMOTE_ADDR': '10.0.0.1'}, user=None, method='GET')
+    view = SimpleNamespace()
+    
+    def hit(_):
+        return BurstThrottle().allow_request(request, view)
+    
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(hit, range(64)))
+    
+    assert results.count(True) == 10
+    
+    
+@pytest.mark.throttle
+def test_throttle_cost_weights():
+    get_redis_connection("default").delete("throttle_burst_test_10.0.0.2")
+    request = SimpleNamespace(META={'REMOTE_ADDR': '10.0.0.2'}, user=None, method='POST')
+    view = SimpleNamespace(action='bulk_import', throttle_costs={'bulk_import': 4})
+    
+    throttle = BurstThrottle()
+    assert [throttle.allow_request(request, view) for _ in range(3)] == [True, True, False]
+    assert throttle.wait() > 0
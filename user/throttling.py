@@ -0,0 +1,82 @@
+from django_redis import get_redis_connection
+from loguru import logger
+from redis.exceptions import RedisError
+from rest_framework.throttling import SimpleRateThrottle, AnonRateThrottle, UserRateThrottle
+from notes.breaker import CacheUnavailable, breaker
+
+
+# Generic cell rate algorithm (a token bucket stored as one timestamp). The key
+# holds the "theoretical arrival time" in milliseconds, so every client costs a
+# single small string no matter how high its rate is, and the check-and-update
+# happens atomically inside Redis in one round trip.
+GCRA_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if not tat or tat < now then
+    tat = now
+end
+local new_tat = tat + interval * cost
+local allow_at = new_tat - period
+if allow_at > now then
+    return {0, math.ceil(allow_at - now)}
+end
+redis.call('SET', KEYS[1], string.format('%.3f', new_tat), 'PX', math.ceil(new_tat - now))
+return {1, 0}
+"""
+
+
+class RedisRateThrottle(SimpleRateThrottle):
+
+    """
+    Drop-in replacement for DRF's cache throttles backed by an atomic Redis
+    script instead of a per-client list of timestamps. Views can weight their
+    actions with a ``throttle_costs`` mapping of action (or method) to cost.
+    """
+
+    cache_format = 'throttle_%(scope)s_%(ident)s'
+    script = None
+
+    def get_script(self):
+        if RedisRateThrottle.script is None:
+            RedisRateThrottle.script = get_redis_connection("default").register_script(GCRA_SCRIPT)
+        return RedisRateThrottle.script
+
+    def get_cost(self, request, view):
+        costs = getattr(view, 'throttle_costs', {})
+        return costs.get(getattr(view, 'action', None) or request.method.lower(), 1)
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        period_ms = self.duration * 1000
+        interval_ms = period_ms / self.num_requests
+        try:
+            with breaker.guard():
+                allowed, retry_ms = self.get_script()(keys=[self.key], args=[interval_ms, period_ms, self.get_cost(request, view)])
+        except (CacheUnavailable, RedisError) as e:
+            # Rate limiting must never take the API down with Redis.
+            logger.error(f"Throttle check failed for {self.key}: {str(e)}")
+            return True
+
+        self.retry_after = retry_ms / 1000
+        return bool(allowed)
+
+    def wait(self):
+        return getattr(self, 'retry_after', None)
+
+
+class RedisAnonRateThrottle(RedisRateThrottle, AnonRateThrottle):
+    pass
+
+
+class RedisUserRateThrottle(RedisRateThrottle, UserRateThrottle):
+    pass
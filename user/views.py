@@ -16,7 +16,12 @@ from .task import send_email_task
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from rest_framework.exceptions import Throttled
-from rest_framework.throttling import UserRateThrottle ,  AnonRateThrottle
+from .throttling import RedisAnonRateThrottle
+from .activity import touch
+from django.core.cache import cache
+from django.db import transaction
+from loguru import logger
+from notes.task import warm_user_caches
 
 
 
@@ -48,9 +53,22 @@ class RegistrationUser(APIView):
             return Response({"message": str(e), "status": "Error"}, status=status.HTTP_400_BAD_REQUEST)
      
        
+def queue_warm_up(user_id):
+    """
+    Warm the user's note caches in the background once the login commits, at
+    most once every NOTE_WARMUP_LOGIN_INTERVAL; the login never waits on or
+    fails with it.
+    """
+    try:
+        if cache.add(f"user_{user_id}_warmup", 1, settings.NOTE_WARMUP_LOGIN_INTERVAL):
+            transaction.on_commit(lambda: warm_user_caches.delay(user_id))
+    except Exception as e:
+        logger.error(f"Could not queue the cache warm-up of user {user_id}: {str(e)}")
+
+
 class LoginUser(APIView):
     
-    throttle_classes = [AnonRateThrottle]
+    throttle_classes = [RedisAnonRateThrottle]
     
     @swagger_auto_schema( operation_description="An User Login  API endpoint",
         request_body=UserLoginSerializer,
@@ -64,6 +82,8 @@ class LoginUser(APIView):
             serializer.save()
                 
             token = RefreshToken.for_user(serializer.instance)
+            touch(serializer.instance.id)
+            queue_warm_up(serializer.instance.id)
             
             return Response({"Message": "Login successful", "status": "Success","data":{'refresh':str(token),'access':str(token.access_token)}},status=status.HTTP_200_OK)
         